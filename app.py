@@ -1,17 +1,34 @@
+import time
+
+# Referencia para medir el arranque (ver STARTUP_BUDGET_MS)
+STARTED_AT = time.perf_counter()
+
 import sys
 import os
-import json
-import base64
-import shutil
-from io import BytesIO
 from datetime import datetime
-from pathlib import Path
 
-import qrcode
-from PySide6.QtWidgets import *
-from PySide6.QtCore import *
-from PySide6.QtGui import *
-from jinja2 import Template
+# Subcomandos de cli.py; se atienden sin cargar QtWidgets ni la ventana
+CLI_COMMANDS = ("render", "ledger", "numbering", "profiles", "products", "verify", "serve", "timings")
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
+from PySide6.QtWidgets import (
+    QApplication, QCheckBox, QDateEdit, QDialog, QDialogButtonBox, QFileDialog, QFormLayout,
+    QGroupBox, QHBoxLayout, QLabel, QLineEdit, QMainWindow, QMessageBox, QProgressBar,
+    QPushButton, QScrollArea, QSplitter, QTabWidget, QVBoxLayout, QWidget
+)
+from PySide6.QtCore import QCoreApplication, QDate, QObject, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QIcon, QPainter, QPixmap
+
+import engine
+import profiles
+import qr_service
+import totals
+import workers
+from completers import ProfileCompleter
+from items_model import ItemsEditor, FACTURA_COLUMNS, TICKET_COLUMNS
 
 def resource_path(relative_path):
     """Obtiene la ruta absoluta a un recurso / icono para compilacion borrar en caso de no desear"""
@@ -23,6 +40,29 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+def remember_profiles(record):
+    """Guarda cliente y emisor en el catálogo local; si falla, igual se emite el documento"""
+    try:
+        profiles.remember(record)
+    except Exception as e:
+        sys.stderr.write(f"No se pudo actualizar el catálogo: {e}\n")
+
+
+def read_qr_payload(parent, data):
+    """Payload de ARCA de un QR cargado desde archivo; avisa si no se pudo leer"""
+    import qr_decode
+    import verify
+    
+    try:
+        return verify.parse_payload(qr_decode.decode_png(data))
+    except qr_decode.QRDecodeError as e:
+        QMessageBox.warning(
+            parent, "QR no verificado",
+            f"No se pudo leer un QR de ARCA en la imagen ({e}). Se usará la imagen tal como está."
+        )
+        return None
+
+
 class QRGeneratorTab(QWidget):
     """Tab para generar QR directamente"""
     def __init__(self):
@@ -93,43 +133,45 @@ class QRGeneratorTab(QWidget):
         self.current_qr_image = None
     
     def generar_qr(self):
-        try:
-            qr_data = {
-                'ver': 1,
-                'fecha': self.fecha.date().toString("yyyy-MM-dd"),
-                'cuit': int(self.cuit.text()) if self.cuit.text() else 0,
-                'ptoVta': int(self.ptoVta.text()) if self.ptoVta.text() else 0,
-                'tipoCmp': int(self.tipoCmp.text()) if self.tipoCmp.text() else 6,
-                'nroCmp': int(self.nroCmp.text()) if self.nroCmp.text() else 0,
-                'importe': float(self.importe.text()) if self.importe.text() else 0,
-                'moneda': self.moneda.text(),
-                'ctz': float(self.ctz.text()) if self.ctz.text() else 1,
-                'tipoDocRec': int(self.tipoDocRec.text()) if self.tipoDocRec.text() else 80,
-                'nroDocRec': int(self.nroDocRec.text()) if self.nroDocRec.text() else 0,
-                'tipoCodAut': self.tipoCodAut.text(),
-                'codAut': int(self.codAut.text()) if self.codAut.text() else 0
-            }
-            
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(json.dumps(qr_data))
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            self.current_qr_image = buffer.getvalue()
-            
-            pixmap = QPixmap()
-            pixmap.loadFromData(self.current_qr_image)
-            self.qr_label.setPixmap(
-                pixmap.scaled(300, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            )
-            
-            self.btn_guardar.setEnabled(True)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error generando QR: {str(e)}")
+        qr_data = engine.qr_data({
+            'fecha': self.fecha.date().toString("yyyy-MM-dd"),
+            'cuit': self.cuit.text(),
+            'ptoVta': self.ptoVta.text(),
+            'tipoCmp': self.tipoCmp.text(),
+            'nroCmp': self.nroCmp.text(),
+            'importe': self.importe.text(),
+            'moneda': self.moneda.text(),
+            'ctz': self.ctz.text(),
+            'tipoDocRec': self.tipoDocRec.text(),
+            'nroDocRec': self.nroDocRec.text(),
+            'tipoCodAut': self.tipoCodAut.text(),
+            'codAut': self.codAut.text()
+        })
+        
+        self.btn_generar.setEnabled(False)
+        workers.submit(
+            workers.encode_qr, qr_data, description="QR",
+            on_finished=self.show_qr, on_failed=self.on_qr_failed, on_cancelled=self.on_qr_cancelled
+        )
+    
+    def show_qr(self, qr_image):
+        self.current_qr_image = qr_image
+        
+        pixmap = QPixmap()
+        pixmap.loadFromData(self.current_qr_image)
+        self.qr_label.setPixmap(
+            pixmap.scaled(300, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        )
+        
+        self.btn_guardar.setEnabled(True)
+        self.btn_generar.setEnabled(True)
+    
+    def on_qr_failed(self, error):
+        self.btn_generar.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Error generando QR: {error}")
+    
+    def on_qr_cancelled(self):
+        self.btn_generar.setEnabled(True)
     
     def guardar_qr(self):
         if self.current_qr_image:
@@ -149,6 +191,7 @@ class QuickQRDialog(QDialog):
         self.setWindowTitle("Generar QR")
         self.setModal(True)
         self.qr_image = None
+        self.qr_payload = None
         self.init_ui(suggested_data)
         
     def init_ui(self, suggested_data):
@@ -209,31 +252,23 @@ class QuickQRDialog(QDialog):
         
     def generate_and_accept(self):
         try:
-            qr_data = {
-                'ver': 1,
+            qr_data = engine.qr_data({
                 'fecha': self.fecha.date().toString("yyyy-MM-dd"),
-                'cuit': int(self.cuit.text()) if self.cuit.text() else 0,
-                'ptoVta': int(self.ptoVta.text()) if self.ptoVta.text() else 0,
-                'tipoCmp': int(self.tipoCmp.text()) if self.tipoCmp.text() else 6,
-                'nroCmp': int(self.nroCmp.text()) if self.nroCmp.text() else 0,
-                'importe': float(self.importe.text()) if self.importe.text() else 0,
+                'cuit': self.cuit.text(),
+                'ptoVta': self.ptoVta.text(),
+                'tipoCmp': self.tipoCmp.text(),
+                'nroCmp': self.nroCmp.text(),
+                'importe': self.importe.text(),
                 'moneda': self.moneda.text(),
-                'ctz': float(self.ctz.text()) if self.ctz.text() else 1,
-                'tipoDocRec': int(self.tipoDocRec.text()) if self.tipoDocRec.text() else 80,
-                'nroDocRec': int(self.nroDocRec.text()) if self.nroDocRec.text() else 0,
+                'ctz': self.ctz.text(),
+                'tipoDocRec': self.tipoDocRec.text(),
+                'nroDocRec': self.nroDocRec.text(),
                 'tipoCodAut': self.tipoCodAut.text(),
-                'codAut': int(self.codAut.text()) if self.codAut.text() else 0
-            }
-            
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(json.dumps(qr_data))
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
+                'codAut': self.codAut.text()
+            })
             
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            self.qr_image = buffer.getvalue()
+            self.qr_image = qr_service.encode(qr_data)
+            self.qr_payload = qr_data
             
             self.accept()
             
@@ -242,12 +277,19 @@ class QuickQRDialog(QDialog):
     
     def get_qr_image(self):
         return self.qr_image
+    
+    def get_qr_payload(self):
+        return self.qr_payload
 
 
 class FacturaTab(QWidget):
     def __init__(self):
         super().__init__()
         self.qr_image_data = None
+        self.qr_payload = None
+        # Número y QR armados automáticamente: se descartan tras guardar
+        self.auto_number = False
+        self.auto_qr = False
         self.init_ui()
         
     def init_ui(self):
@@ -268,6 +310,9 @@ class FacturaTab(QWidget):
         self.business_gross_income = QLineEdit()
         self.business_start_date = QDateEdit(datetime.now().date())
         
+        ProfileCompleter('issuers', self.business_name, 'business_name', self.fill_business)
+        ProfileCompleter('issuers', self.business_tax_id, 'tax_id', self.fill_business)
+        
         business_layout.addRow("Razón Social:", self.business_name)
         business_layout.addRow("Domicilio:", self.business_address)
         business_layout.addRow("Condición IVA:", self.business_vat)
@@ -282,6 +327,7 @@ class FacturaTab(QWidget):
         self.bill_type = QLineEdit("A")
         self.bill_point_of_sale = QLineEdit()
         self.bill_number = QLineEdit()
+        self.bill_number.setPlaceholderText("Automático")
         self.bill_date = QDateEdit(datetime.now().date())
         self.bill_since = QDateEdit(datetime.now().date())
         self.bill_until = QDateEdit(datetime.now().date())
@@ -309,6 +355,9 @@ class FacturaTab(QWidget):
         self.client_vat = QLineEdit()
         self.client_payment = QLineEdit("Contado")
         
+        ProfileCompleter('clients', self.client_name, 'name', self.fill_client)
+        ProfileCompleter('clients', self.client_tax_id, 'tax_id', self.fill_client)
+        
         client_layout.addRow("Nombre/Razón Social:", self.client_name)
         client_layout.addRow("Domicilio:", self.client_address)
         client_layout.addRow("CUIT/CUIL:", self.client_tax_id)
@@ -318,14 +367,10 @@ class FacturaTab(QWidget):
         
         items_group = QGroupBox("Ítems")
         items_layout = QVBoxLayout()
-        self.items_widget = QWidget()
-        self.items_layout = QVBoxLayout(self.items_widget)
-        
-        self.btn_add_item = QPushButton("+ Agregar Ítem")
-        self.btn_add_item.clicked.connect(self.add_item_row)
+        self.items_editor = ItemsEditor(FACTURA_COLUMNS)
+        self.items_model = self.items_editor.model
         
-        items_layout.addWidget(self.items_widget)
-        items_layout.addWidget(self.btn_add_item)
+        items_layout.addWidget(self.items_editor)
         items_group.setLayout(items_layout)
         
         totals_group = QGroupBox("Totales")
@@ -334,9 +379,16 @@ class FacturaTab(QWidget):
         self.total_subtotal = QLineEdit()
         self.total_tax = QLineEdit()
         self.total_total = QLineEdit()
+        for field in (self.total_subtotal, self.total_tax, self.total_total):
+            # Se calculan a partir de los ítems
+            field.setReadOnly(True)
+        self.items_editor.live_totals.changed.connect(self.update_totals)
+        
+        self.tax_breakdown = QLabel()
         
         totals_layout.addRow("Subtotal:", self.total_subtotal)
         totals_layout.addRow("Impuestos:", self.total_tax)
+        totals_layout.addRow("IVA por alícuota:", self.tax_breakdown)
         totals_layout.addRow("Total:", self.total_total)
         totals_group.setLayout(totals_layout)
         
@@ -365,14 +417,21 @@ class FacturaTab(QWidget):
         qr_layout.addLayout(qr_options_layout)
         qr_layout.addWidget(QLabel("Vista previa:"))
         qr_layout.addWidget(self.qr_preview)
+        
+        self.qr_svg = QCheckBox("QR vectorial (SVG) en lugar de PNG")
+        self.qr_svg.setToolTip("Nítido al convertir a PDF, aunque el HTML pesa más que con PNG; no aplica a QR cargados desde archivo")
+        qr_layout.addWidget(self.qr_svg)
         qr_group.setLayout(qr_layout)
         
         buttons_layout = QHBoxLayout()
         
         self.btn_generate = QPushButton("Generar Factura HTML")
         self.btn_generate.clicked.connect(self.generate_invoice)
+        self.btn_generate_pdf = QPushButton("Generar Factura PDF")
+        self.btn_generate_pdf.clicked.connect(self.generate_invoice_pdf)
         
         buttons_layout.addWidget(self.btn_generate)
+        buttons_layout.addWidget(self.btn_generate_pdf)
         buttons_layout.addStretch()
         
         layout.addWidget(business_group)
@@ -404,6 +463,8 @@ class FacturaTab(QWidget):
         
         if dialog.exec():
             self.qr_image_data = dialog.get_qr_image()
+            self.qr_payload = dialog.get_qr_payload()
+            self.auto_qr = False
             if self.qr_image_data:
                 pixmap = QPixmap()
                 pixmap.loadFromData(self.qr_image_data)
@@ -419,6 +480,9 @@ class FacturaTab(QWidget):
         if filename:
             with open(filename, 'rb') as f:
                 self.qr_image_data = f.read()
+            # Con el payload leído el QR se puede volver a generar (por ejemplo en SVG)
+            self.qr_payload = read_qr_payload(self, self.qr_image_data)
+            self.auto_qr = False
             
             pixmap = QPixmap(filename)
             self.qr_preview.setPixmap(
@@ -428,94 +492,189 @@ class FacturaTab(QWidget):
     def clear_qr(self):
         """Elimina el QR cargado/generado"""
         self.qr_image_data = None
+        self.qr_payload = None
+        self.auto_qr = False
         self.qr_preview.setText("Sin QR")
         self.qr_preview.setPixmap(QPixmap())
     
+    def qr_output_format(self):
+        """'svg' si se pidió QR vectorial y se conoce el payload, si no 'png'"""
+        if self.qr_svg.isChecked() and self.qr_payload is not None:
+            return 'svg'
+        return 'png'
+    
+    def show_qr_preview(self, qr_image):
+        self.qr_image_data = qr_image
+        pixmap = QPixmap()
+        pixmap.loadFromData(qr_image)
+        self.qr_preview.setPixmap(
+            pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        )
+    
+    def save_in_background(self, func, *args, message=""):
+        """Ejecuta el guardado en el pool de tareas y avisa al terminar"""
+        self.btn_generate.setEnabled(False)
+        self.btn_generate_pdf.setEnabled(False)
+        
+        def finished(result):
+            path, qr_image = result
+            self.show_qr_preview(qr_image)
+            self.finish_document()
+            self.enable_save_buttons()
+            QMessageBox.information(self, "Éxito", message.format(path=path))
+        
+        def failed(error):
+            self.enable_save_buttons()
+            QMessageBox.warning(self, "Error", f"Error guardando: {error}")
+        
+        workers.submit(
+            func, *args, description=message,
+            on_finished=finished, on_failed=failed, on_cancelled=self.enable_save_buttons
+        )
+    
+    def enable_save_buttons(self):
+        self.btn_generate.setEnabled(True)
+        self.btn_generate_pdf.setEnabled(True)
+    
+    def fill_business(self, profile):
+        """Completa los datos del negocio con un emisor del catálogo"""
+        self.business_name.setText(profile['business_name'])
+        self.business_address.setText(profile['address'])
+        self.business_vat.setText(profile['vat_condition'])
+        self.business_tax_id.setText(profile['tax_id'])
+        self.business_gross_income.setText(profile['gross_income_id'])
+        if profile['start_date']:
+            self.business_start_date.setDate(QDate.fromString(profile['start_date'], "yyyy-MM-dd"))
+    
+    def fill_client(self, profile):
+        """Completa los datos del cliente con uno del catálogo"""
+        self.client_name.setText(profile['name'])
+        self.client_address.setText(profile['address'])
+        self.client_tax_id.setText(profile['tax_id'])
+        self.client_vat.setText(profile['vat_condition'])
+        if profile['payment_method']:
+            self.client_payment.setText(profile['payment_method'])
+    
     def add_item_row(self):
-        item_widget = QWidget()
-        item_layout = QHBoxLayout(item_widget)
-        
-        code = QLineEdit()
-        code.setPlaceholderText("Código")
-        name = QLineEdit()
-        name.setPlaceholderText("Descripción")
-        qty = QLineEdit()
-        qty.setPlaceholderText("Cant.")
-        unit = QLineEdit()
-        unit.setPlaceholderText("Unidad")
-        price = QLineEdit()
-        price.setPlaceholderText("Precio")
-        discount = QLineEdit()
-        discount.setPlaceholderText("Desc. %")
-        discount_val = QLineEdit()
-        discount_val.setPlaceholderText("Desc. $")
-        subtotal = QLineEdit()
-        subtotal.setPlaceholderText("Subtotal")
-        
-        btn_remove = QPushButton("X")
-        btn_remove.clicked.connect(lambda: self.remove_item(item_widget))
-        
-        for widget in [code, name, qty, unit, price, discount, discount_val, subtotal, btn_remove]:
-            widget.setMaximumWidth(80)
-            item_layout.addWidget(widget)
-        
-        self.items_layout.addWidget(item_widget)
-    
-    def remove_item(self, widget):
-        widget.deleteLater()
+        self.items_editor.add_row()
     
-    def generate_invoice(self):
-        """Genera la factura HTML"""
-        if not self.qr_image_data:
+    def update_totals(self):
+        document_totals = self.items_editor.live_totals.totals
+        if not document_totals.count():
+            # Sin ítems se usan los valores por defecto del documento
+            for field in (self.total_subtotal, self.total_tax, self.total_total, self.tax_breakdown):
+                field.clear()
+            return
+        self.tax_breakdown.setText(totals.describe(document_totals))
+        self.total_subtotal.setText(totals.format_amount(document_totals.subtotal()))
+        self.total_tax.setText(totals.format_amount(document_totals.tax()))
+        self.total_total.setText(totals.format_amount(document_totals.total()))
+    
+    def ensure_number(self):
+        """Si el número está vacío reserva el próximo de la secuencia local"""
+        if self.bill_number.text().strip():
+            return True
+        try:
+            import numbering
+            bill = {'type': self.bill_type.text(), 'point_of_sale': self.bill_point_of_sale.text()}
+            self.bill_number.setText(numbering.next_number(bill))
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo asignar el número: {e}")
+            return False
+        self.auto_number = True
+        return True
+    
+    def suggested_filename(self, extension):
+        """Nombre propuesto al guardar; sin número muestra el próximo sin reservarlo"""
+        bill = {'type': self.bill_type.text(), 'point_of_sale': self.bill_point_of_sale.text(),
+                'number': self.bill_number.text().strip()}
+        if not bill['number']:
+            try:
+                import numbering
+                bill['number'] = numbering.peek_number(bill)
+            except Exception:
+                pass
+        return f"{engine.document_name('factura', bill)}.{extension}"
+    
+    def finish_document(self):
+        """Tras guardar libera el número y el QR automáticos para el próximo documento"""
+        if self.auto_number:
+            self.bill_number.clear()
+            self.auto_number = False
+        if self.auto_qr:
+            self.qr_image_data = None
+            self.qr_payload = None
+            self.auto_qr = False
+    
+    def ensure_qr(self):
+        """Si no hay QR ofrece generarlo con los datos del documento o usa uno vacío"""
+        if not self.qr_image_data and self.qr_payload is None:
             reply = QMessageBox.question(
                 self, "Sin QR",
                 "No se ha generado o cargado un QR. ¿Desea generar uno automáticamente?",
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                try:
-                    qr_data = {
-                        'ver': 1,
-                        'fecha': self.bill_date.date().toString("yyyy-MM-dd"),
-                        'cuit': int(self.business_tax_id.text()) if self.business_tax_id.text() else 0,
-                        'ptoVta': int(self.bill_point_of_sale.text()) if self.bill_point_of_sale.text() else 0,
-                        'tipoCmp': 1 if self.bill_type.text() == 'A' else 6,
-                        'nroCmp': int(self.bill_number.text()) if self.bill_number.text() else 0,
-                        'importe': float(self.total_total.text()) if self.total_total.text() else 0,
-                        'moneda': 'ARS',
-                        'ctz': 1,
-                        'tipoDocRec': 80,
-                        'nroDocRec': int(self.client_tax_id.text()) if self.client_tax_id.text() else 0,
-                        'tipoCodAut': 'E',
-                        'codAut': int(self.bill_cae.text()) if self.bill_cae.text() else 0
-                    }
-                    
-                    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                    qr.add_data(json.dumps(qr_data))
-                    qr.make(fit=True)
-                    
-                    img = qr.make_image(fill_color="black", back_color="white")
-                    buffer = BytesIO()
-                    img.save(buffer, format="PNG")
-                    self.qr_image_data = buffer.getvalue()
-                    
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(self.qr_image_data)
-                    self.qr_preview.setPixmap(
-                        pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    )
-                    
-                except Exception as e:
-                    QMessageBox.warning(self, "Error", f"Error generando QR automático: {str(e)}")
+                # El payload se arma con el documento ya normalizado (ver prepare_qr)
+                # y se codifica en segundo plano junto con el guardado
+                self.auto_qr = True
             else:
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data("Sin datos")
-                qr.make(fit=True)
-                img = qr.make_image(fill_color="black", back_color="white")
-                buffer = BytesIO()
-                img.save(buffer, format="PNG")
-                self.qr_image_data = buffer.getvalue()
+                self.qr_payload = engine.NO_DATA_QR
+    
+    def prepare_qr(self, context):
+        """Arma el payload del QR automático con el mismo contexto que se guarda.
         
+        Un QR manual con otro número de comprobante (por ejemplo, generado antes
+        de reservar el número) también se rehace, para que apunte a este documento.
+        """
+        qr_data = engine.build_qr_data('factura', context)
+        if isinstance(self.qr_payload, dict) and self.qr_payload.get('nroCmp') != qr_data['nroCmp']:
+            self.auto_qr = True
+        if self.auto_qr:
+            self.qr_image_data = None
+            self.qr_payload = qr_data
+    
+    def collect_record(self):
+        """Arma el registro plano que consume engine a partir del formulario"""
+        record = {
+            'business_data': {
+                'business_name': self.business_name.text(),
+                'address': self.business_address.text(),
+                'vat_condition': self.business_vat.text(),
+                'tax_id': self.business_tax_id.text(),
+                'gross_income_id': self.business_gross_income.text(),
+                'start_date': self.business_start_date.date().toString("yyyy-MM-dd")
+            },
+            'bill': {
+                'type': self.bill_type.text(),
+                'point_of_sale': self.bill_point_of_sale.text(),
+                'number': self.bill_number.text(),
+                'date': self.bill_date.date().toString("yyyy-MM-dd"),
+                'since': self.bill_since.date().toString("yyyy-MM-dd"),
+                'until': self.bill_until.date().toString("yyyy-MM-dd"),
+                'expiration': self.bill_expiration.date().toString("yyyy-MM-dd"),
+                'CAE': self.bill_cae.text(),
+                'CAE_expiration': self.bill_cae_expiration.date().toString("yyyy-MM-dd")
+            },
+            'billing_data': {
+                'name': self.client_name.text(),
+                'address': self.client_address.text(),
+                'tax_id': self.client_tax_id.text(),
+                'vat_condition': self.client_vat.text(),
+                'payment_method': self.client_payment.text()
+            },
+            'items': self.items_model.items(),
+            'overall': {
+                'subtotal': self.total_subtotal.text(),
+                'impost_tax': self.total_tax.text(),
+                'total': self.total_total.text()
+            }
+        }
+        
+        return record
+    
+    def generate_invoice(self):
+        """Genera la factura HTML"""
         reply = QMessageBox.question(
             self, "Guardar archivos",
             "¿Desea guardar los archivos en una carpeta?\n\n"
@@ -527,461 +686,80 @@ class FacturaTab(QWidget):
         if reply == QMessageBox.Cancel:
             return
         
-        business_data = {
-            'business_name': self.business_name.text() or "EMPRESA S.A.",
-            'address': self.business_address.text() or "Calle 123, Ciudad",
-            'vat_condition': self.business_vat.text() or "Responsable Inscripto",
-            'tax_id': self.business_tax_id.text() or "30-12345678-9",
-            'gross_income_id': self.business_gross_income.text() or "123-456789-0",
-            'start_date': self.business_start_date.date().toString("yyyy-MM-dd")
-        }
-        
-        bill_data = {
-            'type': self.bill_type.text() or "A",
-            'point_of_sale': self.bill_point_of_sale.text() or "0001",
-            'number': self.bill_number.text() or "00001234",
-            'date': self.bill_date.date().toString("yyyy-MM-dd"),
-            'since': self.bill_since.date().toString("yyyy-MM-dd"),
-            'until': self.bill_until.date().toString("yyyy-MM-dd"),
-            'expiration': self.bill_expiration.date().toString("yyyy-MM-dd"),
-            'CAE': self.bill_cae.text() or "12345678901234",
-            'CAE_expiration': self.bill_cae_expiration.date().toString("yyyy-MM-dd")
-        }
-        
-        billing_data = {
-            'name': self.client_name.text() or "Cliente S.A.",
-            'address': self.client_address.text() or "Calle 456, Ciudad",
-            'tax_id': self.client_tax_id.text() or "30-98765432-1",
-            'vat_condition': self.client_vat.text() or "Responsable Inscripto",
-            'payment_method': self.client_payment.text() or "Contado"
-        }
-        
-        items = []
-        for i in range(self.items_layout.count()):
-            widget = self.items_layout.itemAt(i).widget()
-            if widget:
-                children = widget.findChildren(QLineEdit)
-                if len(children) >= 9:
-                    items.append({
-                        'code': children[0].text() or "001",
-                        'name': children[1].text() or "Producto",
-                        'quantity': children[2].text() or "1",
-                        'measurement_unit': children[3].text() or "unidad",
-                        'price': children[4].text() or "100.00",
-                        'percent_subsidized': children[5].text() or "0",
-                        'impost_subsidized': children[6].text() or "0.00",
-                        'subtotal': children[7].text() or "100.00"
-                    })
-        
-        if not items:
-            items.append({
-                'code': "001",
-                'name': "Producto/Servicio",
-                'quantity': "1",
-                'measurement_unit': "unidad",
-                'price': "100.00",
-                'percent_subsidized': "0",
-                'impost_subsidized': "0.00",
-                'subtotal': "100.00"
-            })
+        if reply == QMessageBox.Yes:
+            target = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta para guardar")
+        else:
+            target, _ = QFileDialog.getSaveFileName(
+                self, "Guardar Factura HTML", self.suggested_filename('html'), "HTML Files (*.html)"
+            )
+        # El número se reserva recién con el destino elegido: cancelar no lo consume
+        if not target or not self.ensure_number():
+            return
+        self.ensure_qr()
         
-        overall = {
-            'subtotal': self.total_subtotal.text() or "100.00",
-            'impost_tax': self.total_tax.text() or "21.00",
-            'total': self.total_total.text() or "121.00"
-        }
+        record = self.collect_record()
+        remember_profiles(record)
+        context = engine.prepare_document('factura', record)
+        self.prepare_qr(context)
+        qr_format = self.qr_output_format()
         
         if reply == QMessageBox.Yes:
-            folder = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta para guardar")
-            if folder:
-                folder_path = Path(folder) / f"factura_{bill_data['number']}"
-                folder_path.mkdir(exist_ok=True)
-                
-                qr_filename = folder_path / "qr_code.png"
-                with open(qr_filename, 'wb') as f:
-                    f.write(self.qr_image_data)
-                
-                template_str = self.get_factura_template()
-                template = Template(template_str)
-                html_content = template.render(
-                    business_data=business_data,
-                    bill=bill_data,
-                    billing_data=billing_data,
-                    items=items,
-                    overall=overall,
-                    qr_code_image="qr_code.png"
-                )
-                
-                html_filename = folder_path / "factura.html"
-                with open(html_filename, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                QMessageBox.information(
-                    self, "Éxito", 
-                    f"Archivos guardados en:\n{folder_path}\n\n"
-                    f"• factura.html\n• qr_code.png"
-                )
+            self.save_in_background(
+                workers.save_document, 'factura', context, self.qr_image_data, self.qr_payload,
+                qr_format, target, False,
+                message=f"Archivos guardados en:\n{{path}}\n\n• factura.html\n• qr_code.{qr_format}"
+            )
         else:
-            filename, _ = QFileDialog.getSaveFileName(
-                self, "Guardar Factura HTML", f"factura_{bill_data['number']}.html", "HTML Files (*.html)"
+            self.save_in_background(
+                workers.save_document, 'factura', context, self.qr_image_data, self.qr_payload,
+                qr_format, target, True,
+                message="Factura HTML guardada en:\n{path}"
             )
-            if filename:
-                qr_base64 = base64.b64encode(self.qr_image_data).decode()
-                
-                template_str = self.get_factura_template()
-                template = Template(template_str)
-                html_content = template.render(
-                    business_data=business_data,
-                    bill=bill_data,
-                    billing_data=billing_data,
-                    items=items,
-                    overall=overall,
-                    qr_code_image=f"data:image/png;base64,{qr_base64}"
-                )
-                
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                QMessageBox.information(self, "Éxito", f"Factura HTML guardada en:\n{filename}")
+    
+    def generate_invoice_pdf(self):
+        """Exporta la factura a PDF con el motor de texto de Qt"""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Factura PDF", self.suggested_filename('pdf'), "PDF Files (*.pdf)"
+        )
+        if not filename or not self.ensure_number():
+            return
+        self.ensure_qr()
+        record = self.collect_record()
+        remember_profiles(record)
+        context = engine.prepare_document('factura', record)
+        self.prepare_qr(context)
+        
+        self.save_in_background(
+            workers.export_pdf, 'factura', context, self.qr_image_data, self.qr_payload, filename,
+            message="Factura PDF guardada en:\n{path}"
+        )
     
     def get_factura_template(self):
-        return """<!DOCTYPE html>
-<html>
-<head>
-    <title>Factura</title>
-    <style type="text/css">
-        * {
-            box-sizing: border-box;
-            -webkit-user-select: none;
-            -moz-user-select: none;
-            -ms-user-select: none;
-            user-select: none;
-        }
+        return engine.get_factura_template()
 
-        .bill-container {
-            width: 750px;
-            position: absolute;
-            left: 0;
-            right: 0;
-            margin: auto;
-            border-collapse: collapse;
-            font-family: sans-serif;
-            font-size: 13px;
-        }
 
-        .bill-emitter-row td {
-            width: 50%;
-            border-bottom: 1px solid;
-            padding-top: 10px;
-            padding-left: 10px;
-            vertical-align: top;
-        }
-
-        .bill-emitter-row {
-            position: relative;
-        }
-
-        .bill-emitter-row td:nth-child(2) {
-            padding-left: 60px;
-        }
-
-        .bill-emitter-row td:nth-child(1) {
-            padding-right: 60px;
-        }
-
-        .bill-type {
-            border: 1px solid;
-            border-top: 1px solid;
-            border-bottom: 1px solid;
-            margin-right: -30px;
-            background: white;
-            width: 60px;
-            height: 50px;
-            position: absolute;
-            left: 0;
-            right: 0;
-            top: -1px;
-            margin: auto;
-            text-align: center;
-            font-size: 40px;
-            font-weight: 600;
-        }
-
-        .text-lg {
-            font-size: 30px;
-        }
-
-        .text-center {
-            text-align: center;
-        }
-
-        .col-2 {
-            width: 16.66666667%;
-            float: left;
-        }
-
-        .col-3 {
-            width: 25%;
-            float: left;
-        }
-
-        .col-4 {
-            width: 33.3333333%;
-            float: left;
-        }
-
-        .col-5 {
-            width: 41.66666667%;
-            float: left;
-        }
-
-        .col-6 {
-            width: 50%;
-            float: left;
-        }
-
-        .col-8 {
-            width: 66.66666667%;
-            float: left;
-        }
-
-        .col-10 {
-            width: 83.33333333%;
-            float: left;
-        }
-
-        .row {
-            overflow: hidden;
-        }
-
-        .margin-b-0 {
-            margin-bottom: 0px;
-        }
-
-        .bill-row td {
-            padding-top: 5px
-        }
-
-        .bill-row td>div {
-            border-top: 1px solid;
-            border-bottom: 1px solid;
-            margin: 0 -1px 0 -2px;
-            padding: 0 10px 13px 10px;
-        }
-
-        .row-details table {
-            border-collapse: collapse;
-            width: 100%;
-        }
-
-        .row-details td>div,
-        .row-qrcode td>div {
-            border: 0;
-            margin: 0 -1px 0 -2px;
-            padding: 0;
-        }
-
-        .row-details table td {
-            padding: 5px;
-        }
-
-        .row-details table tr:nth-child(1) {
-            border-top: 1px solid;
-            border-bottom: 1px solid;
-            background: #c0c0c0;
-            font-weight: bold;
-            text-align: center;
-        }
-
-        .row-details table tr+tr {
-            border-top: 1px solid #c0c0c0;
-
-        }
-
-        .text-right {
-            text-align: right;
-        }
-
-        .margin-b-10 {
-            margin-bottom: 10px;
-        }
-
-        .total-row td>div {
-            border-width: 2px;
-        }
-
-        .row-qrcode td {
-            padding: 10px;
-        }
-
-        #qrcode {
-            width: 50%
-        }
-    </style>
-</head>
-
-<body>
-    <table class="bill-container">
-        <tr class="bill-emitter-row">
-            <td>
-                <div class="bill-type">
-                    {{ bill['type'] }}
-                </div>
-                <div class="text-lg text-center">
-                    {{ business_data['business_name'] }}
-                </div>
-                <p><strong>Razón social:</strong> {{ business_data['business_name'] }}</p>
-                <p><strong>Domicilio Comercial:</strong> {{ business_data['address'] }}</p>
-                <p><strong>Condición Frente al IVA:</strong> {{ business_data['vat_condition'] }}</p>
-            </td>
-            <td>
-                <div>
-                    <div class="text-lg">
-                        Factura
-                    </div>
-                    <div class="row">
-                        <p class="col-6 margin-b-0">
-                            <strong>Punto de Venta: {{ bill['point_of_sale'] }}</strong>
-                        </p>
-                        <p class="col-6 margin-b-0">
-                            <strong>Comp. Nro: {{ bill['number'] }} </strong>
-                        </p>
-                    </div>
-                    <p><strong>Fecha de Emisión:</strong> {{ bill['date'] }}</p>
-                    <p><strong>CUIT:</strong> {{ business_data['tax_id'] }}</p>
-                    <p><strong>Ingresos Brutos:</strong> {{ business_data['gross_income_id'] }}</p>
-                    <p><strong>Fecha de Inicio de Actividades:</strong> {{ business_data['start_date'] }}</p>
-                </div>
-            </td>
-        </tr>
-        <tr class="bill-row">
-            <td colspan="2">
-                <div class="row">
-                    <p class="col-4 margin-b-0">
-                        <strong>Período Facturado Desde: </strong>{{ bill['since'] }}
-                    </p>
-                    <p class="col-3 margin-b-0">
-                        <strong>Hasta: </strong>{{ bill['until'] }}
-                    </p>
-                    <p class="col-5 margin-b-0">
-                        <strong>Fecha de Vto. para el pago: </strong>{{ bill['expiration'] }}
-                    </p>
-                </div>
-            </td>
-        </tr>
-        <tr class="bill-row">
-            <td colspan="2">
-                <div>
-                    <div class="row">
-                        <p class="col-4 margin-b-0">
-                            <strong>CUIL/CUIT: </strong>{{ billing_data['tax_id'] }}
-                        </p>
-                        <p class="col-8 margin-b-0">
-                            <strong>Apellido y Nombre / Razón social: </strong>{{ billing_data['name'] }}
-                        </p>
-                    </div>
-                    <div class="row">
-                        <p class="col-6 margin-b-0">
-                            <strong>Condición Frente al IVA: </strong>{{ billing_data['vat_condition'] }}
-                        </p>
-                        <p class="col-6 margin-b-0">
-                            <strong>Domicilio: </strong>{{ billing_data['address'] }}
-                        </p>
-                    </div>
-                    <p>
-                        <strong>Condicion de venta: </strong>{{ billing_data['payment_method'] }}
-                    </p>
-                </div>
-            </td>
-        </tr>
-        <tr class="bill-row row-details">
-            <td colspan="2">
-                <div>
-                    <table>
-                        <tr>
-                            <td>Código</td>
-                            <td>Producto / Servicio</td>
-                            <td>Cantidad</td>
-                            <td>U. Medida</td>
-                            <td>Precio Unit.</td>
-                            <td>% Bonif.</td>
-                            <td>Imp. Bonif.</td>
-                            <td>Subtotal</td>
-                        </tr>
-                        {% for item in items %}
-                        <tr>
-                            <td>{{ item['code'] }}</td>
-                            <td>{{ item['name'] }}</td>
-                            <td>{{ item['quantity'] }}</td>
-                            <td>{{ item['measurement_unit'] }}</td>
-                            <td>{{ item['price'] }}</td>
-                            <td>{{ item['percent_subsidized'] }}</td>
-                            <td>{{ item['impost_subsidized'] }}</td>
-                            <td>{{ item['subtotal'] }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                </div>
-            </td>
-        </tr>
-        <tr class="bill-row total-row">
-            <td colspan="2">
-                <div>
-                    <div class="row text-right">
-                        <p class="col-10 margin-b-0">
-                            <strong>Subtotal: $</strong>
-                        </p>
-                        <p class="col-2 margin-b-0">
-                            <strong>{{ overall['subtotal'] }}</strong>
-                        </p>
-                    </div>
-                    <div class="row text-right">
-                        <p class="col-10 margin-b-0">
-                            <strong>Importe Otros Tributos: $</strong>
-                        </p>
-                        <p class="col-2 margin-b-0">
-                            <strong>{{ overall['impost_tax'] }}</strong>
-                        </p>
-                    </div>
-                    <div class="row text-right">
-                        <p class="col-10 margin-b-0">
-                            <strong>Importe total: $</strong>
-                        </p>
-                        <p class="col-2 margin-b-0">
-                            <strong>{{ overall['total'] }}</strong>
-                        </p>
-                    </div>
-                </div>
-            </td>
-        </tr>
-        <tr class="bill-row row-details">
-            <td>
-                <div>
-                    <div class="row">
-                        <img id="qrcode" src="{{ qr_code_image }}">
-                    </div>
-                </div>
-            </td>
-            <td>
-                <div>
-                    <div class="row text-right margin-b-10">
-                        <strong>CAE Nº:&nbsp;</strong> {{ bill['CAE'] }}
-                    </div>
-                    <div class="row text-right">
-                        <strong>Fecha de Vto. de CAE:&nbsp;</strong> {{ bill['CAE_expiration'] }}
-                    </div>
-                </div>
-            </td>
-        </tr>
-    </table>
-</body>
-</html>"""
+class PrintNotifier(QObject):
+    """Lleva el resultado de cada trabajo del hilo de impresión a la interfaz"""
+    finished = Signal(str, int, str)
+    # Contextos del trabajo, cola y error ("" si lp lo aceptó)
+    job_done = Signal(object, str, str)
 
 
 class TicketTab(QWidget):
     def __init__(self):
         super().__init__()
         self.qr_image_data = None
+        self.qr_payload = None
+        # Número y QR armados automáticamente: se descartan tras guardar o imprimir
+        self.auto_number = False
+        self.auto_qr = False
+        self.spooler = None
+        # Tickets en cola con número automático: si la impresión falla, el número se devuelve
+        self.numbered_prints = set()
+        self.print_notifier = PrintNotifier()
+        self.print_notifier.finished.connect(self.on_print_finished)
+        self.print_notifier.job_done.connect(self.on_print_job_done)
+        QCoreApplication.instance().aboutToQuit.connect(self.close_spooler)
         self.init_ui()
         
     def init_ui(self):
@@ -1002,6 +780,9 @@ class TicketTab(QWidget):
         self.ticket_business_gross_income = QLineEdit()
         self.ticket_business_start_date = QDateEdit(datetime.now().date())
         
+        ProfileCompleter('issuers', self.ticket_business_name, 'business_name', self.fill_business)
+        ProfileCompleter('issuers', self.ticket_business_tax_id, 'tax_id', self.fill_business)
+        
         business_layout.addRow("Razón Social:", self.ticket_business_name)
         business_layout.addRow("Dirección:", self.ticket_business_address)
         business_layout.addRow("CUIT:", self.ticket_business_tax_id)
@@ -1017,6 +798,7 @@ class TicketTab(QWidget):
         self.ticket_code = QLineEdit()
         self.ticket_point_of_sale = QLineEdit()
         self.ticket_number = QLineEdit()
+        self.ticket_number.setPlaceholderText("Automático")
         self.ticket_date = QDateEdit(datetime.now().date())
         self.ticket_concept = QLineEdit("Venta de productos")
         self.ticket_cae = QLineEdit()
@@ -1041,19 +823,19 @@ class TicketTab(QWidget):
         
         items_group = QGroupBox("Ítems del Ticket")
         items_layout = QVBoxLayout()
-        self.ticket_items_widget = QWidget()
-        self.ticket_items_layout = QVBoxLayout(self.ticket_items_widget)
+        self.ticket_items_editor = ItemsEditor(TICKET_COLUMNS)
+        self.ticket_items_model = self.ticket_items_editor.model
         
-        self.btn_add_ticket_item = QPushButton("+ Agregar Ítem")
-        self.btn_add_ticket_item.clicked.connect(self.add_ticket_item)
-        
-        items_layout.addWidget(self.ticket_items_widget)
-        items_layout.addWidget(self.btn_add_ticket_item)
+        items_layout.addWidget(self.ticket_items_editor)
         items_group.setLayout(items_layout)
         
         totals_group = QGroupBox("Totales")
         totals_layout = QFormLayout()
         self.ticket_total = QLineEdit()
+        self.ticket_total.setReadOnly(True)
+        self.ticket_tax_breakdown = QLabel()
+        self.ticket_items_editor.live_totals.changed.connect(self.update_totals)
+        totals_layout.addRow("IVA por alícuota:", self.ticket_tax_breakdown)
         totals_layout.addRow("Total:", self.ticket_total)
         totals_group.setLayout(totals_layout)
         
@@ -1082,15 +864,29 @@ class TicketTab(QWidget):
         qr_layout.addLayout(qr_options_layout)
         qr_layout.addWidget(QLabel("Vista previa:"))
         qr_layout.addWidget(self.qr_preview)
+        
+        self.qr_svg = QCheckBox("QR vectorial (SVG) en lugar de PNG")
+        self.qr_svg.setToolTip("Nítido al convertir a PDF, aunque el HTML pesa más que con PNG; no aplica a QR cargados desde archivo")
+        qr_layout.addWidget(self.qr_svg)
         qr_group.setLayout(qr_layout)
         
         buttons_layout = QHBoxLayout()
         
         self.btn_generate = QPushButton("Generar Ticket HTML")
         self.btn_generate.clicked.connect(self.generate_ticket)
+        self.btn_generate_pdf = QPushButton("Generar Ticket PDF")
+        self.btn_generate_pdf.clicked.connect(self.generate_ticket_pdf)
+        
+        self.ticket_printer = QLineEdit()
+        self.ticket_printer.setPlaceholderText("Impresora CUPS (vacío = predeterminada)")
+        self.btn_print = QPushButton("Imprimir Ticket")
+        self.btn_print.clicked.connect(self.print_ticket)
         
         buttons_layout.addWidget(self.btn_generate)
+        buttons_layout.addWidget(self.btn_generate_pdf)
         buttons_layout.addStretch()
+        buttons_layout.addWidget(self.ticket_printer)
+        buttons_layout.addWidget(self.btn_print)
         
         layout.addWidget(business_group)
         layout.addWidget(ticket_group)
@@ -1121,6 +917,8 @@ class TicketTab(QWidget):
         
         if dialog.exec():
             self.qr_image_data = dialog.get_qr_image()
+            self.qr_payload = dialog.get_qr_payload()
+            self.auto_qr = False
             if self.qr_image_data:
                 pixmap = QPixmap()
                 pixmap.loadFromData(self.qr_image_data)
@@ -1135,6 +933,9 @@ class TicketTab(QWidget):
         if filename:
             with open(filename, 'rb') as f:
                 self.qr_image_data = f.read()
+            # Con el payload leído el QR se puede volver a generar (por ejemplo en SVG)
+            self.qr_payload = read_qr_payload(self, self.qr_image_data)
+            self.auto_qr = False
             
             pixmap = QPixmap(filename)
             self.qr_preview.setPixmap(
@@ -1143,86 +944,170 @@ class TicketTab(QWidget):
     
     def clear_qr(self):
         self.qr_image_data = None
+        self.qr_payload = None
+        self.auto_qr = False
         self.qr_preview.setText("Sin QR")
         self.qr_preview.setPixmap(QPixmap())
     
+    def qr_output_format(self):
+        """'svg' si se pidió QR vectorial y se conoce el payload, si no 'png'"""
+        if self.qr_svg.isChecked() and self.qr_payload is not None:
+            return 'svg'
+        return 'png'
+    
+    def show_qr_preview(self, qr_image):
+        self.qr_image_data = qr_image
+        pixmap = QPixmap()
+        pixmap.loadFromData(qr_image)
+        self.qr_preview.setPixmap(
+            pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        )
+    
+    def save_in_background(self, func, *args, message=""):
+        """Ejecuta el guardado en el pool de tareas y avisa al terminar"""
+        self.btn_generate.setEnabled(False)
+        self.btn_generate_pdf.setEnabled(False)
+        
+        def finished(result):
+            path, qr_image = result
+            self.show_qr_preview(qr_image)
+            self.finish_document()
+            self.enable_save_buttons()
+            QMessageBox.information(self, "Éxito", message.format(path=path))
+        
+        def failed(error):
+            self.enable_save_buttons()
+            QMessageBox.warning(self, "Error", f"Error guardando: {error}")
+        
+        workers.submit(
+            func, *args, description=message,
+            on_finished=finished, on_failed=failed, on_cancelled=self.enable_save_buttons
+        )
+    
+    def enable_save_buttons(self):
+        self.btn_generate.setEnabled(True)
+        self.btn_generate_pdf.setEnabled(True)
+    
+    def fill_business(self, profile):
+        """Completa los datos del negocio con un emisor del catálogo"""
+        self.ticket_business_name.setText(profile['business_name'])
+        self.ticket_business_address.setText(profile['address'])
+        self.ticket_business_tax_id.setText(profile['tax_id'])
+        self.ticket_business_vat.setText(profile['vat_condition'])
+        self.ticket_business_gross_income.setText(profile['gross_income_id'])
+        if profile['start_date']:
+            self.ticket_business_start_date.setDate(QDate.fromString(profile['start_date'], "yyyy-MM-dd"))
+    
     def add_ticket_item(self):
-        item_widget = QWidget()
-        item_layout = QHBoxLayout(item_widget)
-        
-        qty = QLineEdit()
-        qty.setPlaceholderText("Cant.")
-        name = QLineEdit()
-        name.setPlaceholderText("Producto")
-        tax = QLineEdit()
-        tax.setPlaceholderText("IVA %")
-        price = QLineEdit()
-        price.setPlaceholderText("Precio")
-        
-        btn_remove = QPushButton("X")
-        btn_remove.clicked.connect(lambda: self.remove_ticket_item(item_widget))
-        
-        for widget in [qty, name, tax, price, btn_remove]:
-            widget.setMaximumWidth(100)
-            item_layout.addWidget(widget)
-        
-        self.ticket_items_layout.addWidget(item_widget)
+        self.ticket_items_editor.add_row()
     
-    def remove_ticket_item(self, widget):
-        widget.deleteLater()
+    def update_totals(self):
+        document_totals = self.ticket_items_editor.live_totals.totals
+        if not document_totals.count():
+            self.ticket_total.clear()
+            self.ticket_tax_breakdown.clear()
+            return
+        self.ticket_tax_breakdown.setText(totals.describe(document_totals))
+        self.ticket_total.setText(totals.format_amount(document_totals.total()))
     
-    def generate_ticket(self):
-        """Genera el ticket HTML"""
-        if not self.qr_image_data:
+    def ensure_number(self):
+        """Si el número está vacío reserva el próximo de la secuencia local"""
+        if self.ticket_number.text().strip():
+            return True
+        try:
+            import numbering
+            bill = {'type': self.ticket_type.text(), 'point_of_sale': self.ticket_point_of_sale.text()}
+            self.ticket_number.setText(numbering.next_number(bill))
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo asignar el número: {e}")
+            return False
+        self.auto_number = True
+        return True
+    
+    def suggested_filename(self, extension):
+        """Nombre propuesto al guardar; sin número muestra el próximo sin reservarlo"""
+        bill = {'type': self.ticket_type.text(), 'point_of_sale': self.ticket_point_of_sale.text(),
+                'number': self.ticket_number.text().strip()}
+        if not bill['number']:
+            try:
+                import numbering
+                bill['number'] = numbering.peek_number(bill)
+            except Exception:
+                pass
+        return f"{engine.document_name('ticket', bill)}.{extension}"
+    
+    def finish_document(self):
+        """Tras guardar o imprimir libera el número y el QR automáticos para el próximo documento"""
+        if self.auto_number:
+            self.ticket_number.clear()
+            self.auto_number = False
+        if self.auto_qr:
+            self.qr_image_data = None
+            self.qr_payload = None
+            self.auto_qr = False
+    
+    def ensure_qr(self):
+        """Si no hay QR ofrece generarlo con los datos del documento o usa uno vacío"""
+        if not self.qr_image_data and self.qr_payload is None:
             reply = QMessageBox.question(
                 self, "Sin QR",
                 "No se ha generado o cargado un QR. ¿Desea generar uno automáticamente?",
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                try:
-                    qr_data = {
-                        'ver': 1,
-                        'fecha': self.ticket_date.date().toString("yyyy-MM-dd"),
-                        'cuit': int(self.ticket_business_tax_id.text()) if self.ticket_business_tax_id.text() else 0,
-                        'ptoVta': int(self.ticket_point_of_sale.text()) if self.ticket_point_of_sale.text() else 0,
-                        'tipoCmp': 1 if self.ticket_type.text() == 'A' else 6,
-                        'nroCmp': int(self.ticket_number.text()) if self.ticket_number.text() else 0,
-                        'importe': float(self.ticket_total.text()) if self.ticket_total.text() else 0,
-                        'moneda': 'ARS',
-                        'ctz': 1,
-                        'tipoDocRec': 99,
-                        'nroDocRec': 0,
-                        'tipoCodAut': 'E',
-                        'codAut': int(self.ticket_cae.text()) if self.ticket_cae.text() else 0
-                    }
-                    
-                    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                    qr.add_data(json.dumps(qr_data))
-                    qr.make(fit=True)
-                    
-                    img = qr.make_image(fill_color="black", back_color="white")
-                    buffer = BytesIO()
-                    img.save(buffer, format="PNG")
-                    self.qr_image_data = buffer.getvalue()
-                    
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(self.qr_image_data)
-                    self.qr_preview.setPixmap(
-                        pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    )
-                    
-                except Exception as e:
-                    QMessageBox.warning(self, "Error", f"Error generando QR automático: {str(e)}")
+                # El payload se arma con el documento ya normalizado (ver prepare_qr)
+                # y se codifica en segundo plano junto con el guardado
+                self.auto_qr = True
             else:
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data("Sin datos")
-                qr.make(fit=True)
-                img = qr.make_image(fill_color="black", back_color="white")
-                buffer = BytesIO()
-                img.save(buffer, format="PNG")
-                self.qr_image_data = buffer.getvalue()
+                self.qr_payload = engine.NO_DATA_QR
+    
+    def prepare_qr(self, context):
+        """Arma el payload del QR automático con el mismo contexto que se guarda.
+        
+        Un QR manual con otro número de comprobante (por ejemplo, generado antes
+        de reservar el número) también se rehace, para que apunte a este documento.
+        """
+        qr_data = engine.build_qr_data('ticket', context)
+        if isinstance(self.qr_payload, dict) and self.qr_payload.get('nroCmp') != qr_data['nroCmp']:
+            self.auto_qr = True
+        if self.auto_qr:
+            self.qr_image_data = None
+            self.qr_payload = qr_data
+    
+    def collect_record(self):
+        """Arma el registro plano que consume engine a partir del formulario"""
+        record = {
+            'business_data': {
+                'business_name': self.ticket_business_name.text(),
+                'address': self.ticket_business_address.text(),
+                'tax_id': self.ticket_business_tax_id.text(),
+                'vat_condition': self.ticket_business_vat.text(),
+                'gross_income_id': self.ticket_business_gross_income.text(),
+                'start_date': self.ticket_business_start_date.date().toString("yyyy-MM-dd")
+            },
+            'bill': {
+                'type': self.ticket_type.text(),
+                'code': self.ticket_code.text(),
+                'point_of_sale': self.ticket_point_of_sale.text(),
+                'number': self.ticket_number.text(),
+                'date': self.ticket_date.date().toString("yyyy-MM-dd"),
+                'concept': self.ticket_concept.text(),
+                'CAE': self.ticket_cae.text(),
+                'CAE_expiration': self.ticket_cae_expiration.date().toString("yyyy-MM-dd")
+            },
+            'billing_data': {
+                'vat_condition': self.ticket_client_vat.text()
+            },
+            'items': self.ticket_items_model.items(),
+            'overall': {
+                'total': self.ticket_total.text()
+            }
+        }
         
+        return record
+    
+    def generate_ticket(self):
+        """Genera el ticket HTML"""
         reply = QMessageBox.question(
             self, "Guardar archivos",
             "¿Desea guardar los archivos en una carpeta?\n\n"
@@ -1234,243 +1119,135 @@ class TicketTab(QWidget):
         if reply == QMessageBox.Cancel:
             return
         
-        business_data = {
-            'business_name': self.ticket_business_name.text() or "EMPRESA S.A.",
-            'address': self.ticket_business_address.text() or "Calle 123, Ciudad",
-            'tax_id': self.ticket_business_tax_id.text() or "30-12345678-9",
-            'vat_condition': self.ticket_business_vat.text() or "Responsable Inscripto",
-            'gross_income_id': self.ticket_business_gross_income.text() or "123-456789-0",
-            'start_date': self.ticket_business_start_date.date().toString("yyyy-MM-dd")
-        }
-        
-        bill_data = {
-            'type': self.ticket_type.text() or "A",
-            'code': self.ticket_code.text() or "COD001",
-            'point_of_sale': self.ticket_point_of_sale.text() or "0001",
-            'number': self.ticket_number.text() or "00001234",
-            'date': self.ticket_date.date().toString("yyyy-MM-dd"),
-            'concept': self.ticket_concept.text() or "Venta de productos",
-            'CAE': self.ticket_cae.text() or "12345678901234",
-            'CAE_expiration': self.ticket_cae_expiration.date().toString("yyyy-MM-dd")
-        }
-        
-        billing_data = {
-            'vat_condition': self.ticket_client_vat.text() or "Consumidor Final"
-        }
-        
-        items = []
-        for i in range(self.ticket_items_layout.count()):
-            widget = self.ticket_items_layout.itemAt(i).widget()
-            if widget:
-                children = widget.findChildren(QLineEdit)
-                if len(children) >= 4:
-                    items.append({
-                        'quantity': children[0].text() or "1",
-                        'name': children[1].text() or "Producto",
-                        'tax_percent': children[2].text() or "21",
-                        'price': children[3].text() or "100.00"
-                    })
-        
-        if not items:
-            items.append({
-                'quantity': "1",
-                'name': "Producto",
-                'tax_percent': "21",
-                'price': "100.00"
-            })
+        if reply == QMessageBox.Yes:
+            target = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta para guardar")
+        else:
+            target, _ = QFileDialog.getSaveFileName(
+                self, "Guardar Ticket HTML", self.suggested_filename('html'), "HTML Files (*.html)"
+            )
+        # El número se reserva recién con el destino elegido: cancelar no lo consume
+        if not target or not self.ensure_number():
+            return
+        self.ensure_qr()
         
-        overall = {
-            'total': self.ticket_total.text() or "121.00"
-        }
+        record = self.collect_record()
+        remember_profiles(record)
+        context = engine.prepare_document('ticket', record)
+        self.prepare_qr(context)
+        qr_format = self.qr_output_format()
         
         if reply == QMessageBox.Yes:
-            folder = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta para guardar")
-            if folder:
-                folder_path = Path(folder) / f"ticket_{bill_data['number']}"
-                folder_path.mkdir(exist_ok=True)
-                
-                qr_filename = folder_path / "qr_code.png"
-                with open(qr_filename, 'wb') as f:
-                    f.write(self.qr_image_data)
-                
-                template_str = self.get_ticket_template()
-                template = Template(template_str)
-                html_content = template.render(
-                    business_data=business_data,
-                    bill=bill_data,
-                    billing_data=billing_data,
-                    items=items,
-                    overall=overall,
-                    qr_code_image="qr_code.png" 
-                )
-                
-                html_filename = folder_path / "ticket.html"
-                with open(html_filename, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                QMessageBox.information(
-                    self, "Éxito", 
-                    f"Archivos guardados en:\n{folder_path}\n\n"
-                    f"• ticket.html\n• qr_code.png"
-                )
+            self.save_in_background(
+                workers.save_document, 'ticket', context, self.qr_image_data, self.qr_payload,
+                qr_format, target, False,
+                message=f"Archivos guardados en:\n{{path}}\n\n• ticket.html\n• qr_code.{qr_format}"
+            )
         else:
-            filename, _ = QFileDialog.getSaveFileName(
-                self, "Guardar Ticket HTML", f"ticket_{bill_data['number']}.html", "HTML Files (*.html)"
+            self.save_in_background(
+                workers.save_document, 'ticket', context, self.qr_image_data, self.qr_payload,
+                qr_format, target, True,
+                message="Ticket HTML guardada en:\n{path}"
             )
-            if filename:
-                qr_base64 = base64.b64encode(self.qr_image_data).decode()
+    
+    def generate_ticket_pdf(self):
+        """Exporta el ticket a PDF con el motor de texto de Qt"""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Ticket PDF", self.suggested_filename('pdf'), "PDF Files (*.pdf)"
+        )
+        if not filename or not self.ensure_number():
+            return
+        self.ensure_qr()
+        record = self.collect_record()
+        remember_profiles(record)
+        context = engine.prepare_document('ticket', record)
+        self.prepare_qr(context)
+        
+        self.save_in_background(
+            workers.export_pdf, 'ticket', context, self.qr_image_data, self.qr_payload, filename,
+            message="Ticket PDF guardado en:\n{path}"
+        )
+    
+    def print_ticket(self):
+        """Encola el ticket para imprimir; el envío a CUPS ocurre en otro hilo"""
+        if not self.ensure_number():
+            return
+        self.ensure_qr()
+        record = self.collect_record()
+        remember_profiles(record)
+        context = engine.prepare_document('ticket', record)
+        self.prepare_qr(context)
+        
+        if self.qr_image_data is None:
+            workers.submit(
+                workers.encode_qr, self.qr_payload, description="QR",
+                on_finished=lambda qr_image: self.queue_print(context, qr_image),
+                on_failed=lambda error: QMessageBox.warning(self, "Error", f"Error generando QR: {error}")
+            )
+        else:
+            self.queue_print(context, self.qr_image_data)
+    
+    def queue_print(self, context, qr_image):
+        self.show_qr_preview(qr_image)
+        printer = self.ticket_printer.text().strip() or None
+        
+        try:
+            if self.spooler is None or self.spooler.printer != printer:
+                import printing
                 
-                template_str = self.get_ticket_template()
-                template = Template(template_str)
-                html_content = template.render(
-                    business_data=business_data,
-                    bill=bill_data,
-                    billing_data=billing_data,
-                    items=items,
-                    overall=overall,
-                    qr_code_image=f"data:image/png;base64,{qr_base64}"
+                self.close_spooler()
+                self.spooler = printing.PrintSpooler(
+                    printer, batch_size=10, flush_interval=1.0,
+                    on_result=lambda job_id, count, error: self.print_notifier.finished.emit(
+                        job_id or "", count, error or ""
+                    ),
+                    on_job=lambda kind, contexts, error: self.print_notifier.job_done.emit(
+                        contexts, printer or "", error or ""
+                    )
                 )
-                
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                QMessageBox.information(self, "Éxito", f"Ticket HTML guardada en:\n{filename}")
+            if self.auto_number:
+                self.numbered_prints.add(id(context))
+            self.spooler.submit('ticket', context, qr_image)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error enviando a imprimir: {str(e)}")
+            return
+        
+        self.finish_document()
+        self.window().statusBar().showMessage("Ticket enviado a la cola de impresión")
     
-    def get_ticket_template(self):
-        return """<!DOCTYPE html>
-<html>
-<head>
-    <title>Ticket</title>
-    <style type="text/css">
-        *{
-            box-sizing: border-box;
-            -webkit-user-select: none;
-            -moz-user-select: none;
-            -ms-user-select: none;
-            user-select: none;
-        }
-
-        .bill-container{
-            border-collapse: collapse;
-            max-width: 8cm;
-            position: absolute;
-            left:0;
-            right: 0;
-            margin: auto;
-            border-collapse: collapse;
-            font-family: monospace;
-            font-size: 12px;
-        }
-
-        .text-lg{
-            font-size: 20px;
-        }
-
-        .text-center{
-            text-align: center;
-        }
+    def on_print_finished(self, job_id, count, error):
+        if error:
+            QMessageBox.warning(self, "Error de impresión", f"No se pudieron imprimir {count} ticket(s):\n{error}")
+        else:
+            self.window().statusBar().showMessage(f"Trabajo {job_id or 'enviado'}: {count} ticket(s) impresos")
     
-
-        #qrcode {
-            width: 75%
-        }
-
-        p {
-            margin: 2px 0;
-        }
-
-        table table {
-            width: 100%;
-        }
-
-        
-        table table tr td:last-child{
-            text-align: right;
-        }
-
-        .border-top {
-            border-top: 1px dashed;
-        }
-
-        .padding-b-3 {
-            padding-bottom: 3px;
-        }
-
-        .padding-t-3 {
-            padding-top: 3px;
-        }
-
-    </style>
-</head>
-<body>
-    <table class="bill-container">
-        <tr>
-            <td class="padding-b-3">
-                <p>Razón social: {{ business_data['business_name'] }}</p>
-                <p>Direccion: {{ business_data['address'] }}</p>
-                <p>C.U.I.T.: {{ business_data['tax_id'] }}</p>
-                <p>{{ business_data['vat_condition'] }}</p>
-                <p>IIBB: {{ business_data['gross_income_id'] }}</p>
-                <p>Inicio de actividad: {{ business_data['start_date'] }}</p>
-            </td>
-        </tr>
-        <tr>
-            <td class="border-top padding-t-3 padding-b-3">
-                <p class="text-center text-lg">FACTURA {{ bill['type'] }}</p>
-                <p class="text-center">Codigo {{ bill['code'] }}</p>
-                <p>P.V: {{ bill['point_of_sale'] }}</p>
-                <p>Nro: {{ bill['number'] }}</p>
-                <p>Fecha: {{ bill['date'] }}</p>
-                <p>Concepto: {{ bill['concept'] }}</p>
-            </td>
-        </tr>
-        <tr>
-            <td class="border-top padding-t-3 padding-b-3">
-                <p>A {{ billing_data['vat_condition'] }}</p>
-            </td>
-        </tr>
-        <tr>
-            <td class="border-top padding-t-3 padding-b-3">
-                <div>
-                    <table>
-                        {% for item in items %}
-                            <tr>
-                                <td>{{ item['quantity'] }}</td>
-                                <td>{{ item['name'] }}</td>
-                                <td>{{ item['tax_percent'] }}</td>
-                                <td>{{ item['price'] }}</td>
-                            </tr>
-                        {% endfor %}
-                    </table>
-                </div>
-            </td>
-        </tr>
-        <tr>
-            <td class="border-top padding-t-3 padding-b-3">
-                <div>
-                    <table>
-                        <tr>
-                            <td>TOTAL</td>
-                            <td>{{ overall['total'] }}</td>
-                        </tr>
-                    </table>
-                </div>
-            </td>
-        </tr>
-        <tr>
-            <td class="border-top padding-t-3">
-                <p>CAE: {{ bill['CAE'] }}</p>
-                <p>Vto: {{ bill['CAE_expiration'] }}</p>
-            </td>
-        </tr>
-        <tr class="text-center">
-            <td>
-                <img id="qrcode" src="{{ qr_code_image }}">
-            </td>
-        </tr>
-    </table>
-</body>
-</html>"""
+    def on_print_job_done(self, contexts, printer, error):
+        """Un ticket impreso es un documento emitido: se anota cuando lp aceptó el trabajo"""
+        numbered = [context for context in contexts if id(context) in self.numbered_prints]
+        self.numbered_prints.difference_update(id(context) for context in contexts)
+        if error:
+            try:
+                import numbering
+                numbering.release(numbered)
+            except Exception as e:
+                QMessageBox.warning(self, "Error", f"No se pudo devolver el número a la secuencia: {e}")
+            return
+        try:
+            import ledger
+            
+            current = ledger.get_ledger()
+            if current is not None:
+                path = ledger.printed_path(printer)
+                current.record_many([ledger.entry('ticket', context, path) for context in contexts])
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo anotar el ticket en el registro: {e}")
+    
+    def close_spooler(self):
+        if self.spooler is not None:
+            self.spooler.close()
+            self.spooler = None
+    
+    def get_ticket_template(self):
+        return engine.get_ticket_template()
 
 
 class AboutTab(QWidget):
@@ -1569,10 +1346,48 @@ class AboutTab(QWidget):
         self.setLayout(layout)
 
 
+class LazyTab(QWidget):
+    """Contenedor que construye la pestaña real recién cuando se muestra por primera vez"""
+    built = Signal()
+    
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.widget = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+    
+    def ensure_widget(self):
+        if self.widget is None:
+            self.widget = self.factory()
+            self.layout().addWidget(self.widget)
+            self.built.emit()
+        return self.widget
+    
+    def showEvent(self, event):
+        self.ensure_widget()
+        super().showEvent(event)
+
+
+# Tiempo máximo desde que se importa app.py hasta el primer dibujado de la
+# ventana; ARCALINUX_STARTUP_BUDGET_MS permite ajustarlo
+STARTUP_BUDGET_MS = 1500
+
+
+def startup_budget_ms():
+    try:
+        return float(os.environ.get('ARCALINUX_STARTUP_BUDGET_MS', STARTUP_BUDGET_MS))
+    except ValueError:
+        return STARTUP_BUDGET_MS
+
+
 class MainWindow(QMainWindow):
+    first_paint = Signal(float)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("ArcaLinux - Desktop App")
+        self.startup_ms = None
         
         icon_path = resource_path("resources/app_icon.png")
         if os.path.exists(icon_path):
@@ -1581,20 +1396,67 @@ class MainWindow(QMainWindow):
         else:
             self.create_fallback_icon()
         
+        # Solo se construye la pestaña visible; el resto al activarla
         self.tab_widget = QTabWidget()
-        self.tab_widget.addTab(QRGeneratorTab(), "QR de Arca")
-        self.tab_widget.addTab(FacturaTab(), "Factura")
-        self.tab_widget.addTab(TicketTab(), "Ticket")
-        self.tab_widget.addTab(AboutTab(), "Acerca de")
+        for factory, title in ((QRGeneratorTab, "QR de Arca"), (FacturaTab, "Factura"),
+                               (TicketTab, "Ticket"), (AboutTab, "Acerca de")):
+            tab = LazyTab(factory)
+            tab.built.connect(self.fit_to_tabs)
+            self.tab_widget.addTab(tab, title)
         
         self.setCentralWidget(self.tab_widget)
         
         self.statusBar().showMessage("Listo")
         
+        self.task_progress = QProgressBar()
+        self.task_progress.setMaximumWidth(160)
+        self.task_progress.hide()
+        self.btn_cancel_tasks = QPushButton("Cancelar")
+        self.btn_cancel_tasks.hide()
+        self.statusBar().addPermanentWidget(self.task_progress)
+        self.statusBar().addPermanentWidget(self.btn_cancel_tasks)
+        
+        runner = workers.get_runner()
+        runner.progress.connect(self.on_task_progress)
+        runner.active_changed.connect(self.on_tasks_changed)
+        self.btn_cancel_tasks.clicked.connect(runner.cancel_all)
+        QCoreApplication.instance().aboutToQuit.connect(runner.wait)
+        
+        self.tab_widget.widget(0).ensure_widget()
         self.adjustSize()
         
         self.setMinimumSize(self.size())
     
+    def fit_to_tabs(self):
+        """Agranda la ventana si una pestaña recién construida no entra"""
+        if self.minimumSize().isEmpty():
+            return
+        size = self.minimumSize().expandedTo(self.sizeHint())
+        self.setMinimumSize(size)
+        self.resize(self.size().expandedTo(size))
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.startup_ms is None:
+            self.startup_ms = (time.perf_counter() - STARTED_AT) * 1000
+            self.first_paint.emit(self.startup_ms)
+    
+    def on_task_progress(self, percent, stage):
+        self.task_progress.setValue(percent)
+        if stage:
+            self.statusBar().showMessage(stage)
+    
+    def on_tasks_changed(self, active):
+        """Muestra la barra de progreso mientras haya tareas en cola o en curso"""
+        self.task_progress.setVisible(active > 0)
+        self.btn_cancel_tasks.setVisible(active > 0)
+        if active == 0:
+            self.statusBar().showMessage("Listo")
+        elif active > 1:
+            self.task_progress.setFormat(f"%p% ({active} en cola)")
+        else:
+            self.task_progress.setFormat("%p%")
+    
     def create_fallback_icon(self):
         """Crea un icono simple si no se encuentra el archivo de icono"""
         pixmap = QPixmap(64, 64)
@@ -1610,13 +1472,31 @@ class MainWindow(QMainWindow):
         QApplication.setWindowIcon(QIcon(pixmap))
 
 
+def report_startup(elapsed_ms, check=False):
+    """Compara el arranque con el presupuesto; con check=True informa siempre y cierra"""
+    budget = startup_budget_ms()
+    message = f"Arranque hasta el primer dibujado: {elapsed_ms:.0f} ms (presupuesto {budget:.0f} ms)"
+    if check or elapsed_ms > budget:
+        sys.stderr.write(message + "\n")
+    if check:
+        QCoreApplication.exit(0 if elapsed_ms <= budget else 1)
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+    
+    # --startup-check mide el arranque, lo compara con el presupuesto y sale
+    check = "--startup-check" in sys.argv
+    
     app = QApplication(sys.argv)
     app.setApplicationName("ArcaLinux")
     app.setOrganizationName("Arcynox")
     app.setStyle("Fusion")
     
     window = MainWindow()
+    window.first_paint.connect(lambda elapsed_ms: report_startup(elapsed_ms, check))
     window.show()
     
     sys.exit(app.exec())
@@ -0,0 +1,69 @@
+"""Payload del QR de comprobantes según la especificación de ARCA (ex AFIP).
+
+El QR no lleva el JSON en crudo sino una URL:
+
+    https://www.afip.gob.ar/fe/qr/?p=<JSON en base64>
+
+El JSON se serializa siempre igual: claves en el orden de la especificación,
+sin espacios y con el importe redondeado a centavos. Así el mismo comprobante
+produce siempre el mismo texto (y la misma entrada en la caché de QR).
+"""
+import json
+import base64
+from urllib.parse import urlparse, unquote
+
+QR_URL = "https://www.afip.gob.ar/fe/qr/?p="
+
+# Orden de los campos según la especificación
+FIELDS = (
+    'ver', 'fecha', 'cuit', 'ptoVta', 'tipoCmp', 'nroCmp', 'importe', 'moneda',
+    'ctz', 'tipoDocRec', 'nroDocRec', 'tipoCodAut', 'codAut'
+)
+
+# Campos que pueden omitirse (comprobantes sin receptor identificado)
+OPTIONAL_FIELDS = ('tipoDocRec', 'nroDocRec')
+
+
+def payload_json(data):
+    """JSON canónico del payload; las claves desconocidas van al final, en su orden"""
+    ordered = {}
+    for field in FIELDS:
+        value = data.get(field)
+        if value is None and field in OPTIONAL_FIELDS:
+            continue
+        ordered[field] = value
+    for key, value in data.items():
+        if key not in ordered and key not in FIELDS:
+            ordered[key] = value
+
+    if isinstance(ordered.get('importe'), (int, float)):
+        ordered['importe'] = round(ordered['importe'], 2)
+    return json.dumps(ordered, ensure_ascii=False, separators=(',', ':'))
+
+
+def payload_url(data):
+    """URL oficial que se codifica en el QR"""
+    encoded = base64.b64encode(payload_json(data).encode('utf-8')).decode('ascii')
+    return QR_URL + encoded
+
+
+def is_payload(data):
+    """True si ``data`` parece un payload de comprobante (dict con los campos de ARCA)"""
+    return isinstance(data, dict) and 'ver' in data and 'cuit' in data
+
+
+def decode_url(text):
+    """Inverso de payload_url: devuelve el dict o None si el texto no es un QR de ARCA"""
+    if not text.startswith(QR_URL.split('?')[0]):
+        return None
+    # Sin parse_qs: convertiría los "+" del base64 en espacios
+    params = [part[2:] for part in urlparse(text).query.split('&') if part.startswith('p=')]
+    if not params:
+        return None
+    encoded = unquote(params[0])
+    # Algunos lectores pierden el relleno "=" del final
+    encoded += "=" * (-len(encoded) % 4)
+    try:
+        return json.loads(base64.b64decode(encoded, altchars=b"+/", validate=False))
+    except ValueError:
+        return None
@@ -0,0 +1,236 @@
+"""Generación masiva en paralelo con un pool de procesos.
+
+La construcción del QR y el renderizado son CPU-bound, así que los registros
+se reparten en lotes entre varios procesos. Nunca hay más de ``max_pending``
+lotes en vuelo: la entrada se consume a medida que se liberan workers y la
+memoria usada no depende del tamaño del archivo.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import bundle
+import engine
+import instrument
+import ledger
+import numbering as sequences
+import output_writer
+
+# Sin número todos los documentos tomarían el de ejemplo y se pisarían entre sí
+MISSING_NUMBER = "El registro no trae bill.number (use --auto-number para numerarlo)"
+
+
+def _prepare_rows(kind, parse, chunk, numbering):
+    """Parsea y prepara cada fila: ([(indice, registro, contexto, error), ...], numerados)"""
+    prepared = []
+    for index, row in chunk:
+        try:
+            record = parse(row) if parse else row
+            context = engine.prepare_document(kind, record)
+        except Exception as e:
+            prepared.append((index, None, None, str(e)))
+        else:
+            if numbering or sequences.has_number(record):
+                prepared.append((index, record, context, None))
+            else:
+                prepared.append((index, None, None, MISSING_NUMBER))
+
+    numbered = []
+    if numbering:
+        # Los números de cada (punto de venta, tipo) se reservan de una vez por lote
+        numbered = sequences.assign_numbers(
+            [(record, context) for _, record, context, error in prepared if not error]
+        )
+    return prepared, numbered
+
+
+def _release(contexts, numbered):
+    """Devuelve los números automáticos de los documentos que no se emitieron"""
+    numbered_ids = {id(context) for context in numbered}
+    unused = [context for context in contexts if id(context) in numbered_ids]
+    if unused:
+        sequences.release(unused)
+
+
+def _render_chunk(kind, parse, out_dir, options, numbering, chunk):
+    """Se ejecuta en el worker: devuelve [(indice, ruta, error), ...]"""
+    results = []
+    entries = []
+    written = []
+    failed = []
+    prepared, numbered = _prepare_rows(kind, parse, chunk, numbering)
+    # Los archivos del lote se renombran juntos y con un fsync por carpeta;
+    # el registro se anota recién cuando ya están en disco
+    try:
+        with output_writer.batch():
+            for index, record, context, error in prepared:
+                if error:
+                    results.append((index, None, error))
+                    continue
+                try:
+                    path = engine.write_document(kind, record, context, out_dir, **options)
+                except Exception as e:
+                    results.append((index, None, str(e)))
+                    failed.append(context)
+                else:
+                    results.append((index, str(path), None))
+                    entries.append(ledger.entry(kind, context, path))
+                    written.append(context)
+    except BaseException:
+        _release(failed + written, numbered)
+        raise
+    _release(failed, numbered)
+    _record(entries)
+    return results
+
+
+def _record(entries):
+    """Anota los documentos del lote en el registro en una sola transacción"""
+    current = ledger.get_ledger()
+    if current is not None and entries:
+        current.record_many(entries)
+
+
+def _prepare_chunk(kind, parse, qr_format, numbering, chunk):
+    """Se ejecuta en el worker: devuelve [(indice, (contexto, qr), error, numerado), ...]"""
+    results = []
+    failed = []
+    prepared, numbered = _prepare_rows(kind, parse, chunk, numbering)
+    numbered_ids = {id(context) for context in numbered}
+    for index, record, context, error in prepared:
+        if error:
+            results.append((index, None, error, False))
+            continue
+        try:
+            qr_image = engine.build_document_qr(kind, record, context, qr_format)
+        except Exception as e:
+            results.append((index, None, str(e), False))
+            failed.append(context)
+        else:
+            results.append((index, (context, qr_image), None, id(context) in numbered_ids))
+    _release(failed, numbered)
+    return results
+
+
+def _chunks(rows, chunksize):
+    chunk = []
+    for index, row in enumerate(rows, start=1):
+        chunk.append((index, row))
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_jobs(jobs):
+    """0 o None usan todos los núcleos disponibles"""
+    if not jobs:
+        if hasattr(os, 'sched_getaffinity'):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def _map_chunks(func, args, rows, jobs, ordered, chunksize, max_pending):
+    """Aplica func(*args, chunk) a cada lote, en el proceso actual o en el pool"""
+    jobs = resolve_jobs(jobs)
+
+    if jobs == 1:
+        for chunk in _chunks(rows, chunksize):
+            yield from func(*args, chunk)
+        return
+
+    if max_pending is None:
+        max_pending = jobs * 4
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque() if ordered else set()
+
+        def drain(limit):
+            while len(pending) > limit:
+                if ordered:
+                    yield from pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        yield from future.result()
+
+        for chunk in _chunks(rows, chunksize):
+            future = executor.submit(func, *args, chunk)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            yield from drain(max_pending - 1)
+
+        yield from drain(0)
+
+
+def run_batch(kind, rows, out_dir, parse=None, jobs=1, ordered=True, chunksize=16,
+              max_pending=None, numbering=False, **options):
+    """Genera un documento por fila y devuelve un iterador de (indice, ruta, error).
+
+    ``parse`` convierte cada fila en un registro dentro del worker (por
+    ejemplo cli.parse_jsonl). Con ``ordered=False`` los resultados se entregan
+    a medida que terminan, sin esperar a los lotes anteriores. Con
+    ``numbering`` los registros sin bill.number se numeran automáticamente
+    (ver numbering); cada lote reserva sus números y devuelve los de los
+    documentos que fallan. Sin ``numbering`` los registros tienen que traer
+    bill.number, o se informan como error. El resto de las
+    opciones (embed_qr, qr_format, output) se pasan a engine.generate_document;
+    cada worker reutiliza su propio entorno de plantillas y renderer de PDF.
+    """
+    return _map_chunks(_render_chunk, (kind, parse, out_dir, options, numbering), rows,
+                       jobs, ordered, chunksize, max_pending)
+
+
+def prepare_batch(kind, rows, parse=None, jobs=1, ordered=True, chunksize=16,
+                  max_pending=None, qr_format='png', numbering=False):
+    """Arma contexto y QR de cada fila en el pool: (indice, (contexto, qr), error, numerado).
+
+    ``numerado`` indica que el número se asignó automáticamente: si el
+    documento no llega a emitirse hay que devolverlo con numbering.release().
+    """
+    return _map_chunks(_prepare_chunk, (kind, parse, qr_format, numbering), rows,
+                       jobs, ordered, chunksize, max_pending)
+
+
+def run_bundle(kind, rows, filename, parse=None, jobs=1, ordered=True, chunksize=16,
+               max_pending=None, qr_format='png', numbering=False):
+    """Escribe todos los documentos en un único HTML o PDF (ver bundle).
+
+    Los workers arman el contexto y el QR; la escritura del archivo se hace
+    en este proceso, de a un documento. Devuelve (indice, archivo, error).
+    """
+    if bundle.bundle_format(filename) == 'pdf':
+        qr_format = 'png'
+
+    prepared = prepare_batch(kind, rows, parse, jobs, ordered, chunksize, max_pending, qr_format, numbering)
+    # El registro se anota recién cuando el bundle reemplazó al archivo de destino
+    entries = []
+    # Números automáticos de los documentos ya agregados: vuelven si el bundle no se publica
+    added = []
+    try:
+        with bundle.open_bundle(kind, filename, qr_format) as output:
+            for index, document, error, numbered in prepared:
+                if error is None:
+                    try:
+                        # El QR se armó en el worker: aquí se mide el render y la escritura
+                        with instrument.document(kind, document[0]):
+                            output.add(*document)
+                    except Exception as e:
+                        error = str(e)
+                        if numbered:
+                            sequences.release([document[0]])
+                    else:
+                        entries.append(ledger.entry(kind, document[0], filename))
+                        if numbered:
+                            added.append(document[0])
+                yield index, None if error else str(filename), error
+    except BaseException:
+        if added:
+            sequences.release(added)
+        raise
+    _record(entries)
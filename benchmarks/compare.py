@@ -0,0 +1,62 @@
+"""Compara dos corridas de benchmarks/run.py y señala las regresiones.
+
+    python benchmarks/compare.py base.json nuevo.json --threshold 0.10
+
+Una medición empeora cuando cambia más que ``threshold`` (10 % por
+defecto) en la dirección mala: tiempos y bytes que suben, documentos por
+segundo que bajan. Termina con código 1 si hay alguna regresión.
+"""
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(base, new, threshold=0.10):
+    """Lista de (nombre, valor base, valor nuevo, cambio relativo, regresión)"""
+    rows = []
+    for name in sorted(set(base['results']) & set(new['results'])):
+        old = base['results'][name]
+        current = new['results'][name]
+        if not old['value']:
+            continue
+        change = (current['value'] - old['value']) / old['value']
+        worse = change > threshold if old.get('better', 'lower') == 'lower' else change < -threshold
+        rows.append((name, old, current, change, worse))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks")
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Cambio tolerado (0.10 = 10 %%)")
+    args = parser.parse_args(argv)
+
+    base = load(args.base)
+    new = load(args.new)
+    rows = compare(base, new, args.threshold)
+
+    print(f"base:  {base['meta'].get('revision')} ({base['meta'].get('date')})")
+    print(f"nuevo: {new['meta'].get('revision')} ({new['meta'].get('date')})")
+    width = max((len(name) for name, *_ in rows), default=10)
+    for name, old, current, change, worse in rows:
+        mark = "REGRESIÓN" if worse else ""
+        print(f"{name:<{width}}  {old['value']:>12} -> {current['value']:>12} {current['unit']:<7} "
+              f"{change:+7.1%}  {mark}")
+
+    missing = sorted(set(base['results']) ^ set(new['results']))
+    if missing:
+        print(f"Sin comparar (solo en una corrida): {', '.join(missing)}")
+
+    regressions = sum(1 for *_, worse in rows if worse)
+    print(f"{len(rows)} mediciones, {regressions} regresiones", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""Benchmarks de arranque, QR, renderizado, salida y generación masiva.
+
+    python benchmarks/run.py --output resultados.json
+    python benchmarks/run.py --only qr,render --repeat 10
+    python benchmarks/compare.py base.json resultados.json
+
+Cada medición se guarda en JSON con su valor (la mediana de las
+repeticiones en las de tiempo), la unidad y si es mejor que baje o que
+suba, junto con datos del equipo y la versión del código, para comparar
+dos corridas con compare.py.
+
+Las corridas no tocan los datos del usuario: la caché de QR y el registro
+están desactivados y las carpetas de datos apuntan a un directorio
+temporal.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+GROUPS = ('startup', 'qr', 'render', 'output', 'bulk')
+
+QR_SIZES = (64, 256, 1024, 2048)
+ITEM_COUNTS = (1, 50, 500)
+OUTPUT_DOCUMENTS = 50
+BULK_DOCUMENTS = 200
+
+
+def isolate(directory):
+    """Variables de entorno para que la corrida no use la caché ni los datos reales"""
+    os.environ['ARCALINUX_QR_CACHE'] = 'off'
+    os.environ['ARCALINUX_LEDGER'] = 'off'
+    os.environ['ARCALINUX_CACHE_DIR'] = str(Path(directory, "cache"))
+    os.environ['ARCALINUX_DATA_DIR'] = str(Path(directory, "data"))
+    if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def timings(func, repeat, warmup=True):
+    """Duración en segundos de cada una de ``repeat`` llamadas, tras una de calentamiento"""
+    if warmup:
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def metric(value, unit, better='lower', **extra):
+    return dict(value=value, unit=unit, better=better, **extra)
+
+
+def time_metric(durations, scale=1000, unit='ms'):
+    return metric(
+        round(statistics.median(durations) * scale, 3), unit,
+        min=round(min(durations) * scale, 3), max=round(max(durations) * scale, 3), runs=len(durations)
+    )
+
+
+def rate_metric(count, durations, unit='docs/s'):
+    return metric(round(count / statistics.median(durations), 1), unit, 'higher', runs=len(durations))
+
+
+def make_record(items=1, number=1):
+    """Registro sintético con ``items`` ítems de distintas alícuotas"""
+    rates = ("21", "10.5", "27")
+    return {
+        'bill': {'number': str(number)},
+        'items': [
+            {
+                'code': f"SKU{index:05d}",
+                'name': f"Producto de prueba {index}",
+                'quantity': str(1 + index % 3),
+                'measurement_unit': "unidades",
+                'price': f"{100 + index % 50}.50",
+                'tax_percent': rates[index % len(rates)]
+            }
+            for index in range(items)
+        ]
+    }
+
+
+def bench_startup(repeat):
+    """Arranque en frío de la ventana (proceso nuevo) hasta el primer dibujado"""
+    results = {}
+    env = dict(os.environ, ARCALINUX_STARTUP_BUDGET_MS="1000000")
+    paint = []
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, str(ROOT / "app.py"), "--startup-check"],
+            env=env, capture_output=True, text=True, timeout=120
+        )
+        wall.append(time.perf_counter() - start)
+        match = re.search(r"primer dibujado: (\d+) ms", completed.stderr)
+        if match:
+            paint.append(int(match.group(1)) / 1000)
+    if paint:
+        results['startup.first_paint'] = time_metric(paint)
+    results['startup.process'] = time_metric(wall)
+
+    cli = timings(lambda: subprocess.run(
+        [sys.executable, str(ROOT / "app.py"), "numbering", "--pto", "1", "--tipo", "1"],
+        env=env, capture_output=True, timeout=120
+    ), repeat)
+    results['startup.cli'] = time_metric(cli)
+    return results
+
+
+def bench_qr(repeat):
+    """Construcción del QR por tamaño de payload: matriz, PNG y SVG (sin caché)"""
+    import engine
+    import qr_service
+
+    results = {}
+    payloads = {f"{size}b": "A1b2C3d4-" * (size // 9) + "x" * (size % 9) for size in QR_SIZES}
+    payloads['arca'] = engine.build_qr_data('factura', engine.prepare_document('factura', {}))
+    for name, payload in payloads.items():
+        results[f"qr.matrix.{name}"] = time_metric(timings(lambda: qr_service.build_matrix(payload), repeat))
+        for fmt in ('png', 'svg'):
+            results[f"qr.{fmt}.{name}"] = time_metric(
+                timings(lambda: qr_service.encode(payload, fmt), repeat)
+            )
+    return results
+
+
+def bench_render(repeat):
+    """Documentos por segundo (contexto + plantilla, QR ya generado) según la cantidad de ítems"""
+    import engine
+
+    results = {}
+    for kind in ('factura', 'ticket'):
+        for count in ITEM_COUNTS:
+            record = make_record(count)
+            context = engine.prepare_document(kind, record)
+            qr_image = engine.build_document_qr(kind, record, context)
+            documents = max(1, 200 // count)
+
+            def run():
+                for _ in range(documents):
+                    engine.render_embedded(kind, engine.prepare_document(kind, record), qr_image)
+
+            results[f"render.{kind}.{count}items"] = rate_metric(documents, timings(run, repeat))
+    return results
+
+
+def _tree_size(path):
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(entry.stat().st_size for entry in path.rglob("*") if entry.is_file())
+
+
+def bench_output(repeat, directory):
+    """HTML con QR embebido contra carpeta con QR aparte: bytes y tiempo de escritura por documento"""
+    import engine
+
+    results = {}
+    documents = []
+    for qr_format in engine.QR_FORMATS:
+        for number in range(OUTPUT_DOCUMENTS):
+            record = make_record(5, number)
+            context = engine.prepare_document('ticket', record)
+            documents.append((qr_format, context, engine.build_document_qr('ticket', record, context, qr_format)))
+
+    for qr_format in engine.QR_FORMATS:
+        selected = [(context, qr_image) for fmt, context, qr_image in documents if fmt == qr_format]
+        for layout in ('embedded', 'folder'):
+            target = Path(directory, f"output-{layout}-{qr_format}")
+            paths = []
+
+            def run():
+                paths.clear()
+                target.mkdir(parents=True, exist_ok=True)
+                for context, qr_image in selected:
+                    if layout == 'embedded':
+                        filename = target / f"{engine.document_name('ticket', context['bill'])}.html"
+                        paths.append(engine.write_embedded('ticket', context, qr_image, filename, qr_format))
+                    else:
+                        paths.append(engine.write_folder('ticket', context, qr_image, target, qr_format))
+
+            durations = timings(run, repeat)
+            name = f"output.{layout}.{qr_format}"
+            results[f"{name}.write"] = time_metric([d / len(selected) for d in durations])
+            results[f"{name}.bytes"] = metric(sum(_tree_size(path) for path in paths) // len(paths), 'bytes')
+    return results
+
+
+def bench_bulk(repeat, directory, jobs_list):
+    """Generación masiva (tickets con QR embebido) con distinta cantidad de procesos"""
+    import batch
+
+    results = {}
+    rows = [json.dumps(make_record(5, number)) for number in range(BULK_DOCUMENTS)]
+    for jobs in jobs_list:
+        target = Path(directory, f"bulk-{jobs}")
+
+        def run():
+            for _, _, error in batch.run_batch('ticket', rows, target, parse=json.loads, jobs=jobs,
+                                               embed_qr=True):
+                if error:
+                    raise RuntimeError(error)
+
+        # Cada corrida ya arranca su propio pool: no hace falta calentar
+        results[f"bulk.ticket.jobs{jobs}"] = rate_metric(BULK_DOCUMENTS, timings(run, repeat, warmup=False))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "-C", str(ROOT), "describe", "--always", "--dirty"],
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def default_jobs():
+    count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    jobs = [1]
+    while jobs[-1] * 2 <= count:
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != count:
+        jobs.append(count)
+    return jobs
+
+
+def run(groups, repeat, jobs_list):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="arcalinux-bench-") as directory:
+        isolate(directory)
+        for group in groups:
+            started = time.perf_counter()
+            if group == 'startup':
+                results.update(bench_startup(repeat))
+            elif group == 'qr':
+                results.update(bench_qr(repeat))
+            elif group == 'render':
+                results.update(bench_render(repeat))
+            elif group == 'output':
+                results.update(bench_output(repeat, directory))
+            elif group == 'bulk':
+                results.update(bench_bulk(max(1, repeat // 3), directory, jobs_list))
+            print(f"{group}: {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de ArcaLinux")
+    parser.add_argument('--output', help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument('--only', help=f"Grupos separados por coma: {', '.join(GROUPS)}")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por medición")
+    parser.add_argument('--jobs', help="Procesos a probar en bulk, separados por coma (por defecto 1, 2, 4... hasta los núcleos)")
+    args = parser.parse_args(argv)
+
+    groups = args.only.split(",") if args.only else GROUPS
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"Grupos desconocidos: {', '.join(sorted(unknown))}")
+    jobs_list = [int(jobs) for jobs in args.jobs.split(",")] if args.jobs else default_jobs()
+
+    report = json.dumps(run(groups, max(1, args.repeat), jobs_list), indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding='utf-8')
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Salida en un solo archivo por lote: un HTML concatenado o un PDF multipágina.
+
+En lugar de una carpeta o un HTML por comprobante, todos los documentos del
+lote se escriben de forma incremental en un único archivo, con salto de
+página entre uno y otro. El formato se elige por la extensión (.pdf o .html).
+"""
+from pathlib import Path
+
+import engine
+import output_writer
+
+BUNDLE_FORMATS = ('html', 'pdf')
+
+# Las plantillas posicionan el contenedor en absoluto para centrarlo; dentro de
+# un bundle eso apilaría todos los documentos, así que se vuelve al flujo normal
+BUNDLE_STYLE = """
+        .bundle-page {
+            page-break-after: always;
+            break-after: page;
+        }
+
+        .bundle-page:last-child {
+            page-break-after: auto;
+            break-after: auto;
+        }
+
+        .bundle-page .bill-container {
+            position: static;
+        }
+"""
+
+
+def _between(html, start, end):
+    head, _, rest = html.partition(start)
+    inner, _, _ = rest.partition(end)
+    return inner
+
+
+class HtmlBundle:
+    """HTML único con un <div class="bundle-page"> por documento"""
+    def __init__(self, kind, filename, qr_format='png'):
+        self.kind = kind
+        self.filename = filename
+        self.qr_format = qr_format
+        self.count = 0
+        # Se escribe a un temporal que reemplaza al HTML recién en close()
+        self._tmp = output_writer.temporary_path(filename)
+        self._file = open(self._tmp, 'w', encoding='utf-8')
+        self._started = False
+
+    def add(self, context, qr_image):
+        html_content = engine.render_embedded(self.kind, context, qr_image, self.qr_format)
+        if not self._started:
+            style = _between(html_content, '<style type="text/css">', '</style>')
+            self._file.write(
+                "<!DOCTYPE html>\n<html>\n<head>\n"
+                f"    <title>{self.kind.capitalize()}s</title>\n"
+                f'    <style type="text/css">{style}{BUNDLE_STYLE}    </style>\n'
+                "</head>\n<body>\n"
+            )
+            self._started = True
+
+        body = _between(html_content, '<body>', '</body>')
+        self._file.write(f'<div class="bundle-page">{body}</div>\n')
+        self.count += 1
+
+    def close(self):
+        if self._file.closed:
+            return self.filename
+        if not self._started:
+            self._file.write("<!DOCTYPE html>\n<html>\n<head></head>\n<body>\n")
+        self._file.write("</body>\n</html>\n")
+        self._file.close()
+        output_writer.publish(self._tmp, self.filename)
+        return self.filename
+
+    def abort(self):
+        """Descarta el temporal sin tocar el archivo de destino"""
+        if not self._file.closed:
+            self._file.close()
+            output_writer.discard_temporary(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def bundle_format(filename):
+    return 'pdf' if str(filename).lower().endswith('.pdf') else 'html'
+
+
+def open_bundle(kind, filename, qr_format='png'):
+    """Abre un bundle según la extensión; add(context, qr_image) agrega un documento.
+
+    En PDF el QR siempre se pasa como PNG.
+    """
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    if bundle_format(filename) == 'pdf':
+        import pdf_export
+        return pdf_export.get_renderer().open_bundle(kind, filename)
+    return HtmlBundle(kind, filename, qr_format)
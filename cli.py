@@ -0,0 +1,402 @@
+"""Modo línea de comandos para generación masiva sin interfaz gráfica.
+
+Uso:
+    python app.py render --kind factura --input facturas.jsonl --out salida/
+    python cli.py render --kind ticket --input tickets.csv --out salida/ --embed-qr
+    python cli.py render --kind ticket --input tickets.jsonl --out salida/ --jobs 0 --unordered
+    python cli.py render --kind ticket --input tickets.jsonl --bundle cierre.pdf
+    python cli.py render --kind ticket --input tickets.jsonl --print caja1
+    python cli.py render --kind factura --input facturas.jsonl --out salida/ --auto-number
+    python cli.py numbering --pto 1 --tipo 1 --set 1500
+    python cli.py ledger --pto 1 --tipo 1 --nro 1234
+    python cli.py profiles --catalog clients --input clientes.csv
+    python cli.py products --input productos.csv
+    python cli.py ledger --desde 2024-01-01 --hasta 2024-01-31 --reprint reimpresion/
+    python cli.py verify salida/ --jobs 0
+    python cli.py serve --port 8710 --jobs 4
+    python cli.py render --kind ticket --input tickets.jsonl --out salida/ --timings tiempos.jsonl
+    python cli.py timings tiempos.jsonl --format prometheus
+
+Los registros se leen y procesan de a uno, por lo que la memoria usada no
+depende del tamaño del archivo de entrada.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import tempfile
+
+import batch
+import engine
+import instrument
+
+
+def read_jsonl(stream):
+    """Un registro JSON por línea; las líneas vacías se ignoran"""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_jsonl(line):
+    return json.loads(line)
+
+
+def read_csv(stream):
+    return csv.DictReader(stream)
+
+
+def parse_csv(row):
+    """Columnas 'seccion.campo' (ej. bill.number); 'items' y 'qr_data' van en JSON"""
+    record = {}
+    for column, value in row.items():
+        if column is None or value in (None, ""):
+            continue
+        if column in ('items', 'qr_data'):
+            record[column] = json.loads(value)
+        elif '.' in column:
+            section, field = column.split('.', 1)
+            record.setdefault(section, {})[field] = value
+    return record
+
+
+def open_records(path, input_format=None):
+    """Devuelve (archivo, filas sin procesar, función de parseo por fila)"""
+    if input_format is None:
+        input_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+    if input_format == 'csv':
+        return stream, read_csv(stream), parse_csv
+    return stream, read_jsonl(stream), parse_jsonl
+
+
+def render(args):
+    """Genera los documentos; --timings, --metrics y --profile miden la corrida"""
+    timings = args.timings or os.environ.get('ARCALINUX_TIMINGS')
+    targets = timings.split(os.pathsep) if timings else []
+    temporary = None
+    if args.metrics:
+        # Prometheus se arma desde un JSONL propio de la corrida, que también
+        # escriben los procesos del pool; los demás destinos siguen recibiendo las líneas
+        temporary = tempfile.NamedTemporaryFile(prefix="arcalinux-timings-", suffix=".jsonl", delete=False)
+        temporary.close()
+        targets.append(temporary.name)
+    if targets:
+        instrument.configure(targets)
+
+    try:
+        with instrument.profiled(args.profile):
+            status = render_records(args)
+        if args.metrics:
+            totals = instrument.aggregate(instrument.read_records(temporary.name))
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(instrument.prometheus_text(totals))
+    finally:
+        if temporary is not None:
+            os.unlink(temporary.name)
+    return status
+
+
+def render_records(args):
+    if args.no_ledger:
+        # Se hereda en los procesos del pool
+        os.environ['ARCALINUX_LEDGER'] = "off"
+
+    stream, rows, parse = open_records(args.input, args.format)
+    generated = 0
+    errors = 0
+
+    if args.print is not None:
+        try:
+            return print_records(args, rows, parse)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    try:
+        if args.bundle:
+            results = batch.run_bundle(
+                args.kind, rows, args.bundle, parse=parse, jobs=args.jobs,
+                ordered=not args.unordered, qr_format=args.qr_format, numbering=args.auto_number
+            )
+        else:
+            results = batch.run_batch(
+                args.kind, rows, args.out, parse=parse, jobs=args.jobs, ordered=not args.unordered,
+                numbering=args.auto_number, embed_qr=args.embed_qr, qr_format=args.qr_format,
+                output=args.output
+            )
+        for index, path, error in results:
+            if error:
+                errors += 1
+                print(f"Registro {index}: {error}", file=sys.stderr)
+                continue
+            generated += 1
+            if not args.quiet and not args.bundle:
+                print(path)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if args.bundle:
+        print(args.bundle)
+    print(f"{generated} documentos generados, {errors} errores", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def print_records(args, rows, parse):
+    """Envía los documentos a una cola CUPS en trabajos de --print-batch documentos"""
+    import ledger
+    import numbering
+    import printing
+
+    failures = []
+    printed = []
+    # Documentos numerados automáticamente: si su trabajo falla, el número se devuelve
+    numbered = set()
+
+    def on_result(job_id, count, error):
+        if error:
+            failures.append(count)
+            print(f"Error de impresión ({count} documentos): {error}", file=sys.stderr)
+        else:
+            printed.append(count)
+            if not args.quiet:
+                print(f"Trabajo {job_id or '?'}: {count} documentos")
+
+    # Se anotan en el registro solo los trabajos que lp aceptó, en una transacción por trabajo
+    current = ledger.get_ledger()
+    path = ledger.printed_path(args.print)
+
+    def on_job(kind, contexts, error):
+        try:
+            if error:
+                numbering.release([context for context in contexts if id(context) in numbered])
+            elif current is not None:
+                current.record_many([ledger.entry(kind, context, path) for context in contexts])
+        except Exception as e:
+            print(f"No se pudo actualizar el registro o la numeración ({len(contexts)} documentos): {e}",
+                  file=sys.stderr)
+        finally:
+            numbered.difference_update(id(context) for context in contexts)
+
+    spooler = printing.PrintSpooler(
+        args.print, batch_size=args.print_batch, on_result=on_result, on_job=on_job,
+        max_queued=args.print_batch * 4
+    )
+    errors = 0
+    try:
+        prepared = batch.prepare_batch(
+            args.kind, rows, parse, jobs=args.jobs, ordered=not args.unordered, numbering=args.auto_number
+        )
+        for index, document, error, auto_number in prepared:
+            if error:
+                errors += 1
+                print(f"Registro {index}: {error}", file=sys.stderr)
+                continue
+            if auto_number:
+                numbered.add(id(document[0]))
+            spooler.submit(args.kind, *document)
+    finally:
+        spooler.close()
+
+    print(f"{sum(printed)} documentos impresos, {errors + sum(failures)} errores", file=sys.stderr)
+    return 1 if errors or failures else 0
+
+
+def search_ledger(args):
+    """Lista (o reimprime) documentos del registro local"""
+    import ledger
+
+    current = ledger.Ledger(args.db) if args.db else ledger.get_ledger()
+    if current is None:
+        print("El registro está desactivado (ARCALINUX_LEDGER=off)", file=sys.stderr)
+        return 1
+
+    rows = current.find(
+        kind=args.kind, point_of_sale=args.pto, tipo_cmp=args.tipo, number=args.nro,
+        date_from=args.desde, date_to=args.hasta, cuit=args.cuit, limit=args.limit
+    )
+    for row in rows:
+        if args.reprint:
+            kind, context = current.get_context(row['id'])
+            print(engine.generate_document(kind, context, args.reprint, output=args.output))
+        else:
+            print("\t".join(str(row[column] if row[column] is not None else "") for column in (
+                'id', 'kind', 'bill_type', 'point_of_sale', 'number', 'date', 'cuit', 'total', 'cae', 'path'
+            )))
+
+    print(f"{len(rows)} documentos", file=sys.stderr)
+    return 0
+
+
+def show_numbering(args):
+    import numbering
+
+    store = numbering.get_store()
+    if args.set is not None:
+        store.set_next(args.pto, args.tipo, args.set)
+    print(numbering.format_number(store.peek(args.pto, args.tipo)))
+    return 0
+
+
+def import_profiles(args):
+    import profiles
+
+    count = profiles.import_csv(args.catalog, args.input)
+    print(f"{count} perfiles importados", file=sys.stderr)
+    return 0
+
+
+def import_products(args):
+    import products
+
+    count = products.import_csv(args.input)
+    print(f"{count} productos importados", file=sys.stderr)
+    return 0
+
+
+def verify_documents(args):
+    """Decodifica el QR de cada documento y lo compara con los datos impresos"""
+    import verify
+
+    checked = 0
+    failed = 0
+    for index, path, problems in verify.verify_tree(args.path, jobs=args.jobs, ordered=not args.unordered):
+        checked += 1
+        if problems:
+            failed += 1
+            for problem in problems:
+                print(f"{path}: {problem}")
+        elif args.verbose:
+            print(f"{path}: OK")
+
+    print(f"{checked} documentos verificados, {failed} con diferencias", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def serve(args):
+    """Servidor HTTP local para generar documentos a pedido"""
+    import server
+
+    try:
+        server.serve(
+            args.host, args.port, jobs=args.jobs, max_concurrency=args.max_concurrency,
+            max_queue=args.max_queue, numbering=args.auto_number, record=args.record
+        )
+    except (ValueError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def show_timings(args):
+    totals = instrument.aggregate(instrument.read_records(args.input))
+    if args.format == 'prometheus':
+        sys.stdout.write(instrument.prometheus_text(totals))
+    else:
+        sys.stdout.write(instrument.summary_text(totals))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="arcalinux", description="ArcaLinux sin interfaz gráfica")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help="Genera documentos desde CSV/JSONL")
+    render_parser.add_argument('--kind', choices=sorted(engine.KINDS), required=True)
+    render_parser.add_argument('--input', required=True, help="Archivo CSV/JSONL o '-' para stdin")
+    render_parser.add_argument('--format', choices=['csv', 'jsonl'], help="Por defecto según la extensión")
+    render_parser.add_argument('--out', help="Carpeta de salida")
+    render_parser.add_argument('--bundle', help="Un solo archivo .html o .pdf con todos los documentos")
+    render_parser.add_argument('--embed-qr', action='store_true', help="Un solo HTML con el QR embebido")
+    render_parser.add_argument('--print', nargs='?', const='', metavar='COLA',
+                               help="Imprimir en CUPS (sin COLA usa la impresora predeterminada)")
+    render_parser.add_argument('--print-batch', type=int, default=20, help="Documentos por trabajo de impresión")
+    render_parser.add_argument('--output', choices=engine.OUTPUTS, default='html',
+                               help="pdf exporta con el motor de Qt, sin wkhtmltopdf")
+    render_parser.add_argument('--qr-format', choices=engine.QR_FORMATS, default='png',
+                               help="svg genera el QR vectorial en línea (más nítido; el PNG pesa menos)")
+    render_parser.add_argument('--jobs', type=int, default=1, help="Procesos en paralelo (0 = todos los núcleos)")
+    render_parser.add_argument('--unordered', action='store_true', help="Listar resultados a medida que terminan")
+    render_parser.add_argument('--quiet', action='store_true', help="No listar las rutas generadas")
+    render_parser.add_argument('--auto-number', action='store_true',
+                               help="Numerar los registros sin bill.number con la secuencia local")
+    render_parser.add_argument('--no-ledger', action='store_true', help="No anotar los documentos en el registro local")
+    render_parser.add_argument('--timings', metavar='ARCHIVO',
+                               help="Tiempos por etapa de cada documento en JSONL ('-' para stderr)")
+    render_parser.add_argument('--metrics', metavar='ARCHIVO', help="Resumen de tiempos en formato de Prometheus")
+    render_parser.add_argument('--profile', metavar='ARCHIVO',
+                               help="Perfil del proceso principal (.prof con cProfile, .html con pyinstrument)")
+    render_parser.set_defaults(func=render)
+
+    ledger_parser = subparsers.add_parser('ledger', help="Busca y reimprime documentos emitidos")
+    ledger_parser.add_argument('--kind', choices=sorted(engine.KINDS))
+    ledger_parser.add_argument('--pto', type=int, help="Punto de venta")
+    ledger_parser.add_argument('--tipo', type=int, help="Tipo de comprobante (1 = A, 6 = B)")
+    ledger_parser.add_argument('--nro', type=int, help="Número de comprobante")
+    ledger_parser.add_argument('--desde', help="Fecha desde (AAAA-MM-DD)")
+    ledger_parser.add_argument('--hasta', help="Fecha hasta (AAAA-MM-DD)")
+    ledger_parser.add_argument('--cuit', type=int, help="CUIT del emisor")
+    ledger_parser.add_argument('--limit', type=int, default=100, help="Máximo de resultados (0 = sin límite)")
+    ledger_parser.add_argument('--reprint', metavar='CARPETA', help="Vuelve a generar los documentos encontrados")
+    ledger_parser.add_argument('--output', choices=engine.OUTPUTS, default='html')
+    ledger_parser.add_argument('--db', help="Archivo del registro (por defecto el de la aplicación)")
+    ledger_parser.set_defaults(func=search_ledger)
+
+    numbering_parser = subparsers.add_parser('numbering', help="Consulta o fija el próximo número")
+    numbering_parser.add_argument('--pto', type=int, required=True, help="Punto de venta")
+    numbering_parser.add_argument('--tipo', type=int, required=True, help="Tipo de comprobante (1 = A, 6 = B)")
+    numbering_parser.add_argument('--set', type=int, metavar='NUMERO', help="Próximo número a asignar")
+    numbering_parser.set_defaults(func=show_numbering)
+
+    profiles_parser = subparsers.add_parser('profiles', help="Importa clientes o emisores desde CSV")
+    profiles_parser.add_argument('--catalog', choices=['clients', 'issuers'], required=True)
+    profiles_parser.add_argument('--input', required=True,
+                                 help="CSV con columnas tax_id, name/business_name, address, vat_condition...")
+    profiles_parser.set_defaults(func=import_profiles)
+
+    products_parser = subparsers.add_parser('products', help="Importa el catálogo de productos desde CSV")
+    products_parser.add_argument('--input', required=True,
+                                 help="CSV con columnas code, name, measurement_unit, price, tax_percent")
+    products_parser.set_defaults(func=import_products)
+
+    verify_parser = subparsers.add_parser('verify', help="Verifica el QR de los documentos generados")
+    verify_parser.add_argument('path', help="Carpeta de salida o archivo HTML")
+    verify_parser.add_argument('--jobs', type=int, default=1, help="Procesos en paralelo (0 = todos los núcleos)")
+    verify_parser.add_argument('--unordered', action='store_true', help="Listar resultados a medida que terminan")
+    verify_parser.add_argument('--verbose', action='store_true', help="Listar también los documentos correctos")
+    verify_parser.set_defaults(func=verify_documents)
+
+    serve_parser = subparsers.add_parser('serve', help="Servidor HTTP local para puntos de venta")
+    serve_parser.add_argument('--host', default="127.0.0.1", help="Dirección de loopback donde escuchar")
+    serve_parser.add_argument('--port', type=int, default=8710)
+    serve_parser.add_argument('--jobs', type=int, default=4, help="Hilos de renderizado")
+    serve_parser.add_argument('--max-concurrency', type=int, help="Documentos en proceso a la vez (por defecto --jobs)")
+    serve_parser.add_argument('--max-queue', type=int, default=64, help="Pedidos en espera antes de responder 503")
+    serve_parser.add_argument('--auto-number', action='store_true',
+                              help="Numerar los registros sin bill.number con la secuencia local")
+    serve_parser.add_argument('--record', action='store_true',
+                              help="Anotar los documentos generados en el registro local (sin esto son vistas previas)")
+    serve_parser.set_defaults(func=serve)
+
+    timings_parser = subparsers.add_parser('timings', help="Resume un archivo de tiempos de render --timings")
+    timings_parser.add_argument('input', help="Archivo JSONL de tiempos")
+    timings_parser.add_argument('--format', choices=['summary', 'prometheus'], default='summary')
+    timings_parser.set_defaults(func=show_timings)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'render' and not (args.out or args.bundle or args.print is not None):
+        parser.error("render requiere --out, --bundle o --print")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
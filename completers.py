@@ -0,0 +1,125 @@
+"""Autocompletado de formularios a partir de los catálogos locales.
+
+El QCompleter no filtra por sí mismo: en cada tecla se consulta el índice
+del catálogo (búsqueda por prefijo, ver profiles y products) y el modelo del
+popup se reemplaza por las primeras coincidencias. Así el popup nunca tiene
+más de unas decenas de filas aunque el catálogo tenga cientos de miles.
+"""
+from PySide6.QtCore import QModelIndex, QObject, Qt
+from PySide6.QtGui import QStandardItem, QStandardItemModel
+from PySide6.QtWidgets import QCompleter, QLineEdit, QStyledItemDelegate
+
+import products
+import profiles
+
+# Rol con el valor asociado a la sugerencia (perfil, código de producto...)
+VALUE_ROLE = Qt.UserRole + 1
+
+MAX_SUGGESTIONS = 20
+
+
+class SuggestionCompleter(QObject):
+    """Completer sin filtrado propio: suggestions(texto) arma las filas del popup.
+
+    ``suggest(texto)`` provee las sugerencias; las subclases pueden, en cambio,
+    redefinir suggestions(). Sin ninguno de los dos el popup no muestra nada.
+    """
+    def __init__(self, line_edit, parent=None, suggest=None):
+        super().__init__(parent or line_edit)
+        self.line_edit = line_edit
+        self.suggest = suggest
+
+        self.model = QStandardItemModel(self)
+        self.completer = QCompleter(self.model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        # Lo que se escribe en el line edit al elegir (el popup muestra DisplayRole)
+        self.completer.setCompletionRole(Qt.UserRole)
+        self.completer.activated[QModelIndex].connect(self.on_activated)
+        line_edit.setCompleter(self.completer)
+        line_edit.textEdited.connect(self.update_suggestions)
+
+    def suggestions(self, text):
+        """Lista de (texto del popup, texto a completar, valor)"""
+        return self.suggest(text) if self.suggest else []
+
+    def selected(self, value):
+        pass
+
+    def update_suggestions(self, text):
+        self.model.clear()
+        for display, completion, value in self.suggestions(text):
+            item = QStandardItem(display)
+            item.setData(completion, Qt.UserRole)
+            item.setData(value, VALUE_ROLE)
+            self.model.appendRow(item)
+
+        if self.model.rowCount():
+            self.completer.complete()
+
+    def on_activated(self, index):
+        value = index.data(VALUE_ROLE)
+        if value is not None:
+            self.selected(value)
+
+
+class ProfileCompleter(SuggestionCompleter):
+    """Sugiere perfiles de ``catalog`` mientras se escribe en ``line_edit``.
+
+    ``field`` es el campo del perfil que se escribe en el line edit al elegir
+    una sugerencia; ``on_selected(perfil)`` completa el resto del formulario.
+    """
+    def __init__(self, catalog, line_edit, field, on_selected, parent=None):
+        super().__init__(line_edit, parent)
+        self.catalog = catalog
+        self.field = field
+        self.on_selected = on_selected
+
+    def suggestions(self, text):
+        # El catálogo se carga recién cuando se empieza a escribir
+        index = profiles.get_index(self.catalog)
+        results = []
+        for position in index.search(text, MAX_SUGGESTIONS):
+            profile = index.profile(position)
+            name = profiles.display_name(self.catalog, profile)
+            results.append((f"{name} — {profile['tax_id']}", profile.get(self.field, ""), profile))
+        return results
+
+    def selected(self, profile):
+        self.on_selected(profile)
+
+
+class ProductCompleter(SuggestionCompleter):
+    """Sugiere códigos del catálogo de productos; on_selected(codigo) al elegir uno"""
+    def __init__(self, line_edit, on_selected=None, parent=None):
+        super().__init__(line_edit, parent)
+        self.on_selected = on_selected
+
+    def suggestions(self, text):
+        if not text.strip():
+            return []
+        results = []
+        for product in products.get_index().search(text, MAX_SUGGESTIONS):
+            display = f"{product['code']} — {product['name']} ${product['price']}"
+            results.append((display, product['code'], product['code']))
+        return results
+
+    def selected(self, code):
+        if self.on_selected:
+            self.on_selected(code)
+
+
+class ProductCodeDelegate(QStyledItemDelegate):
+    """Editor de la columna de código con sugerencias del catálogo.
+
+    Elegir una sugerencia confirma la celda de inmediato, igual que un
+    lector de código de barras que termina con Enter.
+    """
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        ProductCompleter(editor, lambda code, editor=editor: self.commit(editor, code))
+        return editor
+
+    def commit(self, editor, code):
+        editor.setText(code)
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
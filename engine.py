@@ -0,0 +1,961 @@
+"""Motor de generación de documentos sin dependencia de Qt.
+
+Construye el QR, renderiza la plantilla Jinja y escribe los archivos a partir
+de diccionarios planos, de modo que facturas y tickets puedan generarse desde
+scripts, cron o timers de systemd sin necesidad de un display.
+"""
+import base64
+from datetime import datetime
+from pathlib import Path
+
+import instrument
+import output_writer
+import qr_service
+import totals
+from paths import cache_dir
+
+
+FACTURA_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Factura</title>
+    <style type="text/css">
+        * {
+            box-sizing: border-box;
+            -webkit-user-select: none;
+            -moz-user-select: none;
+            -ms-user-select: none;
+            user-select: none;
+        }
+
+        .bill-container {
+            width: 750px;
+            position: absolute;
+            left: 0;
+            right: 0;
+            margin: auto;
+            border-collapse: collapse;
+            font-family: sans-serif;
+            font-size: 13px;
+        }
+
+        .bill-emitter-row td {
+            width: 50%;
+            border-bottom: 1px solid;
+            padding-top: 10px;
+            padding-left: 10px;
+            vertical-align: top;
+        }
+
+        .bill-emitter-row {
+            position: relative;
+        }
+
+        .bill-emitter-row td:nth-child(2) {
+            padding-left: 60px;
+        }
+
+        .bill-emitter-row td:nth-child(1) {
+            padding-right: 60px;
+        }
+
+        .bill-type {
+            border: 1px solid;
+            border-top: 1px solid;
+            border-bottom: 1px solid;
+            margin-right: -30px;
+            background: white;
+            width: 60px;
+            height: 50px;
+            position: absolute;
+            left: 0;
+            right: 0;
+            top: -1px;
+            margin: auto;
+            text-align: center;
+            font-size: 40px;
+            font-weight: 600;
+        }
+
+        .text-lg {
+            font-size: 30px;
+        }
+
+        .text-center {
+            text-align: center;
+        }
+
+        .col-2 {
+            width: 16.66666667%;
+            float: left;
+        }
+
+        .col-3 {
+            width: 25%;
+            float: left;
+        }
+
+        .col-4 {
+            width: 33.3333333%;
+            float: left;
+        }
+
+        .col-5 {
+            width: 41.66666667%;
+            float: left;
+        }
+
+        .col-6 {
+            width: 50%;
+            float: left;
+        }
+
+        .col-8 {
+            width: 66.66666667%;
+            float: left;
+        }
+
+        .col-10 {
+            width: 83.33333333%;
+            float: left;
+        }
+
+        .row {
+            overflow: hidden;
+        }
+
+        .margin-b-0 {
+            margin-bottom: 0px;
+        }
+
+        .bill-row td {
+            padding-top: 5px
+        }
+
+        .bill-row td>div {
+            border-top: 1px solid;
+            border-bottom: 1px solid;
+            margin: 0 -1px 0 -2px;
+            padding: 0 10px 13px 10px;
+        }
+
+        .row-details table {
+            border-collapse: collapse;
+            width: 100%;
+        }
+
+        .row-details td>div,
+        .row-qrcode td>div {
+            border: 0;
+            margin: 0 -1px 0 -2px;
+            padding: 0;
+        }
+
+        .row-details table td {
+            padding: 5px;
+        }
+
+        .row-details table tr:nth-child(1) {
+            border-top: 1px solid;
+            border-bottom: 1px solid;
+            background: #c0c0c0;
+            font-weight: bold;
+            text-align: center;
+        }
+
+        .row-details table tr+tr {
+            border-top: 1px solid #c0c0c0;
+
+        }
+
+        .text-right {
+            text-align: right;
+        }
+
+        .margin-b-10 {
+            margin-bottom: 10px;
+        }
+
+        .total-row td>div {
+            border-width: 2px;
+        }
+
+        .row-qrcode td {
+            padding: 10px;
+        }
+
+        #qrcode {
+            width: 50%
+        }
+
+        #qrcode svg {
+            display: block;
+            width: 100%;
+            height: auto;
+        }
+    </style>
+</head>
+
+<body>
+    <table class="bill-container">
+        <tr class="bill-emitter-row">
+            <td width="50%">
+                <div class="bill-type">
+                    {{ bill['type'] }}
+                </div>
+                <div class="text-lg text-center">
+                    {{ business_data['business_name'] }}
+                </div>
+                <p><strong>Razón social:</strong> {{ business_data['business_name'] }}</p>
+                <p><strong>Domicilio Comercial:</strong> {{ business_data['address'] }}</p>
+                <p><strong>Condición Frente al IVA:</strong> {{ business_data['vat_condition'] }}</p>
+            </td>
+            <td width="50%">
+                <div>
+                    <div class="text-lg">
+                        Factura
+                    </div>
+                    <div class="row">
+                        <p class="col-6 margin-b-0">
+                            <strong>Punto de Venta: {{ bill['point_of_sale'] }}</strong>
+                        </p>
+                        <p class="col-6 margin-b-0">
+                            <strong>Comp. Nro: {{ bill['number'] }} </strong>
+                        </p>
+                    </div>
+                    <p><strong>Fecha de Emisión:</strong> {{ bill['date'] }}</p>
+                    <p><strong>CUIT:</strong> {{ business_data['tax_id'] }}</p>
+                    <p><strong>Ingresos Brutos:</strong> {{ business_data['gross_income_id'] }}</p>
+                    <p><strong>Fecha de Inicio de Actividades:</strong> {{ business_data['start_date'] }}</p>
+                </div>
+            </td>
+        </tr>
+        <tr class="bill-row">
+            <td colspan="2">
+                <div class="row">
+                    <p class="col-4 margin-b-0">
+                        <strong>Período Facturado Desde: </strong>{{ bill['since'] }}
+                    </p>
+                    <p class="col-3 margin-b-0">
+                        <strong>Hasta: </strong>{{ bill['until'] }}
+                    </p>
+                    <p class="col-5 margin-b-0">
+                        <strong>Fecha de Vto. para el pago: </strong>{{ bill['expiration'] }}
+                    </p>
+                </div>
+            </td>
+        </tr>
+        <tr class="bill-row">
+            <td colspan="2">
+                <div>
+                    <div class="row">
+                        <p class="col-4 margin-b-0">
+                            <strong>CUIL/CUIT: </strong>{{ billing_data['tax_id'] }}
+                        </p>
+                        <p class="col-8 margin-b-0">
+                            <strong>Apellido y Nombre / Razón social: </strong>{{ billing_data['name'] }}
+                        </p>
+                    </div>
+                    <div class="row">
+                        <p class="col-6 margin-b-0">
+                            <strong>Condición Frente al IVA: </strong>{{ billing_data['vat_condition'] }}
+                        </p>
+                        <p class="col-6 margin-b-0">
+                            <strong>Domicilio: </strong>{{ billing_data['address'] }}
+                        </p>
+                    </div>
+                    <p>
+                        <strong>Condicion de venta: </strong>{{ billing_data['payment_method'] }}
+                    </p>
+                </div>
+            </td>
+        </tr>
+        <tr class="bill-row row-details">
+            <td colspan="2">
+                <div>
+                    <table>
+                        <tr>
+                            <td>Código</td>
+                            <td>Producto / Servicio</td>
+                            <td>Cantidad</td>
+                            <td>U. Medida</td>
+                            <td>Precio Unit.</td>
+                            <td>% Bonif.</td>
+                            <td>Imp. Bonif.</td>
+                            <td>Subtotal</td>
+                        </tr>
+                        {% for item in items %}
+                        <tr>
+                            <td>{{ item['code'] }}</td>
+                            <td>{{ item['name'] }}</td>
+                            <td>{{ item['quantity'] }}</td>
+                            <td>{{ item['measurement_unit'] }}</td>
+                            <td>{{ item['price'] }}</td>
+                            <td>{{ item['percent_subsidized'] }}</td>
+                            <td>{{ item['impost_subsidized'] }}</td>
+                            <td>{{ item['subtotal'] }}</td>
+                        </tr>
+                        {% endfor %}
+                    </table>
+                </div>
+            </td>
+        </tr>
+        <tr class="bill-row total-row">
+            <td colspan="2">
+                <div>
+                    {% if bill['type'] == 'A' and tax_breakdown %}
+                    <div class="row text-right">
+                        <p class="col-10 margin-b-0">
+                            <strong>Importe Neto Gravado: $</strong>
+                        </p>
+                        <p class="col-2 margin-b-0">
+                            <strong>{{ overall['subtotal'] }}</strong>
+                        </p>
+                    </div>
+                    {% for line in tax_breakdown %}
+                    <div class="row text-right">
+                        <p class="col-10 margin-b-0">
+                            <strong>IVA {{ line['rate'] }}%: $</strong>
+                        </p>
+                        <p class="col-2 margin-b-0">
+                            <strong>{{ line['tax'] }}</strong>
+                        </p>
+                    </div>
+                    {% endfor %}
+                    {% else %}
+                    <div class="row text-right">
+                        <p class="col-10 margin-b-0">
+                            <strong>Subtotal: $</strong>
+                        </p>
+                        <p class="col-2 margin-b-0">
+                            <strong>{{ overall['subtotal'] }}</strong>
+                        </p>
+                    </div>
+                    <div class="row text-right">
+                        <p class="col-10 margin-b-0">
+                            <strong>Importe Otros Tributos: $</strong>
+                        </p>
+                        <p class="col-2 margin-b-0">
+                            <strong>{{ overall['impost_tax'] }}</strong>
+                        </p>
+                    </div>
+                    {% endif %}
+                    <div class="row text-right">
+                        <p class="col-10 margin-b-0">
+                            <strong>Importe total: $</strong>
+                        </p>
+                        <p class="col-2 margin-b-0">
+                            <strong>{{ overall['total'] }}</strong>
+                        </p>
+                    </div>
+                </div>
+            </td>
+        </tr>
+        <tr class="bill-row row-details">
+            <td width="50%">
+                <div>
+                    <div class="row">
+                        {% if qr_code_svg %}
+                        <div id="qrcode">{{ qr_code_svg }}</div>
+                        {% else %}
+                        <img id="qrcode" src="{{ qr_code_image }}">
+                        {% endif %}
+                    </div>
+                </div>
+            </td>
+            <td width="50%">
+                <div>
+                    <div class="row text-right margin-b-10">
+                        <strong>CAE Nº:&nbsp;</strong> {{ bill['CAE'] }}
+                    </div>
+                    <div class="row text-right">
+                        <strong>Fecha de Vto. de CAE:&nbsp;</strong> {{ bill['CAE_expiration'] }}
+                    </div>
+                </div>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>"""
+
+
+TICKET_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Ticket</title>
+    <style type="text/css">
+        *{
+            box-sizing: border-box;
+            -webkit-user-select: none;
+            -moz-user-select: none;
+            -ms-user-select: none;
+            user-select: none;
+        }
+
+        .bill-container{
+            border-collapse: collapse;
+            max-width: 8cm;
+            position: absolute;
+            left:0;
+            right: 0;
+            margin: auto;
+            border-collapse: collapse;
+            font-family: monospace;
+            font-size: 12px;
+        }
+
+        .text-lg{
+            font-size: 20px;
+        }
+
+        .text-center{
+            text-align: center;
+        }
+    
+
+        #qrcode {
+            width: 75%
+        }
+
+        #qrcode svg {
+            display: block;
+            width: 100%;
+            height: auto;
+        }
+
+        p {
+            margin: 2px 0;
+        }
+
+        table table {
+            width: 100%;
+        }
+
+        
+        table table tr td:last-child{
+            text-align: right;
+        }
+
+        .border-top {
+            border-top: 1px dashed;
+        }
+
+        .padding-b-3 {
+            padding-bottom: 3px;
+        }
+
+        .padding-t-3 {
+            padding-top: 3px;
+        }
+
+    </style>
+</head>
+<body>
+    <table class="bill-container">
+        <tr>
+            <td class="padding-b-3">
+                <p>Razón social: {{ business_data['business_name'] }}</p>
+                <p>Direccion: {{ business_data['address'] }}</p>
+                <p>C.U.I.T.: {{ business_data['tax_id'] }}</p>
+                <p>{{ business_data['vat_condition'] }}</p>
+                <p>IIBB: {{ business_data['gross_income_id'] }}</p>
+                <p>Inicio de actividad: {{ business_data['start_date'] }}</p>
+            </td>
+        </tr>
+        <tr>
+            <td class="border-top padding-t-3 padding-b-3">
+                <p class="text-center text-lg">FACTURA {{ bill['type'] }}</p>
+                <p class="text-center">Codigo {{ bill['code'] }}</p>
+                <p>P.V: {{ bill['point_of_sale'] }}</p>
+                <p>Nro: {{ bill['number'] }}</p>
+                <p>Fecha: {{ bill['date'] }}</p>
+                <p>Concepto: {{ bill['concept'] }}</p>
+            </td>
+        </tr>
+        <tr>
+            <td class="border-top padding-t-3 padding-b-3">
+                <p>A {{ billing_data['vat_condition'] }}</p>
+            </td>
+        </tr>
+        <tr>
+            <td class="border-top padding-t-3 padding-b-3">
+                <div>
+                    <table>
+                        {% for item in items %}
+                            <tr>
+                                <td>{{ item['quantity'] }}</td>
+                                <td>{{ item['name'] }}</td>
+                                <td>{{ item['tax_percent'] }}</td>
+                                <td>{{ item['price'] }}</td>
+                            </tr>
+                        {% endfor %}
+                    </table>
+                </div>
+            </td>
+        </tr>
+        <tr>
+            <td class="border-top padding-t-3 padding-b-3">
+                <div>
+                    <table>
+                        {% for line in tax_breakdown %}
+                        <tr>
+                            <td>IVA {{ line['rate'] }}%</td>
+                            <td>{{ line['tax'] }}</td>
+                        </tr>
+                        {% endfor %}
+                        <tr>
+                            <td>TOTAL</td>
+                            <td>{{ overall['total'] }}</td>
+                        </tr>
+                    </table>
+                </div>
+            </td>
+        </tr>
+        <tr>
+            <td class="border-top padding-t-3">
+                <p>CAE: {{ bill['CAE'] }}</p>
+                <p>Vto: {{ bill['CAE_expiration'] }}</p>
+            </td>
+        </tr>
+        <tr class="text-center">
+            <td>
+                {% if qr_code_svg %}
+                <div id="qrcode" style="margin: auto;">{{ qr_code_svg }}</div>
+                {% else %}
+                <img id="qrcode" src="{{ qr_code_image }}">
+                {% endif %}
+            </td>
+        </tr>
+    </table>
+</body>
+</html>"""
+
+
+def get_factura_template():
+    return FACTURA_TEMPLATE
+
+
+def get_ticket_template():
+    return TICKET_TEMPLATE
+
+
+FACTURA_DEFAULTS = {
+    'business_data': {
+        'business_name': "EMPRESA S.A.",
+        'address': "Calle 123, Ciudad",
+        'vat_condition': "Responsable Inscripto",
+        'tax_id': "30-12345678-9",
+        'gross_income_id': "123-456789-0",
+        'start_date': None
+    },
+    'bill': {
+        'type': "A",
+        'point_of_sale': "0001",
+        'number': "00001234",
+        'date': None,
+        'since': None,
+        'until': None,
+        'expiration': None,
+        'CAE': "12345678901234",
+        'CAE_expiration': None
+    },
+    'billing_data': {
+        'name': "Cliente S.A.",
+        'address': "Calle 456, Ciudad",
+        'tax_id': "30-98765432-1",
+        'vat_condition': "Responsable Inscripto",
+        'payment_method': "Contado"
+    },
+    'item': {
+        'code': "001",
+        'name': "Producto",
+        'quantity': "1",
+        'measurement_unit': "unidad",
+        'price': "100.00",
+        'percent_subsidized': "0",
+        'impost_subsidized': "0.00",
+        'tax_percent': "21",
+        'subtotal': "100.00"
+    },
+    'empty_item': {
+        'code': "001",
+        'name': "Producto/Servicio",
+        'quantity': "1",
+        'measurement_unit': "unidad",
+        'price': "100.00",
+        'percent_subsidized': "0",
+        'impost_subsidized': "0.00",
+        'tax_percent': "21",
+        'subtotal': "100.00"
+    },
+    'overall': {
+        'subtotal': "100.00",
+        'impost_tax': "21.00",
+        'total': "121.00"
+    }
+}
+
+TICKET_DEFAULTS = {
+    'business_data': {
+        'business_name': "EMPRESA S.A.",
+        'address': "Calle 123, Ciudad",
+        'tax_id': "30-12345678-9",
+        'vat_condition': "Responsable Inscripto",
+        'gross_income_id': "123-456789-0",
+        'start_date': None
+    },
+    'bill': {
+        'type': "A",
+        'code': "COD001",
+        'point_of_sale': "0001",
+        'number': "00001234",
+        'date': None,
+        'concept': "Venta de productos",
+        'CAE': "12345678901234",
+        'CAE_expiration': None
+    },
+    'billing_data': {
+        'vat_condition': "Consumidor Final"
+    },
+    'item': {
+        'code': "",
+        'quantity': "1",
+        'name': "Producto",
+        'tax_percent': "21",
+        'price': "100.00"
+    },
+    'empty_item': {
+        'code': "",
+        'quantity': "1",
+        'name': "Producto",
+        'tax_percent': "21",
+        'price': "100.00"
+    },
+    'overall': {
+        'total': "121.00"
+    }
+}
+
+KINDS = {
+    'factura': {
+        'template': get_factura_template,
+        'defaults': FACTURA_DEFAULTS,
+        'tipoDocRec': 80
+    },
+    'ticket': {
+        'template': get_ticket_template,
+        'defaults': TICKET_DEFAULTS,
+        'tipoDocRec': 99
+    }
+}
+
+NO_DATA_QR = "Sin datos"
+
+_environment = None
+
+
+def get_environment():
+    """Entorno Jinja compartido por el proceso.
+    
+    Cada plantilla se compila una sola vez por proceso y el bytecode se guarda
+    en disco, así que los siguientes arranques tampoco la vuelven a compilar.
+    """
+    global _environment
+    if _environment is None:
+        # jinja2 se importa recién al renderizar el primer documento
+        from jinja2 import Environment, DictLoader, FileSystemBytecodeCache
+        
+        bytecode_cache = None
+        try:
+            directory = cache_dir("templates")
+            directory.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(directory))
+        except OSError:
+            pass
+        
+        _environment = Environment(
+            loader=DictLoader({kind: info['template']() for kind, info in KINDS.items()}),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False
+        )
+    return _environment
+
+
+def get_template(kind):
+    _kind(kind)
+    with instrument.stage('template'):
+        return get_environment().get_template(kind)
+
+
+def _kind(kind):
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de documento desconocido: {kind}")
+    return KINDS[kind]
+
+
+def _fill(values, defaults, today):
+    """Completa los campos vacíos con su valor por defecto (fechas: hoy)"""
+    values = values or {}
+    filled = {}
+    for key, default in defaults.items():
+        value = values.get(key)
+        if value is None or value == "":
+            value = today if default is None else default
+        filled[key] = str(value)
+    return filled
+
+
+def _to_int(value, default=0):
+    digits = "".join(c for c in str(value or "") if c.isdigit())
+    return int(digits) if digits else default
+
+
+def _to_float(value, default=0):
+    try:
+        return float(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _overall_totals(kind, document_totals):
+    """Campos de 'overall' del tipo de documento a partir de los totales"""
+    if kind == 'factura':
+        return {
+            'subtotal': totals.format_amount(document_totals.subtotal()),
+            'impost_tax': totals.format_amount(document_totals.tax()),
+            'total': totals.format_amount(document_totals.total())
+        }
+    return {'total': totals.format_amount(document_totals.total())}
+
+
+# Secciones del registro que son objetos (emisor, comprobante, cliente, totales)
+RECORD_SECTIONS = ('business_data', 'bill', 'billing_data', 'overall')
+
+
+def validate_record(record):
+    """ValueError si el registro o alguna de sus secciones no tiene el tipo esperado"""
+    if not isinstance(record, dict):
+        raise ValueError("El registro tiene que ser un objeto")
+    for section in RECORD_SECTIONS:
+        if record.get(section) is not None and not isinstance(record[section], dict):
+            raise ValueError(f"'{section}' tiene que ser un objeto")
+    items = record.get('items')
+    if items is not None:
+        if not isinstance(items, list):
+            raise ValueError("'items' tiene que ser una lista")
+        for position, item in enumerate(items, start=1):
+            if not isinstance(item, dict):
+                raise ValueError(f"El ítem {position} de 'items' tiene que ser un objeto")
+    if record.get('qr_data') is not None and not isinstance(record['qr_data'], (dict, str)):
+        raise ValueError("'qr_data' tiene que ser un objeto o un texto")
+
+
+def prepare_document(kind, record):
+    """Normaliza un registro plano al contexto que espera la plantilla"""
+    validate_record(record)
+    defaults = _kind(kind)['defaults']
+    today = datetime.now().date().isoformat()
+    
+    items = [_fill(item, defaults['item'], today) for item in record.get('items') or []]
+    overall = dict(record.get('overall') or {})
+    if items:
+        # Subtotales y totales que no vienen en el registro se calculan desde los ítems
+        document_totals = totals.Totals(items)
+        for item, raw, line in zip(items, record['items'], document_totals.lines):
+            if 'subtotal' in item and line and not raw.get('subtotal'):
+                item['subtotal'] = totals.format_amount(line[0])
+        for key, value in _overall_totals(kind, document_totals).items():
+            if overall.get(key) in (None, ""):
+                overall[key] = value
+        tax_breakdown = totals.breakdown(document_totals)
+    else:
+        items.append(dict(defaults['empty_item']))
+        # Sin ítems el IVA discriminado solo coincide con los totales por defecto;
+        # con un 'overall' propio se usa el bloque sin discriminar
+        tax_breakdown = [] if any(overall.values()) else totals.breakdown(totals.Totals(items))
+    
+    return {
+        'business_data': _fill(record.get('business_data'), defaults['business_data'], today),
+        'bill': _fill(record.get('bill'), defaults['bill'], today),
+        'billing_data': _fill(record.get('billing_data'), defaults['billing_data'], today),
+        'items': items,
+        'overall': _fill(overall, defaults['overall'], today),
+        'tax_breakdown': tax_breakdown
+    }
+
+
+def tipo_cmp(bill_type):
+    """Código de tipo de comprobante de Arca: 1 para A, 6 para el resto"""
+    return 1 if bill_type == 'A' else 6
+
+
+# Valores del payload de Arca para los campos que llegan vacíos
+QR_DEFAULTS = {
+    'ver': 1,
+    'fecha': None,
+    'cuit': 0,
+    'ptoVta': 0,
+    'tipoCmp': 6,
+    'nroCmp': 0,
+    'importe': 0,
+    'moneda': 'ARS',
+    'ctz': 1,
+    'tipoDocRec': 80,
+    'nroDocRec': 0,
+    'tipoCodAut': 'E',
+    'codAut': 0
+}
+QR_AMOUNTS = ('importe', 'ctz')
+
+
+def qr_data(fields):
+    """Payload de Arca a partir de campos sueltos, por ejemplo el texto de un formulario.
+    
+    Los números aceptan separadores ("30-71234567-8") y los vacíos toman su valor por defecto.
+    """
+    data = {}
+    for key, default in QR_DEFAULTS.items():
+        value = fields.get(key)
+        if key in QR_AMOUNTS:
+            value = _to_float(value, default)
+        elif isinstance(default, int):
+            value = _to_int(value, default)
+        elif value is None or value == "":
+            value = default
+        data[key] = value
+    return data
+
+
+def build_qr_data(kind, context):
+    """Arma el payload del QR de Arca a partir de un contexto ya normalizado"""
+    bill = context['bill']
+    return qr_data({
+        'fecha': bill['date'],
+        'cuit': context['business_data']['tax_id'],
+        'ptoVta': bill['point_of_sale'],
+        'tipoCmp': tipo_cmp(bill['type']),
+        'nroCmp': bill['number'],
+        'importe': context['overall']['total'],
+        'tipoDocRec': _kind(kind)['tipoDocRec'],
+        'nroDocRec': context['billing_data'].get('tax_id'),
+        'codAut': bill['CAE']
+    })
+
+
+def build_qr_png(data, **params):
+    """Genera el PNG de un QR; acepta un dict (se serializa a JSON) o texto"""
+    return qr_service.encode(data, 'png', **params)
+
+
+QR_FORMATS = ('png', 'svg')
+
+
+def build_qr(data, qr_format='png'):
+    """Devuelve el QR como bytes PNG o como texto SVG según qr_format"""
+    if qr_format not in QR_FORMATS:
+        raise ValueError(f"Formato de QR no soportado para documentos: {qr_format}")
+    return qr_service.encode(data, qr_format)
+
+
+def build_document_qr(kind, record, context, qr_format='png'):
+    """QR del documento: 'qr_data' del registro o el payload armado con sus datos"""
+    return build_qr(record.get('qr_data') or build_qr_data(kind, context), qr_format)
+
+
+def render_document(kind, context, qr_code_image=None, qr_code_svg=None):
+    template = get_template(kind)
+    with instrument.stage('render'):
+        return template.render(qr_code_image=qr_code_image, qr_code_svg=qr_code_svg, **context)
+
+
+def write_file(path, content):
+    """Escribe texto (UTF-8) o bytes en ``path`` de forma atómica (ver output_writer)"""
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    with instrument.stage('write'):
+        output_writer.write(path, data)
+    instrument.count('bytes_written', len(data))
+
+
+def document_name(kind, bill):
+    """<kind>_<punto de venta>_<tipo>_<número>: la numeración es por punto de venta
+    y tipo de comprobante, así que el número solo no alcanza para no pisar archivos.
+    Del número solo se toman los dígitos: nunca arma una ruta fuera de la carpeta."""
+    return (f"{kind}_{_to_int(bill.get('point_of_sale')):05d}_{tipo_cmp(bill.get('type')):03d}_"
+            f"{_to_int(bill.get('number')):08d}")
+
+
+def write_folder(kind, context, qr_image, folder, qr_format='png'):
+    """Escribe <folder>/<document_name>/ con el HTML y el QR (qr_code.png o qr_code.svg)"""
+    folder_path = Path(folder) / document_name(kind, context['bill'])
+    
+    # El QR y el HTML se confirman juntos: no queda una carpeta a medias
+    with output_writer.batch():
+        output_writer.mkdir(folder_path)
+        qr_filename = f"qr_code.{qr_format}"
+        write_file(folder_path / qr_filename, qr_image)
+        
+        html_content = render_document(kind, context, qr_filename)
+        write_file(folder_path / f"{kind}.html", html_content)
+    
+    return folder_path
+
+
+def render_embedded(kind, context, qr_image, qr_format='png'):
+    """HTML autocontenido: QR PNG en base64 o SVG en línea"""
+    if qr_format == 'svg':
+        return render_document(kind, context, qr_code_svg=qr_image)
+    qr_base64 = base64.b64encode(qr_image).decode()
+    return render_document(kind, context, f"data:image/png;base64,{qr_base64}")
+
+
+def write_embedded(kind, context, qr_image, filename, qr_format='png'):
+    """Escribe un único HTML con el QR embebido: PNG en base64 o SVG en línea"""
+    html_content = render_embedded(kind, context, qr_image, qr_format)
+    write_file(filename, html_content)
+    
+    return Path(filename)
+
+
+OUTPUTS = ('html', 'pdf')
+
+
+def generate_document(kind, record, out_dir, embed_qr=False, qr_format='png', output='html'):
+    """Genera un documento completo a partir de un registro plano.
+    
+    El registro tiene las claves business_data, bill, billing_data, items y
+    overall (todas opcionales). Si incluye 'qr_data' se usa como payload del
+    QR; si no, se arma con los datos del comprobante.
+    
+    Con output='pdf' se escribe <document_name>.pdf usando el renderer de Qt
+    del proceso (ver pdf_export); embed_qr y qr_format no aplican.
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"Salida desconocida: {output}")
+    
+    context = prepare_document(kind, record)
+    return write_document(kind, record, context, out_dir, embed_qr, qr_format, output)
+
+
+def write_document(kind, record, context, out_dir, embed_qr=False, qr_format='png', output='html'):
+    """Como generate_document, con el contexto ya preparado"""
+    with instrument.document(kind, context), output_writer.batch():
+        if output == 'pdf':
+            import pdf_export
+            
+            output_writer.mkdir(out_dir)
+            filename = Path(out_dir) / f"{document_name(kind, context['bill'])}.pdf"
+            pdf_export.get_renderer().write_pdf(kind, context, build_document_qr(kind, record, context), filename)
+            return filename
+        
+        qr_image = build_document_qr(kind, record, context, qr_format)
+        if embed_qr:
+            output_writer.mkdir(out_dir)
+            filename = Path(out_dir) / f"{document_name(kind, context['bill'])}.html"
+            return write_embedded(kind, context, qr_image, filename, qr_format)
+        return write_folder(kind, context, qr_image, out_dir, qr_format)
+
+
+def generate_batch(kind, records, out_dir, **options):
+    """Genera un documento por registro; devuelve un iterador de rutas"""
+    for record in records:
+        yield generate_document(kind, record, out_dir, **options)
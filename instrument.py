@@ -0,0 +1,284 @@
+"""Medición opcional de tiempos por etapa de cada documento generado.
+
+Desactivada por defecto. Con ARCALINUX_TIMINGS=<archivo> (o
+``render --timings``) cada documento agrega una línea JSON al archivo
+("-" escribe en stderr; varios destinos se separan con os.pathsep):
+
+    {"ts": "...", "pid": 123, "kind": "ticket", "number": "00000042",
+     "total_ms": 41.2, "stages": {"qr.make": 33.1, "qr.png": 2.9,
+     "template": 0.4, "render": 1.8, "write": 0.6},
+     "counters": {"bytes_written": 8410}}
+
+Las etapas son qr.make (matriz del QR), qr.png / qr.svg (codificación de la
+imagen), template (carga o compilación de la plantilla), render (Jinja),
+pdf / image (exportación con Qt) y write (escritura a disco). Los procesos
+del pool heredan la variable y agregan sus líneas al mismo archivo.
+
+prometheus_text() resume esas líneas (o los documentos del proceso actual)
+en formato de texto de Prometheus. profiled() captura un perfil de una
+corrida con cProfile, o con pyinstrument si está instalado y el archivo
+termina en .html.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+_NULL = nullcontext()
+
+_settings = None
+_settings_lock = threading.Lock()
+_local = threading.local()
+
+
+def _sink():
+    """Archivo de destino configurado, o None si la medición está desactivada"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                path = os.environ.get('ARCALINUX_TIMINGS', "")
+                _settings = {'path': path or None, 'targets': [p for p in path.split(os.pathsep) if p],
+                             'files': {}, 'pid': None, 'lock': threading.Lock()}
+    return _settings
+
+
+def enabled():
+    return _sink()['path'] is not None
+
+
+def configure(path):
+    """Activa (o desactiva con None) la medición; los procesos hijos la heredan.
+
+    ``path`` es un destino o una lista de destinos ("-" para stderr).
+    """
+    global _settings
+    if isinstance(path, (list, tuple)):
+        path = os.pathsep.join(str(target) for target in path)
+    if path:
+        os.environ['ARCALINUX_TIMINGS'] = str(path)
+    else:
+        os.environ.pop('ARCALINUX_TIMINGS', None)
+    with _settings_lock:
+        _settings = None
+
+
+class Aggregates:
+    """Totales por etapa y contadores de los documentos medidos"""
+    def __init__(self):
+        self.documents = {}
+        self.document_seconds = 0.0
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.documents[record['kind']] = self.documents.get(record['kind'], 0) + 1
+            self.document_seconds += record['total_ms'] / 1000
+            for name, ms in record['stages'].items():
+                stats = self.stages.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += ms / 1000
+                stats[2] = max(stats[2], ms / 1000)
+            for name, value in record.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+
+_aggregates = Aggregates()
+
+
+def process_aggregates():
+    """Totales de los documentos medidos en este proceso"""
+    return _aggregates
+
+
+def aggregate(records):
+    """Aggregates a partir de registros ya leídos (por ejemplo de read_records)"""
+    totals = Aggregates()
+    for record in records:
+        totals.add(record)
+    return totals
+
+
+def read_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class _Document:
+    def __init__(self, kind, context):
+        self.kind = kind
+        self.context = context
+        self.stages = {}
+        self.counters = {}
+
+    def __enter__(self):
+        _local.document = self
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        total = time.perf_counter() - self.started
+        _local.document = None
+        if exc_type is not None:
+            return False
+        number = ((self.context or {}).get('bill') or {}).get('number')
+        record = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'kind': self.kind,
+            'number': number,
+            'total_ms': round(total * 1000, 3),
+            'stages': {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            'counters': self.counters
+        }
+        _aggregates.add(record)
+        _write(record)
+        return False
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, traceback):
+        document = getattr(_local, 'document', None)
+        if document is not None:
+            stages = document.stages
+            stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+
+def document(kind, context=None):
+    """Mide un documento; el número se lee de context['bill'] al terminar"""
+    if not enabled() or getattr(_local, 'document', None) is not None:
+        return _NULL
+    return _Document(kind, context)
+
+
+def stage(name):
+    """Suma el tiempo del bloque a la etapa ``name`` del documento en curso"""
+    if not enabled():
+        return _NULL
+    return _Stage(name)
+
+
+def count(name, value=1):
+    """Suma ``value`` al contador ``name`` del documento en curso"""
+    document = getattr(_local, 'document', None)
+    if document is not None:
+        document.counters[name] = document.counters.get(name, 0) + value
+
+
+def _write(record):
+    settings = _sink()
+    line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+    with settings['lock']:
+        # Tras un fork el hijo abre sus propios descriptores
+        if settings['pid'] != os.getpid():
+            settings['files'] = {}
+            settings['pid'] = os.getpid()
+        for target in settings['targets']:
+            if target == "-":
+                sys.stderr.write(line)
+                continue
+            if target not in settings['files']:
+                settings['files'][target] = open(target, 'a', encoding='utf-8', buffering=1)
+            # Una sola escritura en modo append por línea: los procesos no se pisan
+            settings['files'][target].write(line)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(totals=None, prefix="arcalinux"):
+    """Resumen en formato de texto de Prometheus"""
+    totals = totals or _aggregates
+    lines = [
+        f"# HELP {prefix}_documents_total Documentos generados con medición",
+        f"# TYPE {prefix}_documents_total counter"
+    ]
+    lines += [f'{prefix}_documents_total{{kind="{_escape(kind)}"}} {count}'
+              for kind, count in sorted(totals.documents.items())]
+    lines += [
+        f"# HELP {prefix}_document_seconds_total Tiempo total de generación de documentos",
+        f"# TYPE {prefix}_document_seconds_total counter",
+        f"{prefix}_document_seconds_total {totals.document_seconds:.6f}",
+        f"# HELP {prefix}_stage_seconds Tiempo por etapa de generación",
+        f"# TYPE {prefix}_stage_seconds summary"
+    ]
+    for name, (calls, seconds, _) in sorted(totals.stages.items()):
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{_escape(name)}"}} {seconds:.6f}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{_escape(name)}"}} {calls}')
+    lines += [
+        f"# HELP {prefix}_stage_max_seconds Etapa más lenta registrada",
+        f"# TYPE {prefix}_stage_max_seconds gauge"
+    ]
+    lines += [f'{prefix}_stage_max_seconds{{stage="{_escape(name)}"}} {slowest:.6f}'
+              for name, (_, _, slowest) in sorted(totals.stages.items())]
+    lines += [
+        f"# HELP {prefix}_events_total Contadores (aciertos de caché, bytes escritos...)",
+        f"# TYPE {prefix}_events_total counter"
+    ]
+    lines += [f'{prefix}_events_total{{name="{_escape(name)}"}} {value}'
+              for name, value in sorted(totals.counters.items())]
+    return "\n".join(lines) + "\n"
+
+
+def summary_text(totals=None):
+    """Tabla legible: llamadas, tiempo total, promedio y máximo por etapa"""
+    totals = totals or _aggregates
+    documents = sum(totals.documents.values())
+    lines = [f"{documents} documentos, {totals.document_seconds:.3f} s en total"]
+    lines.append(f"{'etapa':<12} {'llamadas':>9} {'total s':>10} {'prom. ms':>10} {'máx. ms':>10}")
+    for name, (calls, seconds, slowest) in sorted(totals.stages.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<12} {calls:>9} {seconds:>10.3f} {seconds / calls * 1000:>10.3f} {slowest * 1000:>10.3f}")
+    for name, value in sorted(totals.counters.items()):
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiled(path):
+    """Perfil de todo el bloque: cProfile (.prof) o pyinstrument (.html, si está instalado)"""
+    if not path:
+        yield
+        return
+
+    if str(path).endswith(".html"):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            sys.stderr.write("pyinstrument no está instalado; se usa cProfile\n")
+            path = str(path)[:-len(".html")] + ".prof"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+            return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
@@ -0,0 +1,274 @@
+"""Editor de ítems basado en modelo/vista.
+
+Los ítems se guardan en una lista de filas (una lista de textos por fila) y
+se muestran con un QTableView, que solo pinta las filas visibles. Así una
+factura con cientos de ítems se arma, se desplaza y se lee sin crear un
+widget por celda, y extraer los ítems es una lectura directa del modelo.
+Escribir o escanear un código completa la fila desde el catálogo de
+productos (ver products).
+"""
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt, Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView, QHBoxLayout, QHeaderView, QPushButton, QTableView, QVBoxLayout, QWidget
+)
+
+import products
+import totals
+from completers import ProductCodeDelegate
+
+FACTURA_COLUMNS = [
+    ('code', "Código"),
+    ('name', "Descripción"),
+    ('quantity', "Cant."),
+    ('measurement_unit', "Unidad"),
+    ('price', "Precio"),
+    ('percent_subsidized', "Desc. %"),
+    ('impost_subsidized', "Desc. $"),
+    ('tax_percent', "IVA %"),
+    ('subtotal', "Subtotal")
+]
+
+TICKET_COLUMNS = [
+    ('code', "Código"),
+    ('quantity', "Cant."),
+    ('name', "Producto"),
+    ('tax_percent', "IVA %"),
+    ('price', "Precio")
+]
+
+
+class ItemsTableModel(QAbstractTableModel):
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.keys = [key for key, _ in columns]
+        self.read_only = set()
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.rows[index.row()][index.column()]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        value = str(value).strip()
+        row = self.rows[index.row()]
+        if row[index.column()] == value:
+            return False
+        row[index.column()] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self.keys[index.column()] in self.read_only:
+            return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section][1]
+        return str(section + 1)
+
+    def add_row(self, values=None):
+        """Agrega una fila; values es un dict parcial por clave de columna"""
+        values = values or {}
+        position = len(self.rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.append([str(values.get(key, "")) for key in self.keys])
+        self.endInsertRows()
+        return position
+
+    def update_row(self, position, values):
+        """Cambia varias celdas de una fila con un solo dataChanged"""
+        row = self.rows[position]
+        changed = False
+        for key, value in values.items():
+            if key in self.keys:
+                column = self.keys.index(key)
+                value = str(value).strip()
+                if row[column] != value:
+                    row[column] = value
+                    changed = True
+        if changed:
+            self.dataChanged.emit(
+                self.index(position, 0), self.index(position, len(self.keys) - 1), [Qt.DisplayRole, Qt.EditRole]
+            )
+        return changed
+
+    def set_items(self, items):
+        """Reemplaza todas las filas de una vez (carga masiva)"""
+        self.beginResetModel()
+        self.rows = [[str(item.get(key, "")) for key in self.keys] for item in items]
+        self.endResetModel()
+
+    def remove_rows(self, positions):
+        # De abajo hacia arriba para que los índices pendientes sigan siendo válidos
+        for position in sorted(set(positions), reverse=True):
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self.rows[position]
+            self.endRemoveRows()
+
+    def item(self, position):
+        return dict(zip(self.keys, self.rows[position]))
+
+    def items(self):
+        """Ítems como dicts por clave de columna; las filas vacías se omiten"""
+        return [dict(zip(self.keys, row)) for row in self.rows if any(row)]
+
+
+class LiveTotals(QObject):
+    """Mantiene los totales de un ItemsTableModel a medida que se edita.
+
+    Escucha las señales del modelo y solo recalcula las filas afectadas.
+    Si el modelo tiene columna 'subtotal', pasa a ser de solo lectura y se
+    completa con el neto de cada fila.
+    """
+    changed = Signal()
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.totals = totals.Totals(model.items())
+        self.subtotal_column = None
+        if 'subtotal' in model.keys:
+            self.subtotal_column = model.keys.index('subtotal')
+            model.read_only.add('subtotal')
+
+        model.rowsInserted.connect(self.on_rows_inserted)
+        model.rowsRemoved.connect(self.on_rows_removed)
+        model.dataChanged.connect(self.on_data_changed)
+        model.modelReset.connect(self.on_model_reset)
+        self.on_model_reset()
+
+    def on_rows_inserted(self, parent, first, last):
+        self.totals.insert(first, [self.model.item(row) for row in range(first, last + 1)])
+        self._write_subtotals(first, last)
+        self.changed.emit()
+
+    def on_rows_removed(self, parent, first, last):
+        self.totals.remove(first, last)
+        self.changed.emit()
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        if top_left.column() == bottom_right.column() == self.subtotal_column:
+            return
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.totals.update(row, self.model.item(row))
+        self._write_subtotals(top_left.row(), bottom_right.row())
+        self.changed.emit()
+
+    def on_model_reset(self):
+        self.totals.reset(self.model.item(row) for row in range(self.model.rowCount()))
+        self._write_subtotals(0, self.model.rowCount() - 1)
+        self.changed.emit()
+
+    def _write_subtotals(self, first, last):
+        if self.subtotal_column is None or last < first:
+            return
+        column = self.subtotal_column
+        changed = False
+        for row in range(first, last + 1):
+            line = self.totals.lines[row]
+            value = totals.format_amount(line[0]) if line else ""
+            if self.model.rows[row][column] != value:
+                # Directo en la fila: no dispara otra actualización de totales
+                self.model.rows[row][column] = value
+                changed = True
+        if changed:
+            self.model.dataChanged.emit(
+                self.model.index(first, column), self.model.index(last, column), [Qt.DisplayRole, Qt.EditRole]
+            )
+
+
+class ProductFiller(QObject):
+    """Completa la fila con los datos del catálogo al escribir o escanear un código"""
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.code_column = model.keys.index('code')
+        model.dataChanged.connect(self.on_data_changed)
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        if not top_left.column() == bottom_right.column() == self.code_column:
+            return
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            code = self.model.rows[row][self.code_column]
+            product = products.lookup(code) if code else None
+            if product is None:
+                continue
+            values = {
+                'code': product['code'],
+                'name': product['name'],
+                'measurement_unit': product['measurement_unit'],
+                'price': product['price'],
+                'tax_percent': product['tax_percent']
+            }
+            if not self.model.rows[row][self.model.keys.index('quantity')]:
+                values['quantity'] = "1"
+            self.model.update_row(row, {key: value for key, value in values.items() if value})
+
+
+class ItemsEditor(QWidget):
+    """Tabla editable de ítems con botones para agregar y quitar filas"""
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.model = ItemsTableModel(columns, self)
+        self.live_totals = LiveTotals(self.model, self)
+        self.product_filler = None
+        if 'code' in self.model.keys:
+            self.product_filler = ProductFiller(self.model, self)
+
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setEditTriggers(
+            QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed | QAbstractItemView.AnyKeyPressed
+        )
+        self.view.setMinimumHeight(220)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        # Alto de fila fijo: la vista no mide cada fila al desplazarse
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        if self.product_filler is not None:
+            self.code_delegate = ProductCodeDelegate(self.view)
+            self.view.setItemDelegateForColumn(self.product_filler.code_column, self.code_delegate)
+
+        self.btn_add = QPushButton("+ Agregar Ítem")
+        self.btn_add.clicked.connect(self.add_row)
+        self.btn_remove = QPushButton("Eliminar seleccionados")
+        self.btn_remove.clicked.connect(self.remove_selected)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.btn_add)
+        buttons_layout.addWidget(self.btn_remove)
+        buttons_layout.addStretch()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view)
+        layout.addLayout(buttons_layout)
+
+    def add_row(self, values=None):
+        position = self.model.add_row(values if isinstance(values, dict) else None)
+        index = self.model.index(position, 0)
+        self.view.scrollTo(index)
+        self.view.setCurrentIndex(index)
+        return position
+
+    def remove_selected(self):
+        self.model.remove_rows(index.row() for index in self.view.selectionModel().selectedRows())
+
+    def items(self):
+        return self.model.items()
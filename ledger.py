@@ -0,0 +1,183 @@
+"""Registro local de comprobantes emitidos (SQLite).
+
+Cada factura o ticket que se guarda, exporta o genera en batch queda
+anotado con su tipo, punto de venta, número, fecha, CUIT, total, CAE y la
+ruta de salida, junto con el contexto completo para poder reimprimirlo.
+Los índices por (ptoVta, tipoCmp, nroCmp) y por fecha permiten buscar entre
+cientos de miles de documentos sin recorrer carpetas.
+
+La base vive en ~/.local/share/arcalinux/ledger.sqlite3; ARCALINUX_LEDGER
+permite usar otro archivo o desactivar el registro con "off".
+"""
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import engine
+from paths import data_dir
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    bill_type TEXT NOT NULL,
+    point_of_sale INTEGER NOT NULL,
+    tipo_cmp INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    cuit INTEGER NOT NULL,
+    client_tax_id TEXT,
+    total TEXT NOT NULL,
+    cae TEXT,
+    path TEXT,
+    created_at TEXT NOT NULL,
+    context TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_number ON documents (point_of_sale, tipo_cmp, number);
+CREATE INDEX IF NOT EXISTS documents_date ON documents (date);
+"""
+
+COLUMNS = (
+    'kind', 'bill_type', 'point_of_sale', 'tipo_cmp', 'number', 'date', 'cuit',
+    'client_tax_id', 'total', 'cae', 'path', 'created_at', 'context'
+)
+
+# Columnas que devuelve find(); el contexto se lee aparte con get_context()
+SUMMARY_COLUMNS = ('id',) + COLUMNS[:-1]
+
+_INSERT = f"INSERT INTO documents ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+# Prefijo de la ruta de los documentos enviados a imprimir (cups:<cola>)
+PRINTED_PREFIX = "cups:"
+
+
+def default_path():
+    return data_dir("ledger.sqlite3")
+
+
+def printed_path(printer):
+    """Ruta que se anota para un documento impreso en la cola ``printer``"""
+    return f"{PRINTED_PREFIX}{printer or ''}"
+
+
+def _stored_path(path):
+    """Ruta absoluta del archivo, para encontrarlo desde cualquier carpeta"""
+    if not path:
+        return None
+    if str(path).startswith(PRINTED_PREFIX):
+        return str(path)
+    return str(Path(path).resolve())
+
+
+def entry(kind, context, path=None):
+    """Fila del registro para un documento ya preparado (ver engine.prepare_document)"""
+    qr_data = engine.build_qr_data(kind, context)
+    bill = context['bill']
+    return (
+        kind,
+        bill['type'],
+        qr_data['ptoVta'],
+        qr_data['tipoCmp'],
+        qr_data['nroCmp'],
+        bill['date'],
+        qr_data['cuit'],
+        context['billing_data'].get('tax_id', ""),
+        context['overall']['total'],
+        bill['CAE'],
+        _stored_path(path),
+        datetime.now().isoformat(timespec='seconds'),
+        json.dumps(context, ensure_ascii=False, separators=(',', ':'))
+    )
+
+
+class Ledger(SQLiteStore):
+    def __init__(self, path=None):
+        super().__init__(path or default_path(), SCHEMA, pragmas=("synchronous=NORMAL",))
+
+    def record(self, kind, context, path=None):
+        """Anota un documento y devuelve su id"""
+        row = entry(kind, context, path)
+        with self._lock, self._connection:
+            return self._connection.execute(_INSERT, row).lastrowid
+
+    def record_many(self, rows):
+        """Anota varias filas (ver entry) en una sola transacción"""
+        with self._lock, self._connection:
+            self._connection.executemany(_INSERT, rows)
+
+    def find(self, kind=None, point_of_sale=None, tipo_cmp=None, number=None, date_from=None,
+             date_to=None, cuit=None, limit=100):
+        """Busca documentos; las fechas son texto ISO (AAAA-MM-DD) inclusive"""
+        filters = [
+            ('kind = ?', kind),
+            ('point_of_sale = ?', point_of_sale),
+            ('tipo_cmp = ?', tipo_cmp),
+            ('number = ?', number),
+            ('date >= ?', date_from),
+            ('date <= ?', date_to),
+            ('cuit = ?', cuit)
+        ]
+        clauses = [clause for clause, value in filters if value is not None]
+        params = [value for _, value in filters if value is not None]
+
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM documents"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY date DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def get(self, point_of_sale, tipo_cmp, number):
+        """Última emisión del comprobante (o None)"""
+        rows = self.find(point_of_sale=point_of_sale, tipo_cmp=tipo_cmp, number=number, limit=1)
+        return rows[0] if rows else None
+
+    def get_context(self, document_id):
+        """Contexto guardado del documento, para reimprimirlo"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT kind, context FROM documents WHERE id = ?", (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+_ledger = None
+_ledger_pid = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Registro compartido por el proceso, o None si ARCALINUX_LEDGER=off"""
+    global _ledger, _ledger_pid
+    setting = os.environ.get('ARCALINUX_LEDGER', "")
+    if setting.lower() == "off":
+        return None
+    with _ledger_lock:
+        # Cada proceso del pool abre su propia conexión (no se heredan tras un fork)
+        if _ledger is None or _ledger_pid != os.getpid():
+            _ledger = Ledger(setting or None)
+            _ledger_pid = os.getpid()
+        return _ledger
+
+
+def record(kind, context, path=None):
+    """Anota el documento en el registro del proceso, si está activo"""
+    current = get_ledger()
+    if current is not None:
+        return current.record(kind, context, path)
+    return None
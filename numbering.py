@@ -0,0 +1,214 @@
+"""Numeración automática de comprobantes.
+
+Lleva el próximo número libre por (punto de venta, tipo de comprobante) en
+una base SQLite local. Cada asignación es una transacción BEGIN IMMEDIATE,
+así que varias terminales o procesos de un batch pueden pedir números a la
+vez sin repetirlos. En batch cada lote pide de una sola vez exactamente los
+números que necesita, en lugar de uno por documento.
+
+Un documento que falla después de recibir su número lo devuelve con
+release(): los números devueltos se asignan antes que los nuevos, así que
+la numeración no queda con huecos.
+
+La base vive en ~/.local/share/arcalinux/numbering.sqlite3; ARCALINUX_NUMBERING
+permite usar otro archivo.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import engine
+from paths import data_dir
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sequences (
+    point_of_sale INTEGER NOT NULL,
+    tipo_cmp INTEGER NOT NULL,
+    next_number INTEGER NOT NULL,
+    PRIMARY KEY (point_of_sale, tipo_cmp)
+);
+CREATE TABLE IF NOT EXISTS released (
+    point_of_sale INTEGER NOT NULL,
+    tipo_cmp INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (point_of_sale, tipo_cmp, number)
+);
+"""
+
+NUMBER_DIGITS = 8
+
+
+def default_path():
+    return data_dir("numbering.sqlite3")
+
+
+def format_number(number):
+    return str(number).zfill(NUMBER_DIGITS)
+
+
+class SequenceStore(SQLiteStore):
+    def __init__(self, path=None, start=1):
+        self.start = start
+        # Sin transacciones implícitas: cada asignación abre la suya con BEGIN IMMEDIATE
+        super().__init__(path or default_path(), SCHEMA, isolation_level=None)
+
+    def _next(self, point_of_sale, tipo_cmp):
+        row = self._connection.execute(
+            "SELECT next_number FROM sequences WHERE point_of_sale = ? AND tipo_cmp = ?",
+            (point_of_sale, tipo_cmp)
+        ).fetchone()
+        return row[0] if row else self.start
+
+    def _store(self, point_of_sale, tipo_cmp, next_number):
+        self._connection.execute(
+            "INSERT INTO sequences (point_of_sale, tipo_cmp, next_number) VALUES (?, ?, ?) "
+            "ON CONFLICT (point_of_sale, tipo_cmp) DO UPDATE SET next_number = excluded.next_number",
+            (point_of_sale, tipo_cmp, next_number)
+        )
+
+    def _released(self, point_of_sale, tipo_cmp, limit=-1):
+        return [row[0] for row in self._connection.execute(
+            "SELECT number FROM released WHERE point_of_sale = ? AND tipo_cmp = ? ORDER BY number LIMIT ?",
+            (point_of_sale, tipo_cmp, limit)
+        )]
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            # Toma el lock de escritura de la base antes de leer: nadie más
+            # puede leer el mismo próximo número hasta el COMMIT
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def allocate(self, point_of_sale, tipo_cmp, count=1):
+        """Reserva ``count`` números consecutivos nuevos y devuelve el primero"""
+        if count < 1:
+            raise ValueError("count debe ser al menos 1")
+        with self._transaction():
+            first = self._next(point_of_sale, tipo_cmp)
+            self._store(point_of_sale, tipo_cmp, first + count)
+        return first
+
+    def take(self, point_of_sale, tipo_cmp, count=1):
+        """Reserva ``count`` números: primero los devueltos, después los nuevos"""
+        if count < 1:
+            raise ValueError("count debe ser al menos 1")
+        with self._transaction():
+            numbers = self._released(point_of_sale, tipo_cmp, count)
+            if numbers:
+                self._connection.executemany(
+                    "DELETE FROM released WHERE point_of_sale = ? AND tipo_cmp = ? AND number = ?",
+                    [(point_of_sale, tipo_cmp, number) for number in numbers]
+                )
+            missing = count - len(numbers)
+            if missing:
+                first = self._next(point_of_sale, tipo_cmp)
+                self._store(point_of_sale, tipo_cmp, first + missing)
+                numbers.extend(range(first, first + missing))
+        return numbers
+
+    def release(self, point_of_sale, tipo_cmp, numbers):
+        """Devuelve números reservados que no llegaron a usarse"""
+        with self._transaction():
+            next_number = self._next(point_of_sale, tipo_cmp)
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO released (point_of_sale, tipo_cmp, number) VALUES (?, ?, ?)",
+                [(point_of_sale, tipo_cmp, number) for number in numbers if number < next_number]
+            )
+            # Los devueltos al final de la secuencia simplemente la hacen retroceder
+            released = set(self._released(point_of_sale, tipo_cmp))
+            top = next_number
+            while top - 1 in released and top - 1 >= self.start:
+                top -= 1
+            if top != next_number:
+                self._connection.execute(
+                    "DELETE FROM released WHERE point_of_sale = ? AND tipo_cmp = ? AND number >= ?",
+                    (point_of_sale, tipo_cmp, top)
+                )
+                self._store(point_of_sale, tipo_cmp, top)
+
+    def peek(self, point_of_sale, tipo_cmp):
+        """Próximo número que se asignaría, sin reservarlo"""
+        with self._lock:
+            released = self._released(point_of_sale, tipo_cmp, 1)
+            return released[0] if released else self._next(point_of_sale, tipo_cmp)
+
+    def set_next(self, point_of_sale, tipo_cmp, next_number):
+        """Fija el próximo número (por ejemplo, al migrar desde otro sistema)"""
+        with self._transaction():
+            self._connection.execute(
+                "DELETE FROM released WHERE point_of_sale = ? AND tipo_cmp = ?", (point_of_sale, tipo_cmp)
+            )
+            self._store(point_of_sale, tipo_cmp, next_number)
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Secuencias compartidas por el proceso (una conexión por proceso)"""
+    global _store, _store_pid
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            _store = SequenceStore(os.environ.get('ARCALINUX_NUMBERING') or None)
+            _store_pid = os.getpid()
+        return _store
+
+
+def sequence_key(bill):
+    """(punto de venta, tipo de comprobante) de la sección 'bill' de un documento"""
+    return engine._to_int(bill.get('point_of_sale')), engine.tipo_cmp(bill.get('type'))
+
+
+def next_number(bill):
+    """Reserva y devuelve, ya formateado, el próximo número para 'bill'"""
+    return format_number(get_store().take(*sequence_key(bill))[0])
+
+
+def peek_number(bill):
+    """Próximo número para 'bill', ya formateado, sin reservarlo"""
+    return format_number(get_store().peek(*sequence_key(bill)))
+
+
+def has_number(record):
+    return bool((record.get('bill') or {}).get('number'))
+
+
+def assign_numbers(documents):
+    """Numera los documentos cuyo registro no trae bill.number.
+
+    ``documents`` es una lista de (registro, contexto). Se reservan los
+    números de cada (punto de venta, tipo) de una vez y se reparten en el
+    orden de la lista. Devuelve los contextos numerados, para release().
+    """
+    pending = {}
+    for record, context in documents:
+        if not has_number(record):
+            pending.setdefault(sequence_key(context['bill']), []).append(context)
+
+    store = get_store()
+    numbered = []
+    for key, contexts in pending.items():
+        numbers = store.take(*key, count=len(contexts))
+        for number, context in zip(numbers, contexts):
+            context['bill']['number'] = format_number(number)
+        numbered.extend(contexts)
+    return numbered
+
+
+def release(contexts):
+    """Devuelve los números de documentos numerados que finalmente no se emitieron"""
+    pending = {}
+    for context in contexts:
+        pending.setdefault(sequence_key(context['bill']), []).append(engine._to_int(context['bill']['number']))
+
+    for key, numbers in pending.items():
+        get_store().release(*key, numbers)
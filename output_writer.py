@@ -0,0 +1,242 @@
+"""Escritura atómica de los documentos generados.
+
+Cada archivo se escribe primero como <nombre>.<pid>.<n>.tmp en la misma
+carpeta y recién se renombra al nombre final cuando el lote se confirma,
+así que un corte a mitad de una corrida no deja HTML ni QR a medio
+escribir: o está el documento completo o no está.
+
+Dentro de ``with batch():`` los archivos se acumulan y al salir se hace,
+en este orden, un fsync por archivo, los rename y un solo fsync por
+carpeta (más las carpetas padre de las que se crearon), en lugar de pagar
+ese recorrido por cada documento. batch() se puede anidar: el bloque
+interno que falla descarta solo lo que escribió, y el más externo
+confirma. Fuera de un batch() cada write() se confirma en el momento.
+
+En Linux los archivos se abren y renombran relativos a un descriptor de
+la carpeta ya abierto (openat/renameat), sin resolver la ruta completa
+cada vez. ARCALINUX_FSYNC=off mantiene los rename atómicos pero omite los
+fsync (más rápido, sin garantía ante un corte de energía).
+"""
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Archivos pendientes a partir de los cuales un batch() anidado confirma
+MAX_PENDING = 256
+
+DIR_FD_SUPPORTED = (
+    hasattr(os, 'O_DIRECTORY')
+    and os.open in os.supports_dir_fd
+    and os.rename in os.supports_dir_fd
+    and os.unlink in os.supports_dir_fd
+)
+
+_local = threading.local()
+
+
+def sync_enabled():
+    return os.environ.get('ARCALINUX_FSYNC', "on").lower() not in ("off", "0", "no")
+
+
+def _fsync_directory(path):
+    """fsync de una carpeta por ruta (donde no se pueden abrir carpetas se omite)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OutputWriter:
+    """Archivos escritos a .tmp que se renombran juntos en commit()"""
+    def __init__(self, sync=None, dir_fd=None, max_pending=MAX_PENDING):
+        self.sync = sync_enabled() if sync is None else sync
+        self.dir_fd = DIR_FD_SUPPORTED if dir_fd is None else dir_fd and DIR_FD_SUPPORTED
+        self.max_pending = max_pending
+        self.pending = []
+        self.created = set()
+        self.committed = 0
+        self._directories = {}
+        self._sequence = 0
+
+    def _directory(self, path):
+        """Descriptor abierto de la carpeta, reutilizado hasta el próximo commit"""
+        fd = self._directories.get(path)
+        if fd is None:
+            fd = self._directories[path] = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        return fd
+
+    def mkdir(self, path):
+        """Crea la carpeta (y sus padres); sus entradas nuevas se sincronizan en commit()"""
+        path = Path(path).absolute()
+        missing = []
+        current = path
+        while not current.exists() and current != current.parent:
+            missing.append(current)
+            current = current.parent
+        path.mkdir(parents=True, exist_ok=True)
+        self.created.update(str(directory.parent) for directory in missing)
+        return path
+
+    def write(self, path, data):
+        """Escribe ``data`` (bytes) en un temporal junto a ``path``"""
+        path = Path(path).absolute()
+        directory = str(path.parent)
+        self._sequence += 1
+        tmp_name = f"{path.name}.{os.getpid()}.{self._sequence}.tmp"
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_CLOEXEC', 0)
+        if self.dir_fd:
+            fd = os.open(tmp_name, flags, 0o666, dir_fd=self._directory(directory))
+        else:
+            fd = os.open(os.path.join(directory, tmp_name), flags, 0o666)
+        self.pending.append((directory, tmp_name, path.name, fd))
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except BaseException:
+            self.discard(len(self.pending) - 1)
+            raise
+        return path
+
+    def commit(self):
+        """fsync de los archivos, rename al nombre final y un fsync por carpeta"""
+        pending, self.pending = self.pending, []
+        created, self.created = self.created, set()
+        try:
+            for index, (directory, tmp_name, name, fd) in enumerate(pending):
+                if self.sync:
+                    os.fsync(fd)
+                os.close(fd)
+                pending[index] = (directory, tmp_name, name, None)
+            renamed = set()
+            for index, (directory, tmp_name, name, _) in enumerate(pending):
+                if self.dir_fd:
+                    dir_fd = self._directory(directory)
+                    os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                else:
+                    os.replace(os.path.join(directory, tmp_name), os.path.join(directory, name))
+                pending[index] = None
+                renamed.add(directory)
+            if self.sync:
+                for directory in sorted(renamed | created):
+                    if self.dir_fd:
+                        os.fsync(self._directory(directory))
+                    else:
+                        _fsync_directory(directory)
+            self.committed += len(pending)
+        except BaseException:
+            self._remove([entry for entry in pending if entry is not None])
+            raise
+        finally:
+            self._close_directories()
+
+    def discard(self, start=0):
+        """Borra los temporales pendientes desde la posición ``start``"""
+        entries = self.pending[start:]
+        del self.pending[start:]
+        self._remove(entries)
+
+    def _remove(self, entries):
+        for directory, tmp_name, _, fd in entries:
+            try:
+                if fd is not None:
+                    os.close(fd)
+                if self.dir_fd:
+                    os.unlink(tmp_name, dir_fd=self._directory(directory))
+                else:
+                    os.unlink(os.path.join(directory, tmp_name))
+            except OSError:
+                pass
+
+    def _close_directories(self):
+        for fd in self._directories.values():
+            os.close(fd)
+        self._directories.clear()
+
+    def close(self):
+        """Descarta lo que no se confirmó y libera los descriptores"""
+        self.discard()
+        self._close_directories()
+
+
+def current():
+    """Writer del batch() en curso en este hilo, o None"""
+    return getattr(_local, 'writer', None)
+
+
+@contextmanager
+def batch(**options):
+    """Agrupa las escrituras del bloque; el batch() más externo confirma al salir"""
+    writer = current()
+    if writer is not None:
+        start = len(writer.pending)
+        try:
+            yield writer
+        except BaseException:
+            writer.discard(start)
+            raise
+        if len(writer.pending) >= writer.max_pending:
+            writer.commit()
+        return
+
+    writer = _local.writer = OutputWriter(**options)
+    try:
+        yield writer
+        writer.commit()
+    finally:
+        _local.writer = None
+        writer.close()
+
+
+def write(path, data):
+    """Escribe ``data`` de forma atómica, dentro del batch() en curso si lo hay"""
+    writer = current()
+    if writer is not None:
+        return writer.write(path, data)
+    with batch() as writer:
+        return writer.write(path, data)
+
+
+def mkdir(path):
+    writer = current()
+    if writer is not None:
+        return writer.mkdir(path)
+    with batch() as writer:
+        return writer.mkdir(path)
+
+
+def temporary_path(path):
+    """Temporal junto a ``path`` para archivos que se escriben de a partes (bundles)"""
+    path = Path(path).absolute()
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def discard_temporary(tmp):
+    """Borra un temporal de temporary_path() que no se va a publicar"""
+    try:
+        os.unlink(tmp)
+    except OSError:
+        pass
+
+
+def publish(tmp, path, sync=None):
+    """Reemplaza ``path`` por el temporal ya cerrado, con fsync del archivo y la carpeta"""
+    sync = sync_enabled() if sync is None else sync
+    try:
+        if sync:
+            fd = os.open(tmp, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        discard_temporary(tmp)
+        raise
+    if sync:
+        _fsync_directory(Path(path).absolute().parent)
+    return path
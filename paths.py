@@ -0,0 +1,21 @@
+"""Rutas de datos locales de la aplicación"""
+import os
+from pathlib import Path
+
+
+def cache_dir(*parts):
+    """Carpeta de caché de la aplicación (ARCALINUX_CACHE_DIR o XDG_CACHE_HOME)"""
+    base = os.environ.get('ARCALINUX_CACHE_DIR')
+    if not base:
+        xdg = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(xdg, "arcalinux")
+    return Path(base, *parts)
+
+
+def data_dir(*parts):
+    """Carpeta de datos persistentes (ARCALINUX_DATA_DIR o XDG_DATA_HOME)"""
+    base = os.environ.get('ARCALINUX_DATA_DIR')
+    if not base:
+        xdg = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser("~"), ".local", "share")
+        base = os.path.join(xdg, "arcalinux")
+    return Path(base, *parts)
@@ -0,0 +1,231 @@
+"""Exportación a PDF con el motor de texto de Qt, sin procesos externos.
+
+Reemplaza el paso por wkhtmltopdf/weasyprint: el HTML de la plantilla se
+carga en un QTextDocument y se imprime con QPdfWriter. Un mismo PdfRenderer
+se reutiliza para todos los documentos de un lote, así que el costo de
+arranque de Qt se paga una sola vez por proceso.
+
+QTextDocument soporta un subconjunto de HTML/CSS: tablas, párrafos e
+imágenes se respetan, pero no el posicionamiento absoluto ni las columnas
+flotantes, por lo que el PDF es una versión simplificada del HTML.
+"""
+import os
+import threading
+
+import engine
+import instrument
+import output_writer
+
+# Tamaño de página por tipo de documento (ancho, alto) en milímetros
+PAGE_SIZES = {
+    'factura': (210, 297),
+    'ticket': (80, 297)
+}
+
+PAGE_MARGIN_MM = 8
+
+QR_RESOURCE = "qr_code.png"
+
+# Ancho del QR en el PDF: QTextDocument ignora el ancho en % del CSS
+QR_WIDTHS = {
+    'factura': 180,
+    'ticket': 160
+}
+
+# DPI con el que QTextDocument mide el texto cuando no tiene dispositivo propio
+DOCUMENT_DPI = 96
+
+# Resolución de render_png: la de las impresoras térmicas de tickets
+IMAGE_DPI = 203
+
+_app = None
+_local = threading.local()
+
+
+def ensure_application():
+    """Crea una QGuiApplication si no existe (offscreen si no hay display)"""
+    global _app
+    from PySide6.QtGui import QGuiApplication
+
+    if QGuiApplication.instance() is None:
+        if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        _app = QGuiApplication([])
+    return QGuiApplication.instance()
+
+
+class PdfRenderer:
+    def __init__(self):
+        ensure_application()
+        from PySide6.QtGui import QTextDocument
+
+        self._document = QTextDocument()
+
+    def page_size(self, kind):
+        from PySide6.QtCore import QSizeF
+        from PySide6.QtGui import QPageSize
+
+        width, height = PAGE_SIZES[kind]
+        return QPageSize(QSizeF(width, height), QPageSize.Millimeter, kind)
+
+    def load(self, kind, context, qr_png):
+        """Carga el documento en el QTextDocument compartido y lo devuelve"""
+        from PySide6.QtCore import QSizeF, QUrl
+        from PySide6.QtGui import QImage, QTextDocument
+
+        document = self._document
+        document.clear()
+        document.setPageSize(QSizeF(-1, -1))
+        if qr_png:
+            image = QImage.fromData(qr_png).scaledToWidth(QR_WIDTHS[kind])
+            document.addResource(QTextDocument.ImageResource, QUrl(QR_RESOURCE), image)
+        document.setHtml(engine.render_document(kind, context, QR_RESOURCE))
+        return document
+
+    def new_writer(self, kind, target):
+        """QPdfWriter sobre un archivo o un QIODevice (por ejemplo un QBuffer)"""
+        from PySide6.QtCore import QIODevice, QMarginsF
+        from PySide6.QtGui import QPdfWriter, QPageLayout
+
+        writer = QPdfWriter(target if isinstance(target, QIODevice) else str(target))
+        writer.setPageSize(self.page_size(kind))
+        writer.setPageMargins(QMarginsF(*(PAGE_MARGIN_MM,) * 4), QPageLayout.Millimeter)
+        writer.setResolution(300)
+        writer.setCreator("ArcaLinux")
+        return writer
+
+    def write_pdf(self, kind, context, qr_png, filename):
+        """Escribe un PDF con el documento; qr_png son los bytes del QR en PNG"""
+        # Se arma en memoria y se escribe de forma atómica, como los HTML
+        engine.write_file(filename, self.render_pdf(kind, context, qr_png))
+        return filename
+
+    def render_pdf(self, kind, context, qr_png):
+        """Bytes del PDF del documento, sin pasar por disco"""
+        from PySide6.QtCore import QBuffer, QIODevice
+
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        writer = self.new_writer(kind, buffer)
+        document = self.load(kind, context, qr_png)
+        with instrument.stage('pdf'):
+            document.print_(writer)
+            # El PDF se termina de escribir al destruir el writer
+            del writer
+        buffer.close()
+        return buffer.data().data()
+
+    def render_png(self, kind, context, qr_png, dpi=IMAGE_DPI):
+        """Bytes de un PNG del documento con el ancho de su página (ver PAGE_SIZES)"""
+        from PySide6.QtCore import QBuffer, QIODevice, QRectF
+        from PySide6.QtGui import QImage, QPainter, Qt
+
+        document = self.load(kind, context, qr_png)
+        width_mm = PAGE_SIZES[kind][0] - 2 * PAGE_MARGIN_MM
+        document.setTextWidth(width_mm / 25.4 * DOCUMENT_DPI)
+        scale = dpi / DOCUMENT_DPI
+        size = document.size()
+
+        with instrument.stage('image'):
+            image = QImage(int(size.width() * scale), int(size.height() * scale), QImage.Format_Grayscale8)
+            image.fill(Qt.white)
+            painter = QPainter(image)
+            painter.scale(scale, scale)
+            document.drawContents(painter, QRectF(0, 0, size.width(), size.height()))
+            painter.end()
+
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, "PNG")
+            buffer.close()
+        return buffer.data().data()
+
+    def open_bundle(self, kind, filename):
+        """PDF multipágina al que se agregan documentos de a uno"""
+        return PdfBundle(self, kind, filename)
+
+
+class PdfBundle:
+    """Varios documentos en un solo PDF, cada uno empezando en página nueva.
+
+    Las páginas se escriben a medida que se agregan documentos, así que un
+    lote de miles de tickets no se acumula en memoria y la impresora recibe
+    un único trabajo.
+    """
+    def __init__(self, renderer, kind, filename):
+        self.renderer = renderer
+        self.kind = kind
+        self.filename = filename
+        # Se escribe a un temporal que reemplaza al PDF recién en close()
+        self._tmp = output_writer.temporary_path(filename)
+        self.writer = renderer.new_writer(kind, self._tmp)
+        self.painter = None
+        self.count = 0
+        self.pages = 0
+
+    def add(self, context, qr_png):
+        from PySide6.QtCore import QRectF, QSizeF
+        from PySide6.QtGui import QPainter
+
+        document = self.renderer.load(self.kind, context, qr_png)
+        scale = self.writer.resolution() / DOCUMENT_DPI
+        width = self.writer.width() / scale
+        height = self.writer.height() / scale
+        document.setPageSize(QSizeF(width, height))
+
+        if self.painter is None:
+            self.painter = QPainter(self.writer)
+
+        with instrument.stage('pdf'):
+            for page in range(document.pageCount()):
+                if self.pages:
+                    self.writer.newPage()
+                self.painter.save()
+                self.painter.scale(scale, scale)
+                self.painter.translate(0, -page * height)
+                document.drawContents(self.painter, QRectF(0, page * height, width, height))
+                self.painter.restore()
+                self.pages += 1
+
+        self.count += 1
+
+    def close(self):
+        if self.writer is None:
+            return self.filename
+        if self.painter is None:
+            # Sin documentos: igual se genera un PDF válido de una página en blanco
+            from PySide6.QtGui import QPainter
+            self.painter = QPainter(self.writer)
+        self.painter.end()
+        self.painter = None
+        self.writer = None
+        output_writer.publish(self._tmp, self.filename)
+        return self.filename
+
+    def abort(self):
+        """Descarta el temporal sin tocar el archivo de destino"""
+        if self.writer is None:
+            return
+        if self.painter is not None:
+            self.painter.end()
+            self.painter = None
+        self.writer = None
+        output_writer.discard_temporary(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def get_renderer():
+    """Renderer compartido por hilo: uno por worker en modo batch y uno por
+    hilo del pool en la interfaz, ya que los objetos de Qt no se comparten"""
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = PdfRenderer()
+    return renderer
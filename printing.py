@@ -0,0 +1,151 @@
+"""Impresión directa en colas CUPS.
+
+PrintSpooler recibe documentos ya preparados (contexto + QR), los agrupa en
+lotes y envía cada lote como un único trabajo de impresión: los documentos
+se renderizan en un PDF multipágina (ver pdf_export.PdfBundle) y se pasan a
+``lp``. Todo ocurre en un hilo propio, así que quien encola (por ejemplo la
+pantalla del punto de venta) nunca se bloquea esperando a la impresora.
+
+Para probar sin impresora real alcanza con una cola de CUPS-PDF o con
+ARCALINUX_LP apuntando a un script que reciba los mismos argumentos que lp.
+"""
+import os
+import re
+import queue
+import tempfile
+import threading
+import subprocess
+
+_STOP = object()
+_FLUSH = object()
+
+
+class PrintError(Exception):
+    pass
+
+
+def lp_command():
+    return os.environ.get('ARCALINUX_LP', 'lp')
+
+
+def submit_job(filename, printer=None, title="ArcaLinux", options=None, command=None):
+    """Envía un archivo a CUPS con lp y devuelve el id del trabajo (o None)"""
+    args = [command or lp_command(), '-t', title]
+    if printer:
+        args += ['-d', printer]
+    for option in options or ():
+        args += ['-o', option]
+    args.append(str(filename))
+
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise PrintError(f"No se pudo ejecutar {args[0]}: {e}")
+
+    if result.returncode != 0:
+        raise PrintError(result.stderr.strip() or f"{args[0]} terminó con código {result.returncode}")
+
+    match = re.search(r"request id is (\S+)", result.stdout)
+    return match.group(1) if match else None
+
+
+class PrintSpooler:
+    """Cola de impresión en segundo plano con envío por lotes.
+
+    Un lote se envía cuando junta ``batch_size`` documentos, cuando pasan
+    ``flush_interval`` segundos sin documentos nuevos o al llamar a flush().
+    ``on_result(job_id, count, error)`` se llama desde el hilo de impresión;
+    ``on_job(kind, contexts, error)`` también, con los contextos del trabajo
+    (por ejemplo, para anotar en el registro solo lo que lp aceptó).
+    Con ``max_queued`` > 0, submit() bloquea cuando hay esa cantidad de
+    documentos esperando (útil en batch para no acumular memoria).
+    """
+    def __init__(self, printer=None, batch_size=10, flush_interval=2.0, options=None,
+                 command=None, on_result=None, on_job=None, max_queued=0):
+        self.printer = printer or None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.options = options or []
+        self.command = command
+        self.on_result = on_result
+        self.on_job = on_job
+        self._queue = queue.Queue(max_queued)
+        self._renderer = None
+
+        # La QGuiApplication tiene que existir antes y en el hilo principal
+        import pdf_export
+        pdf_export.ensure_application()
+
+        self._thread = threading.Thread(target=self._run, name="arcalinux-print", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, context, qr_png):
+        self._queue.put((kind, context, qr_png))
+
+    def flush(self):
+        self._queue.put(_FLUSH)
+
+    def close(self, wait=True):
+        """Envía lo pendiente y termina el hilo"""
+        self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        pending = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval if pending else None)
+            except queue.Empty:
+                item = _FLUSH
+
+            if item is _STOP or item is _FLUSH:
+                self._print(pending)
+                pending = []
+                if item is _STOP:
+                    return
+                continue
+
+            # Facturas y tickets tienen distinto tamaño de página: no se mezclan en un trabajo
+            if pending and pending[0][0] != item[0]:
+                self._print(pending)
+                pending = []
+
+            pending.append(item)
+            if len(pending) >= self.batch_size:
+                self._print(pending)
+                pending = []
+
+    def _print(self, documents):
+        if not documents:
+            return
+
+        kind = documents[0][0]
+        job_id = None
+        error = None
+        fd, filename = tempfile.mkstemp(prefix=f"arcalinux_{kind}_", suffix=".pdf")
+        os.close(fd)
+        try:
+            if self._renderer is None:
+                # Renderer propio: los objetos de Qt no se comparten entre hilos
+                import pdf_export
+                self._renderer = pdf_export.PdfRenderer()
+
+            with self._renderer.open_bundle(kind, filename) as output:
+                for _, context, qr_png in documents:
+                    output.add(context, qr_png)
+
+            title = f"ArcaLinux {kind} x{len(documents)}"
+            job_id = submit_job(filename, self.printer, title, self.options, self.command)
+        except Exception as e:
+            error = str(e)
+        finally:
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+
+        if self.on_result:
+            self.on_result(job_id, len(documents), error)
+        if self.on_job:
+            self.on_job(kind, [context for _, context, _ in documents], error)
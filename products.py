@@ -0,0 +1,225 @@
+"""Catálogo local de productos para completar los ítems por código.
+
+Cada producto (código, descripción, unidad, precio, alícuota de IVA) se
+guarda en SQLite y se consulta desde un índice en memoria que se arma la
+primera vez que se usa: un dict por código exacto, para que escanear un
+código de barras complete la fila al instante, y un trie de prefijos para
+sugerir códigos mientras se escriben.
+
+El trie es "por ráfagas": baja carácter por carácter solo mientras un grupo
+tiene más de BUCKET_SIZE códigos y las hojas son listas ordenadas, así que
+un catálogo de 200.000 SKU no genera un nodo por carácter.
+
+La base vive en ~/.local/share/arcalinux/products.sqlite3; ARCALINUX_PRODUCTS
+permite usar otro archivo.
+"""
+import os
+import csv
+import threading
+from bisect import bisect_left
+from itertools import groupby
+
+from paths import data_dir
+from sqlite_store import BULK_REBUILD, SQLiteStore
+
+FIELDS = ('code', 'name', 'measurement_unit', 'price', 'tax_percent')
+
+# Encabezados alternativos aceptados al importar un CSV
+ALIASES = {
+    'codigo': 'code',
+    'sku': 'code',
+    'descripcion': 'name',
+    'unit': 'measurement_unit',
+    'unidad': 'measurement_unit',
+    'precio': 'price',
+    'iva': 'tax_percent'
+}
+
+BUCKET_SIZE = 32
+
+
+def default_path():
+    return data_dir("products.sqlite3")
+
+
+def normalize_code(code):
+    return str(code or "").strip().upper()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    measurement_unit TEXT,
+    price TEXT,
+    tax_percent TEXT
+);
+"""
+
+
+class ProductStore(SQLiteStore):
+    def __init__(self, path=None):
+        super().__init__(path or default_path(), SCHEMA)
+
+    def upsert_many(self, rows):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO products ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                rows
+            )
+
+    def rows(self):
+        with self._lock:
+            return self._connection.execute(f"SELECT {', '.join(FIELDS)} FROM products").fetchall()
+
+
+def product_row(product):
+    """Tupla de un producto en el orden de FIELDS, o None si no tiene código"""
+    values = {ALIASES.get(str(key).strip().lower(), str(key).strip().lower()): value
+              for key, value in product.items() if key is not None}
+    code = normalize_code(values.get('code'))
+    if not code:
+        return None
+    return (code,) + tuple(str(values.get(field) or "").strip() for field in FIELDS[1:])
+
+
+class PrefixTrie:
+    """Trie de prefijos con hojas en listas ordenadas (ver BUCKET_SIZE)"""
+    def __init__(self, keys=()):
+        self.root = self._build(sorted(set(keys)), 0)
+
+    def _build(self, keys, depth):
+        if len(keys) <= BUCKET_SIZE:
+            return keys
+        node = {}
+        for char, group in groupby(keys, key=lambda key: key[depth] if len(key) > depth else ""):
+            group = list(group)
+            # "" agrupa las claves que terminan en este nivel
+            node[char] = group if char == "" else self._build(group, depth + 1)
+        return node
+
+    def insert(self, key):
+        node = self.root
+        parent = None
+        depth = 0
+        while isinstance(node, dict):
+            char = key[depth] if len(key) > depth else ""
+            parent, node = node, node.setdefault(char, [])
+            if char == "":
+                break
+            depth += 1
+
+        position = bisect_left(node, key)
+        if position < len(node) and node[position] == key:
+            return
+        node.insert(position, key)
+        if len(node) > BUCKET_SIZE * 2 and depth < len(key):
+            # La hoja creció demasiado: se vuelve a partir por el siguiente carácter
+            rebuilt = self._build(node, depth)
+            if parent is None:
+                self.root = rebuilt
+            else:
+                parent[key[depth - 1]] = rebuilt
+
+    def search(self, prefix, limit=20):
+        """Claves que empiezan con ``prefix``, en orden, hasta ``limit``"""
+        node = self.root
+        depth = 0
+        while isinstance(node, dict) and depth < len(prefix):
+            node = node.get(prefix[depth])
+            if node is None:
+                return []
+            depth += 1
+
+        matches = []
+        self._collect(node, prefix, limit, matches)
+        return matches
+
+    def _collect(self, node, prefix, limit, matches):
+        if isinstance(node, list):
+            for key in node[bisect_left(node, prefix):]:
+                if len(matches) >= limit or not key.startswith(prefix):
+                    return
+                matches.append(key)
+            return
+        for char in sorted(node):
+            if len(matches) >= limit:
+                return
+            self._collect(node[char], prefix, limit, matches)
+
+
+class ProductIndex:
+    def __init__(self, rows=()):
+        self._by_code = {row[0]: tuple(row) for row in rows}
+        self._trie = None
+
+    @property
+    def trie(self):
+        # Solo hace falta para sugerir: una búsqueda exacta no espera a armarlo
+        if self._trie is None:
+            self._trie = PrefixTrie(self._by_code)
+        return self._trie
+
+    def __len__(self):
+        return len(self._by_code)
+
+    def get(self, code):
+        row = self._by_code.get(normalize_code(code))
+        return None if row is None else dict(zip(FIELDS, row))
+
+    def search(self, prefix, limit=20):
+        """Productos cuyo código empieza con ``prefix``"""
+        return [self.get(code) for code in self.trie.search(normalize_code(prefix), limit)]
+
+    def add(self, row):
+        if self._trie is not None and row[0] not in self._by_code:
+            self._trie.insert(row[0])
+        self._by_code[row[0]] = tuple(row)
+
+
+_store = None
+_index = None
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _lock:
+        if _store is None:
+            _store = ProductStore(os.environ.get('ARCALINUX_PRODUCTS') or None)
+        return _store
+
+
+def get_index():
+    """Índice del catálogo; se carga desde la base la primera vez que se pide"""
+    global _index
+    store = get_store()
+    with _lock:
+        if _index is None:
+            _index = ProductIndex(store.rows())
+        return _index
+
+
+def lookup(code):
+    """Producto con ese código exacto, o None"""
+    return get_index().get(code)
+
+
+def save(products):
+    """Guarda productos (dicts) y actualiza el índice si ya estaba cargado"""
+    global _index
+    rows = [row for row in map(product_row, products) if row is not None]
+    get_store().upsert_many(rows)
+    with _lock:
+        if _index is not None and len(rows) > BULK_REBUILD:
+            _index = None
+        elif _index is not None:
+            for row in rows:
+                _index.add(row)
+    return len(rows)
+
+
+def import_csv(path):
+    """Importa productos desde un CSV (code, name, measurement_unit, price, tax_percent)"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return save(csv.DictReader(f))
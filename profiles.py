@@ -0,0 +1,224 @@
+"""Catálogo local de clientes y emisores para autocompletar formularios.
+
+Los perfiles se guardan en SQLite (uno por CUIT) y se consultan desde un
+índice en memoria que se arma recién la primera vez que se usa: una lista
+ordenada de nombres normalizados y otra de CUIT, ambas con búsqueda por
+prefijo con bisect, más un dict por CUIT exacto. Cada perfil se guarda como
+una tupla y el nombre normalizado viene ya calculado y ordenado desde la
+base, así que cargar 100.000 clientes toma una fracción de segundo y cada
+búsqueda es logarítmica.
+
+La base vive en ~/.local/share/arcalinux/profiles.sqlite3; ARCALINUX_PROFILES
+permite usar otro archivo.
+"""
+import os
+import csv
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+from paths import data_dir
+from sqlite_store import BULK_REBUILD, SQLiteStore
+
+# Campos de cada catálogo; coinciden con las claves de billing_data y business_data
+CATALOGS = {
+    'clients': ('tax_id', 'name', 'address', 'vat_condition', 'payment_method'),
+    'issuers': ('tax_id', 'business_name', 'address', 'vat_condition', 'gross_income_id', 'start_date')
+}
+
+# Sección del registro de la que sale cada catálogo
+SECTIONS = {
+    'clients': 'billing_data',
+    'issuers': 'business_data'
+}
+
+
+def default_path():
+    return data_dir("profiles.sqlite3")
+
+
+def normalize_tax_id(value):
+    return "".join(c for c in str(value or "") if c.isdigit())
+
+
+def fold(text):
+    """Texto para comparar: minúsculas y sin acentos"""
+    text = unicodedata.normalize('NFKD', str(text or "").casefold())
+    return "".join(c for c in text if not unicodedata.combining(c)).strip()
+
+
+def display_name(catalog, profile):
+    return profile.get('name') if catalog == 'clients' else profile.get('business_name')
+
+
+def _schema():
+    statements = []
+    for catalog, fields in CATALOGS.items():
+        columns = ", ".join(f"{field} TEXT" for field in fields[1:])
+        # search_name guarda el nombre ya normalizado: el índice se carga ordenado
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {catalog} "
+            f"(tax_id TEXT PRIMARY KEY, {columns}, search_name TEXT NOT NULL);"
+        )
+        statements.append(f"CREATE INDEX IF NOT EXISTS {catalog}_search_name ON {catalog} (search_name);")
+    return "\n".join(statements)
+
+
+class ProfileStore(SQLiteStore):
+    def __init__(self, path=None):
+        super().__init__(path or default_path(), _schema())
+
+    def upsert_many(self, catalog, profiles):
+        """Guarda perfiles (dicts); los que no tienen CUIT se ignoran. Devuelve las filas guardadas"""
+        fields = CATALOGS[catalog] + ('search_name',)
+        rows = []
+        for profile in profiles:
+            row = profile_row(catalog, profile)
+            if row is not None:
+                rows.append(row)
+        query = (
+            f"INSERT OR REPLACE INTO {catalog} ({', '.join(fields)}) "
+            f"VALUES ({', '.join('?' * len(fields))})"
+        )
+        with self._lock, self._connection:
+            self._connection.executemany(query, rows)
+        return rows
+
+    def rows(self, catalog):
+        """Filas del catálogo ordenadas por nombre normalizado (último elemento)"""
+        fields = CATALOGS[catalog] + ('search_name',)
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT {', '.join(fields)} FROM {catalog} ORDER BY search_name"
+            ).fetchall()
+
+
+def profile_row(catalog, profile):
+    """Tupla de un perfil en el orden de CATALOGS más su nombre normalizado, o None si no tiene CUIT"""
+    tax_id = normalize_tax_id(profile.get('tax_id'))
+    if not tax_id:
+        return None
+    values = tuple(str(profile.get(field) or "") for field in CATALOGS[catalog][1:])
+    return (tax_id,) + values + (fold(display_name(catalog, profile)),)
+
+
+class ProfileIndex:
+    """Índice en memoria de un catálogo: prefijo de nombre, prefijo de CUIT y CUIT exacto.
+
+    ``rows`` son filas de ProfileStore.rows(): campos del catálogo y, al
+    final, el nombre normalizado, ya ordenadas por ese nombre.
+    """
+    def __init__(self, catalog, rows=()):
+        rows = list(rows)
+        self.catalog = catalog
+        self.fields = CATALOGS[catalog]
+        self.rows = [row[:-1] for row in rows]
+        self._names = [row[-1] for row in rows]
+        self._by_tax_id = {row[0]: position for position, row in enumerate(self.rows)}
+
+        # Posición de la fila de cada nombre (al cargar coinciden; add() las separa)
+        self._name_rows = array('i', range(len(self.rows)))
+        self._tax_ids = sorted(self._by_tax_id)
+
+    def __len__(self):
+        return len(self._by_tax_id)
+
+    def profile(self, position):
+        return dict(zip(self.fields, self.rows[position]))
+
+    def get(self, tax_id):
+        position = self._by_tax_id.get(normalize_tax_id(tax_id))
+        return None if position is None else self.profile(position)
+
+    def search(self, text, limit=20):
+        """Posiciones de los perfiles cuyo nombre o CUIT empieza con ``text``"""
+        digits = normalize_tax_id(text)
+        if digits and not any(c.isalpha() for c in str(text)):
+            start = bisect_left(self._tax_ids, digits)
+            matches = []
+            for tax_id in self._tax_ids[start:start + limit]:
+                if not tax_id.startswith(digits):
+                    break
+                matches.append(self._by_tax_id[tax_id])
+            return matches
+
+        prefix = fold(text)
+        if not prefix:
+            return []
+        start = bisect_left(self._names, prefix)
+        matches = []
+        for offset in range(start, min(start + limit * 2, len(self._names))):
+            if not self._names[offset].startswith(prefix):
+                break
+            position = self._name_rows[offset]
+            # Las filas reemplazadas quedan fuera de _by_tax_id
+            if self._by_tax_id.get(self.rows[position][0]) == position:
+                matches.append(position)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def add(self, row):
+        """Agrega o reemplaza un perfil (fila de profile_row) sin reconstruir el índice"""
+        if row[0] not in self._by_tax_id:
+            insort(self._tax_ids, row[0])
+        position = len(self.rows)
+        self.rows.append(tuple(row[:-1]))
+        self._by_tax_id[row[0]] = position
+
+        name = row[-1]
+        offset = bisect_left(self._names, name)
+        self._names.insert(offset, name)
+        self._name_rows.insert(offset, position)
+
+
+_store = None
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _lock:
+        if _store is None:
+            _store = ProfileStore(os.environ.get('ARCALINUX_PROFILES') or None)
+        return _store
+
+
+def get_index(catalog):
+    """Índice del catálogo; se carga desde la base la primera vez que se pide"""
+    store = get_store()
+    with _lock:
+        index = _indexes.get(catalog)
+        if index is None:
+            index = _indexes[catalog] = ProfileIndex(catalog, store.rows(catalog))
+        return index
+
+
+def save(catalog, profiles):
+    """Guarda perfiles y actualiza el índice si ya estaba cargado"""
+    rows = get_store().upsert_many(catalog, profiles)
+    with _lock:
+        index = _indexes.get(catalog)
+        if index is not None and len(rows) > BULK_REBUILD:
+            # Una importación grande: es más barato volver a armar el índice al usarlo
+            del _indexes[catalog]
+        elif index is not None:
+            for row in rows:
+                index.add(row)
+    return len(rows)
+
+
+def remember(record):
+    """Guarda el cliente y el emisor de un registro (los datos tal como se cargaron)"""
+    for catalog, section in SECTIONS.items():
+        profile = record.get(section)
+        if profile and display_name(catalog, profile):
+            save(catalog, [profile])
+
+
+def import_csv(catalog, path):
+    """Importa perfiles desde un CSV con encabezados iguales a los campos del catálogo"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return save(catalog, csv.DictReader(f))
@@ -0,0 +1,158 @@
+"""Caché de imágenes QR direccionada por contenido.
+
+La clave es un hash SHA-256 del texto codificado en el QR más los parámetros
+de renderizado (box_size, border, colores...), de modo que reimprimir o
+reemitir un comprobante no vuelve a construir la matriz ni a codificar el PNG.
+Las entradas viven en un LRU en memoria y, opcionalmente, en disco. En disco
+el tamaño total se limita a ``max_bytes``: al superarlo se borran las
+entradas usadas hace más tiempo (por fecha de modificación, que se renueva
+en cada acierto) hasta bajar al 80 % del límite. Cada proceso lleva su
+propia cuenta, así que con varios procesos el límite es aproximado.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class QRCache:
+    def __init__(self, max_entries=512, directory=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data, params):
+        canonical = json.dumps({'data': data, 'params': params}, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / key
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                value = path.read_bytes()
+                # La fecha de modificación marca el último uso para el desalojo
+                os.utime(path)
+            except OSError:
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            path = self._path(key)
+            tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp.write_bytes(value)
+                os.replace(tmp, path)
+                self._account(len(value))
+            except OSError:
+                # La caché en disco es opcional: si no se puede escribir se sigue sin ella
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+
+    def get_or_create(self, data, params, factory):
+        """Devuelve la entrada cacheada o la crea con factory() y la guarda"""
+        key = self.make_key(data, params)
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def _entries_on_disk(self):
+        """(fecha de modificación, tamaño, ruta) de cada entrada en disco"""
+        entries = []
+        try:
+            folders = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for folder in folders:
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _account(self, size):
+        if not self.max_bytes:
+            return
+        if self._disk_bytes is None:
+            usage = sum(size for _, size, _ in self._entries_on_disk())
+            with self._lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = usage
+        with self._lock:
+            self._disk_bytes += size
+            full = self._disk_bytes > self.max_bytes
+        if full:
+            self.prune()
+
+    def prune(self, target=None):
+        """Borra las entradas usadas hace más tiempo hasta ocupar ``target`` bytes; devuelve cuántas"""
+        if not self.directory:
+            return 0
+        if target is None:
+            target = int(self.max_bytes * 0.8) if self.max_bytes else 0
+        entries = sorted(self._entries_on_disk())
+        usage = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if usage <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Otro proceso pudo haberla borrado ya
+                pass
+            usage -= size
+            removed += 1
+        with self._lock:
+            self._disk_bytes = usage
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
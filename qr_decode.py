@@ -0,0 +1,297 @@
+"""Lectura de los QR que genera la aplicación (PNG, SVG o matriz de módulos).
+
+No es un lector de cámara: espera imágenes limpias, alineadas a la grilla y
+sin rotar, como las que escribe qr_service (PNG con módulos de tamaño entero
+o SVG con un único <path>). Con eso alcanza para auditar carpetas de
+salida sin depender de zbar ni OpenCV.
+
+La decodificación reutiliza las tablas de qrcode: los patrones fijos de
+cada versión, las máscaras y los bloques Reed-Solomon. Los códigos de
+corrección se recalculan a partir de los datos leídos y tienen que
+coincidir con los de la imagen; no se intenta corregir errores, un QR
+dañado se informa como ilegible.
+"""
+import re
+from io import BytesIO
+from functools import lru_cache
+
+import qrcode
+import qrcode.base
+import qrcode.constants
+import qrcode.util
+
+# Valores de nivel de corrección tal como los usa qrcode (y el bit de formato)
+ERROR_CORRECTION_LEVELS = (
+    qrcode.constants.ERROR_CORRECT_L,
+    qrcode.constants.ERROR_CORRECT_M,
+    qrcode.constants.ERROR_CORRECT_Q,
+    qrcode.constants.ERROR_CORRECT_H
+)
+
+
+class QRDecodeError(ValueError):
+    """La imagen no contiene un QR legible"""
+
+
+def matrix_from_png(data):
+    """Matriz de módulos (sin borde) de un PNG de QR alineado a la grilla"""
+    from PIL import Image
+
+    try:
+        image = Image.open(BytesIO(data)).convert('L')
+    except Exception as e:
+        raise QRDecodeError(f"Imagen inválida: {e}") from e
+    width, height = image.size
+    pixels = image.tobytes()
+
+    def dark(x, y):
+        return pixels[y * width + x] < 128
+
+    # Primer píxel oscuro: esquina del patrón de posición superior izquierdo
+    top = left = None
+    for y in range(height):
+        row = pixels[y * width:(y + 1) * width]
+        x = next((x for x, value in enumerate(row) if value < 128), None)
+        if x is not None:
+            top, left = y, x
+            break
+    if top is None:
+        raise QRDecodeError("La imagen no tiene módulos oscuros")
+
+    # El borde del patrón de posición mide 7 módulos
+    run = 0
+    while left + run < width and dark(left + run, top):
+        run += 1
+    box_size = run / 7
+    right = max(x for x in range(width) if dark(x, top))
+    size = round((right - left + 1) / box_size)
+    if box_size < 1 or size < 21 or (size - 17) % 4:
+        raise QRDecodeError("No se encontró la grilla del QR")
+
+    matrix = []
+    for row in range(size):
+        y = int(top + (row + 0.5) * box_size)
+        if y >= height:
+            raise QRDecodeError("El QR está recortado")
+        matrix.append(tuple(dark(min(int(left + (col + 0.5) * box_size), width - 1), y)
+                            for col in range(size)))
+    return _trim(matrix)
+
+
+_SVG_VIEWBOX = re.compile(r'viewBox="0 0 (\d+) (\d+)"')
+_SVG_PATH = re.compile(r'<path[^>]*\sd="([^"]*)"')
+_SVG_COMMAND = re.compile(r'([MmHh])\s*(-?[\d.]+)(?:[\s,]+(-?[\d.]+))?')
+
+
+def matrix_from_svg(text):
+    """Matriz de módulos (sin borde) de un SVG generado por qr_service.matrix_to_svg"""
+    viewbox = _SVG_VIEWBOX.search(text)
+    path = _SVG_PATH.search(text)
+    if not viewbox or not path:
+        raise QRDecodeError("SVG sin el formato de qr_service")
+    size = int(viewbox.group(1))
+    matrix = [[False] * size for _ in range(size)]
+
+    # Cada trazo es una racha horizontal de módulos: "M x y.5" o "m dx 0" y luego "h n"
+    x = y = 0.0
+    for command, first, second in _SVG_COMMAND.findall(path.group(1)):
+        if command == 'M':
+            x, y = float(first), float(second or 0)
+        elif command == 'm':
+            x, y = x + float(first), y + float(second or 0)
+        else:
+            end = x + float(first) if command == 'h' else float(first)
+            row = int(y)
+            if not 0 <= row < size:
+                raise QRDecodeError("Trazo fuera del QR")
+            for col in range(int(round(x)), int(round(end))):
+                matrix[row][col] = True
+            x = end
+    return _trim(tuple(map(tuple, matrix)))
+
+
+def _trim(matrix):
+    """Quita el borde blanco de una matriz cuadrada"""
+    rows = [y for y, row in enumerate(matrix) if any(row)]
+    if not rows:
+        raise QRDecodeError("La matriz está vacía")
+    cols = [x for x in range(len(matrix[0])) if any(row[x] for row in matrix)]
+    trimmed = tuple(row[cols[0]:cols[-1] + 1] for row in matrix[rows[0]:rows[-1] + 1])
+    if len(trimmed) != len(trimmed[0]):
+        raise QRDecodeError("La matriz no es cuadrada")
+    return trimmed
+
+
+@lru_cache(maxsize=None)
+def function_modules(version):
+    """Módulos reservados (patrones fijos, formato y versión) de una versión"""
+    qr = qrcode.QRCode(version=version)
+    qr.modules_count = version * 4 + 17
+    qr.modules = [[None] * qr.modules_count for _ in range(qr.modules_count)]
+    qr.setup_position_probe_pattern(0, 0)
+    qr.setup_position_probe_pattern(qr.modules_count - 7, 0)
+    qr.setup_position_probe_pattern(0, qr.modules_count - 7)
+    qr.setup_position_adjust_pattern()
+    qr.setup_timing_pattern()
+    qr.setup_type_info(True, 0)
+    if version >= 7:
+        qr.setup_type_number(True)
+    return tuple(tuple(module is not None for module in row) for row in qr.modules)
+
+
+@lru_cache(maxsize=None)
+def _format_codes():
+    return {
+        qrcode.util.BCH_type_info((level << 3) | mask): (level, mask)
+        for level in ERROR_CORRECTION_LEVELS for mask in range(8)
+    }
+
+
+def read_format(matrix):
+    """(nivel de corrección, máscara) a partir de la copia vertical del formato"""
+    size = len(matrix)
+    bits = 0
+    for i in range(15):
+        if i < 6:
+            module = matrix[i][8]
+        elif i < 8:
+            module = matrix[i + 1][8]
+        else:
+            module = matrix[size - 15 + i][8]
+        bits |= int(module) << i
+
+    # El código BCH admite hasta 3 bits errados
+    code, info = min(_format_codes().items(), key=lambda item: bin(item[0] ^ bits).count("1"))
+    if bin(code ^ bits).count("1") > 3:
+        raise QRDecodeError("Información de formato ilegible")
+    return info
+
+
+def read_codewords(matrix, version, mask):
+    """Bytes de la zona de datos, en el orden de lectura en zigzag y sin máscara"""
+    size = len(matrix)
+    reserved = function_modules(version)
+    mask_func = qrcode.util.mask_func(mask)
+    codewords = []
+    current = 0
+    count = 0
+    row = size - 1
+    step = -1
+    for col in range(size - 1, 0, -2):
+        if col <= 6:
+            col -= 1
+        while 0 <= row < size:
+            for c in (col, col - 1):
+                if reserved[row][c]:
+                    continue
+                current = (current << 1) | (matrix[row][c] != mask_func(row, c))
+                count += 1
+                if count == 8:
+                    codewords.append(current)
+                    current = count = 0
+            row += step
+        row -= step
+        step = -step
+    return codewords
+
+
+def split_blocks(codewords, version, level):
+    """Separa los bloques entrelazados y verifica su corrección Reed-Solomon.
+
+    Devuelve los bytes de datos de todos los bloques, concatenados.
+    """
+    blocks = qrcode.base.rs_blocks(version, level)
+    total = sum(block.total_count for block in blocks)
+    if len(codewords) < total:
+        raise QRDecodeError("Faltan bytes de datos")
+
+    data = [[] for _ in blocks]
+    position = 0
+    for i in range(max(block.data_count for block in blocks)):
+        for number, block in enumerate(blocks):
+            if i < block.data_count:
+                data[number].append(codewords[position])
+                position += 1
+
+    buffer = qrcode.util.BitBuffer()
+    for block in data:
+        for byte in block:
+            buffer.put(byte, 8)
+    if qrcode.util.create_bytes(buffer, blocks) != codewords[:total]:
+        raise QRDecodeError("La corrección de errores no coincide con los datos")
+    return [byte for block in data for byte in block]
+
+
+class _BitReader:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def remaining(self):
+        return len(self.data) * 8 - self.position
+
+    def read(self, count):
+        if count > self.remaining():
+            raise QRDecodeError("Datos truncados")
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.position // 8]
+            value = (value << 1) | ((byte >> (7 - self.position % 8)) & 1)
+            self.position += 1
+        return value
+
+
+def parse_segments(data, version):
+    """Texto de los segmentos numérico, alfanumérico y de bytes"""
+    reader = _BitReader(data)
+    chunks = []
+    while reader.remaining() >= 4:
+        mode = reader.read(4)
+        if mode == 0:
+            break
+        if mode not in (qrcode.util.MODE_NUMBER, qrcode.util.MODE_ALPHA_NUM, qrcode.util.MODE_8BIT_BYTE):
+            raise QRDecodeError(f"Modo de segmento no soportado: {mode}")
+        length = reader.read(qrcode.util.length_in_bits(mode, version))
+
+        if mode == qrcode.util.MODE_NUMBER:
+            digits = []
+            for start in range(0, length, 3):
+                group = min(3, length - start)
+                digits.append(str(reader.read(qrcode.util.NUMBER_LENGTH[group])).zfill(group))
+            chunks.append("".join(digits).encode('ascii'))
+        elif mode == qrcode.util.MODE_ALPHA_NUM:
+            chars = bytearray()
+            for _ in range(length // 2):
+                value = reader.read(11)
+                chars += bytes((qrcode.util.ALPHA_NUM[value // 45], qrcode.util.ALPHA_NUM[value % 45]))
+            if length % 2:
+                chars.append(qrcode.util.ALPHA_NUM[reader.read(6)])
+            chunks.append(bytes(chars))
+        else:
+            chunks.append(bytes(reader.read(8) for _ in range(length)))
+
+    raw = b"".join(chunks)
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+
+def decode_matrix(matrix):
+    """Texto de un QR a partir de su matriz (con o sin borde)"""
+    matrix = _trim(matrix)
+    size = len(matrix)
+    version, remainder = divmod(size - 17, 4)
+    if remainder or not 1 <= version <= 40:
+        raise QRDecodeError(f"Tamaño de QR inválido: {size}")
+    level, mask = read_format(matrix)
+    data = split_blocks(read_codewords(matrix, version, mask), version, level)
+    return parse_segments(data, version)
+
+
+def decode_png(data):
+    return decode_matrix(matrix_from_png(data))
+
+
+def decode_svg(text):
+    return decode_matrix(matrix_from_svg(text))
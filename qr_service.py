@@ -0,0 +1,217 @@
+"""Servicio único de generación de QR.
+
+Todos los puntos de la aplicación que necesitan un QR (pestaña de QR, diálogo
+rápido, facturas y tickets, modo batch) pasan por encode(), que centraliza la
+caché, los parámetros de codificación y el formato de salida:
+
+    'png'     bytes de una imagen PNG
+    'svg'     texto SVG con un único <path>, sin pasar por Pillow
+    'matrix'  tupla de filas de booleanos (True = módulo oscuro), borde incluido
+
+Los payloads de comprobantes se codifican como la URL oficial de ARCA (ver
+arca_qr.payload_url).
+"""
+import os
+import json
+from io import BytesIO
+
+import arca_qr
+import instrument
+from paths import cache_dir
+from qr_cache import QRCache
+
+# Valores de qrcode.constants (los del bit de formato del estándar); están
+# copiados para que importar este módulo no cargue qrcode ni Pillow
+ERROR_CORRECTION = {
+    'L': 1,
+    'M': 0,
+    'Q': 3,
+    'H': 2
+}
+
+FORMATS = ('png', 'svg', 'matrix')
+
+# Tamaño máximo de la caché de QR en disco, en megabytes
+DISK_CACHE_MB = 64
+
+_qr_cache = None
+
+
+def get_qr_cache():
+    """Caché de QR del proceso; ARCALINUX_QR_CACHE=memory u off la limita.
+    
+    En disco ocupa como máximo ARCALINUX_QR_CACHE_MB megabytes (64 por defecto).
+    """
+    global _qr_cache
+    if _qr_cache is None:
+        mode = os.environ.get('ARCALINUX_QR_CACHE', 'disk').lower()
+        directory = cache_dir("qr") if mode == 'disk' else None
+        try:
+            max_mb = float(os.environ.get('ARCALINUX_QR_CACHE_MB', DISK_CACHE_MB))
+        except ValueError:
+            max_mb = DISK_CACHE_MB
+        _qr_cache = QRCache(max_entries=0 if mode == 'off' else 512, directory=directory,
+                            max_bytes=int(max_mb * 1024 * 1024))
+    return _qr_cache
+
+
+def to_text(data):
+    """Texto que se codifica en el QR.
+
+    Un payload de comprobante se convierte a la URL oficial de ARCA (ver
+    arca_qr); otros dict se serializan a JSON y el texto queda como está.
+    """
+    if isinstance(data, str):
+        return data
+    if arca_qr.is_payload(data):
+        return arca_qr.payload_url(data)
+    return json.dumps(data)
+
+
+def make_segment(text):
+    """Un único segmento con el modo más compacto que admite todo el texto"""
+    import qrcode.util
+    
+    data = text.encode('utf-8')
+    return qrcode.util.QRData(data, mode=qrcode.util.optimal_mode(data), check_data=False)
+
+
+def segment_bits(segment, version):
+    """Bits que ocupa el segmento en una versión dada (cabecera incluida)"""
+    import qrcode.util
+    
+    length = len(segment.data)
+    if segment.mode == qrcode.util.MODE_NUMBER:
+        data_bits = 10 * (length // 3) + (qrcode.util.NUMBER_LENGTH[length % 3] if length % 3 else 0)
+    elif segment.mode == qrcode.util.MODE_ALPHA_NUM:
+        data_bits = 11 * (length // 2) + 6 * (length % 2)
+    else:
+        data_bits = 8 * length
+    return 4 + qrcode.util.length_in_bits(segment.mode, version) + data_bits
+
+
+def minimal_version(segment, error_correction='M'):
+    """Versión mínima que admite el segmento, calculada con la tabla de capacidad"""
+    import qrcode.exceptions
+    import qrcode.util
+    
+    limits = qrcode.util.BIT_LIMIT_TABLE[ERROR_CORRECTION[error_correction]]
+    for version in range(1, 41):
+        if segment_bits(segment, version) <= limits[version]:
+            return version
+    raise qrcode.exceptions.DataOverflowError(f"El texto no entra en un QR ({len(segment.data)} bytes)")
+
+
+def build_matrix(data, error_correction='M', version=None, border=5):
+    """Construye la matriz de módulos; version=None elige la mínima que entra.
+
+    El modo y la versión se deciden antes de armar el QR, sin el análisis de
+    segmentos ni el ajuste por prueba de qrcode (add_data + make(fit=True)).
+    """
+    import qrcode
+    
+    segment = make_segment(to_text(data))
+    if version is None:
+        version = minimal_version(segment, error_correction)
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=ERROR_CORRECTION[error_correction],
+        border=border
+    )
+    qr.add_data(segment)
+    qr.make(fit=False)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+def matrix_to_png(matrix, box_size=10, fill_color="black", back_color="white"):
+    from PIL import Image, ImageDraw
+    
+    size = len(matrix) * box_size
+    if (fill_color, back_color) == ("black", "white"):
+        # Imagen de 1 bit: el PNG resultante es bastante más chico
+        img = Image.new("1", (size, size), 1)
+        fill_color = 0
+    else:
+        img = Image.new("RGB", (size, size), back_color)
+    draw = ImageDraw.Draw(img)
+    for y, row in enumerate(matrix):
+        for x, dark in enumerate(row):
+            if dark:
+                left = x * box_size
+                top = y * box_size
+                draw.rectangle((left, top, left + box_size - 1, top + box_size - 1), fill=fill_color)
+    
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def matrix_to_svg(matrix, box_size=10, fill_color="black", back_color="white"):
+    """SVG compacto: cada racha de módulos oscuros es un trazo horizontal de un
+    módulo de alto dentro de un único <path> con movimientos relativos"""
+    size = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        cursor = None
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                if cursor is None:
+                    segments.append(f"M{start} {y}.5h{x - start}")
+                else:
+                    segments.append(f"m{start - cursor} 0h{x - start}")
+                cursor = x
+            else:
+                x += 1
+    
+    pixels = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="{back_color}"/>'
+        f'<path stroke="{fill_color}" d="{"".join(segments)}"/>'
+        f'</svg>'
+    )
+
+
+def encode(data, fmt='png', error_correction='M', version=None, box_size=10, border=5,
+           fill_color="black", back_color="white"):
+    """Codifica un QR en el formato pedido, usando la caché compartida"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de QR desconocido: {fmt}")
+    
+    text = to_text(data)
+    params = {
+        'format': fmt,
+        'error_correction': error_correction,
+        'version': version,
+        'box_size': box_size,
+        'border': border,
+        'fill_color': fill_color,
+        'back_color': back_color
+    }
+    
+    created = []
+    
+    def create():
+        created.append(True)
+        with instrument.stage('qr.make'):
+            matrix = build_matrix(text, error_correction, version, border)
+        if fmt == 'png':
+            with instrument.stage('qr.png'):
+                return matrix_to_png(matrix, box_size, fill_color, back_color)
+        if fmt == 'svg':
+            with instrument.stage('qr.svg'):
+                return matrix_to_svg(matrix, box_size, fill_color, back_color).encode('utf-8')
+        return "\n".join("".join("1" if dark else "0" for dark in row) for row in matrix).encode('ascii')
+    
+    value = get_qr_cache().get_or_create(text, params, create)
+    instrument.count('qr.cache_miss' if created else 'qr.cache_hit')
+    if fmt == 'png':
+        return value
+    if fmt == 'svg':
+        return value.decode('utf-8')
+    return tuple(tuple(c == "1" for c in row) for row in value.decode('ascii').split("\n"))
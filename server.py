@@ -0,0 +1,401 @@
+"""Servidor HTTP local para generar comprobantes a pedido (integración con POS).
+
+Lanzar app.py por cada ticket paga cada vez la importación de PySide6 y la
+construcción de la ventana. Este modo deja un proceso escuchando en
+localhost, con las plantillas compiladas, la caché de QR caliente y un
+renderer de Qt por hilo:
+
+    python app.py serve --port 8710
+
+    POST /factura?format=html|pdf|png&qr=png|svg   cuerpo: registro JSON
+    POST /ticket?format=...                        (mismo formato que batch)
+    GET  /health
+    GET  /metrics                                  contadores y latencias (JSON)
+    GET  /metrics?format=prometheus                lo mismo en texto de Prometheus
+
+El cuerpo es un registro como los de cli render (business_data, bill,
+billing_data, items, overall, qr_data), enviado con Content-Length. La
+respuesta es el documento con su Content-Type; los errores vuelven como
+JSON {"error": ...}. Los documentos generados se anotan en el registro
+local solo con ``record=True`` (serve --record): sin eso el servidor sirve
+también para vistas previas que no se emiten.
+
+El renderizado corre en un pool de hilos. ``max_concurrency`` limita los
+documentos en proceso a la vez y ``max_queue`` los pedidos en espera: por
+encima de eso se responde 503 para que el POS reintente en lugar de
+acumular latencia. Solo se aceptan direcciones de loopback.
+"""
+import sys
+import json
+import time
+import asyncio
+import ipaddress
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import engine
+import instrument
+import ledger
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8710
+
+CONTENT_TYPES = {
+    'html': "text/html; charset=utf-8",
+    'pdf': "application/pdf",
+    'png': "image/png"
+}
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+MAX_BODY = 4 * 1024 * 1024
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 30
+
+# Latencias recientes que se guardan por ruta para los percentiles
+LATENCY_WINDOW = 2048
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _render_body(kind, record, context, output, qr_format):
+    with instrument.document(kind, context):
+        if output == 'html':
+            qr_image = engine.build_document_qr(kind, record, context, qr_format)
+            return engine.render_embedded(kind, context, qr_image, qr_format).encode('utf-8')
+
+        import pdf_export
+
+        qr_png = engine.build_document_qr(kind, record, context)
+        renderer = pdf_export.get_renderer()
+        if output == 'pdf':
+            return renderer.render_pdf(kind, context, qr_png)
+        return renderer.render_png(kind, context, qr_png)
+
+
+def render(kind, record, output='html', qr_format='png', numbering=False, record_ledger=False):
+    """Genera el documento en memoria: devuelve (bytes, contexto)"""
+    context = engine.prepare_document(kind, record)
+    numbered = []
+    if numbering:
+        import numbering as sequences
+        numbered = sequences.assign_numbers([(record, context)])
+
+    try:
+        body = _render_body(kind, record, context, output, qr_format)
+        if record_ledger:
+            ledger.record(kind, context)
+    except BaseException:
+        # El número automático vuelve a la secuencia si el documento no se emitió
+        if numbered:
+            sequences.release(numbered)
+        raise
+    return body, context
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Metrics:
+    """Pedidos, errores y latencias por ruta"""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.routes = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def observe(self, route, status, seconds):
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {'count': 0, 'errors': 0, 'latencies': deque(maxlen=LATENCY_WINDOW)}
+        stats['count'] += 1
+        if status >= 400:
+            stats['errors'] += 1
+        stats['latencies'].append(seconds)
+
+    def snapshot(self):
+        routes = {}
+        for route, stats in self.routes.items():
+            latencies = stats['latencies']
+            routes[route] = {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+                'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+                'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+                'max_ms': round(max(latencies) * 1000, 2)
+            }
+        return {
+            'uptime_s': round(time.monotonic() - self.started, 1),
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'routes': routes
+        }
+
+    def prometheus_text(self, prefix="arcalinux"):
+        """Pedidos y latencias del servidor, más los tiempos por etapa si ARCALINUX_TIMINGS está activo"""
+        lines = [
+            f"# TYPE {prefix}_http_requests_total counter",
+            f"# TYPE {prefix}_http_errors_total counter",
+            f"# TYPE {prefix}_http_request_seconds summary"
+        ]
+        for route, stats in sorted(self.routes.items()):
+            latencies = stats['latencies']
+            lines.append(f'{prefix}_http_requests_total{{route="{route}"}} {stats["count"]}')
+            lines.append(f'{prefix}_http_errors_total{{route="{route}"}} {stats["errors"]}')
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'{prefix}_http_request_seconds{{route="{route}",quantile="{quantile}"}} '
+                             f'{_percentile(latencies, quantile):.6f}')
+        lines += [
+            f"# TYPE {prefix}_http_in_flight gauge",
+            f"{prefix}_http_in_flight {self.in_flight}",
+            f"# TYPE {prefix}_http_queued gauge",
+            f"{prefix}_http_queued {self.queued}",
+            f"# TYPE {prefix}_http_rejected_total counter",
+            f"{prefix}_http_rejected_total {self.rejected}",
+            f"# TYPE {prefix}_uptime_seconds gauge",
+            f"{prefix}_uptime_seconds {time.monotonic() - self.started:.1f}"
+        ]
+        return "\n".join(lines) + "\n" + instrument.prometheus_text(prefix=prefix)
+
+
+class RenderServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=4, max_concurrency=None,
+                 max_queue=64, numbering=False, record=False):
+        if not is_loopback(host):
+            raise ValueError(f"El servidor solo escucha en localhost, no en {host}")
+        self.host = host
+        self.port = port
+        self.jobs = max(1, jobs)
+        self.max_concurrency = max_concurrency or self.jobs
+        self.max_queue = max_queue
+        self.numbering = numbering
+        self.record = record
+        self.metrics = Metrics()
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="render")
+        self._semaphore = None
+        self._server = None
+
+    def warm_up(self):
+        """Compila las plantillas y crea la aplicación de Qt antes del primer pedido"""
+        for kind in engine.KINDS:
+            engine.get_template(kind)
+        try:
+            import pdf_export
+        except ImportError:
+            return
+        # La QGuiApplication tiene que crearse en el hilo principal
+        pdf_export.ensure_application()
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.warm_up()
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        print(f"Escuchando en http://{self.host}:{self.port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HttpError as e:
+                    write_response(writer, e.status, *json_body({'error': str(e)}), keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', "").lower() != "close"
+                status, content_type, payload, extra = await self.dispatch(method, target, body)
+                write_response(writer, status, content_type, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            # Un error inesperado no deja al cliente sin respuesta
+            try:
+                write_response(writer, 500, *json_body({'error': str(e)}), keep_alive=False)
+                await writer.drain()
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        """Devuelve (estado, content-type, cuerpo, encabezados extra)"""
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        started = time.perf_counter()
+        try:
+            if route == "/health":
+                result = (200,) + json_body({'status': "ok"}) + ({},)
+            elif route == "/metrics":
+                if parse_qs(url.query).get('format', ['json'])[0] == 'prometheus':
+                    result = (200, PROMETHEUS_TYPE, self.metrics.prometheus_text().encode('utf-8'), {})
+                else:
+                    result = (200,) + json_body(self.metrics.snapshot()) + ({},)
+            elif route.lstrip("/") in engine.KINDS:
+                if method != "POST":
+                    raise HttpError(405, "Use POST con el registro en JSON")
+                result = await self.render_request(route.lstrip("/"), parse_qs(url.query), body)
+            else:
+                raise HttpError(404, f"Ruta desconocida: {url.path}")
+        except HttpError as e:
+            result = (e.status,) + json_body({'error': str(e)}) + ({'Retry-After': "1"} if e.status == 503 else {},)
+        except Exception as e:
+            result = (500,) + json_body({'error': str(e)}) + ({},)
+
+        # Las rutas desconocidas comparten una entrada: las métricas no crecen sin límite
+        label = route if result[0] != 404 else "otras"
+        self.metrics.observe(label, result[0], time.perf_counter() - started)
+        return result
+
+    async def render_request(self, kind, query, body):
+        output = query.get('format', ['html'])[0]
+        qr_format = query.get('qr', ['png'])[0]
+        if output not in CONTENT_TYPES:
+            raise HttpError(400, f"Formato desconocido: {output}")
+        if qr_format not in engine.QR_FORMATS:
+            raise HttpError(400, f"Formato de QR desconocido: {qr_format}")
+        try:
+            record = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"JSON inválido: {e}")
+        try:
+            engine.validate_record(record)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        metrics = self.metrics
+        if self._semaphore.locked() and metrics.queued >= self.max_queue:
+            metrics.rejected += 1
+            raise HttpError(503, "Demasiados pedidos en espera")
+
+        metrics.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            metrics.queued -= 1
+        metrics.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            document, context = await loop.run_in_executor(
+                self._executor, render, kind, record, output, qr_format, self.numbering, self.record
+            )
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        finally:
+            metrics.in_flight -= 1
+            self._semaphore.release()
+
+        return 200, CONTENT_TYPES[output], document, {'X-Document-Number': header_value(context['bill']['number'])}
+
+
+def header_value(value):
+    """Valor seguro para un encabezado: sin saltos de línea ni caracteres fuera de ASCII"""
+    return "".join(c if " " <= c <= "~" else "?" for c in str(value))
+
+
+def json_body(data):
+    return "application/json", json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+async def read_request(reader):
+    """(método, destino, encabezados, cuerpo), o None si el cliente cerró la conexión"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Línea de pedido inválida")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(400, "Demasiados encabezados")
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', "identity").lower() != "identity":
+        # El cuerpo por partes no se lee: sin esto el pedido llegaría vacío
+        raise HttpError(411, "Envíe el cuerpo con Content-Length (sin Transfer-Encoding)")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, "Content-Length inválido")
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido")
+    if length > MAX_BODY:
+        raise HttpError(413, "El cuerpo es demasiado grande")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def write_response(writer, status, content_type, body, extra=None, keep_alive=True):
+    headers = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}"
+    ]
+    headers.extend(f"{name}: {value}" for name, value in (extra or {}).items())
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    """Atiende pedidos hasta que se interrumpe el proceso (Ctrl+C)"""
+    server = RenderServer(host, port, **options)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,33 @@
+"""Base común de las bases SQLite locales (registro, numeración, catálogos).
+
+Cada store abre una sola conexión en modo WAL, compartida por los hilos del
+proceso y protegida con un lock, y crea su esquema al abrirse. Las rutas
+":memory:" no crean carpetas.
+"""
+import os
+import sqlite3
+import threading
+
+# A partir de cuántas filas nuevas un catálogo descarta su índice en memoria
+# en lugar de actualizarlo (se vuelve a armar la próxima vez que se usa)
+BULK_REBUILD = 1000
+
+
+class SQLiteStore:
+    def __init__(self, path, schema="", pragmas=(), **connect_options):
+        self.path = path
+        if str(self.path) != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Una conexión compartida por los hilos del proceso, protegida con un lock
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, **connect_options)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            for pragma in pragmas:
+                self._connection.execute(f"PRAGMA {pragma}")
+            if schema:
+                self._connection.executescript(schema)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
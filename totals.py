@@ -0,0 +1,142 @@
+"""Cálculo de totales de facturas y tickets con Decimal.
+
+Cada ítem aporta un importe neto (cantidad x precio - bonificación) a la
+alícuota de IVA que le corresponde. Totals guarda el aporte de cada fila y
+la suma por alícuota, así que editar una fila solo resta su aporte anterior
+y suma el nuevo: los totales se mantienen sin recorrer todos los ítems en
+cada tecla, aunque la factura tenga miles de renglones.
+
+El IVA se calcula por alícuota al leer los totales (base x tasa, redondeado
+a centavos), que es como se discrimina en el comprobante.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal("100")
+ZERO = Decimal("0")
+
+DEFAULT_TAX_RATE = Decimal("21")
+
+
+def to_decimal(value, default=ZERO):
+    """Convierte un texto a Decimal; acepta coma decimal y separador de miles"""
+    text = str(value or "").strip().replace("$", "").replace(" ", "")
+    if not text:
+        return default
+    if "," in text:
+        # 1.234,56 -> 1234.56
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return default
+    return number if number.is_finite() else default
+
+
+def to_rate(value, default=DEFAULT_TAX_RATE):
+    return to_decimal(str(value or "").replace("%", ""), default)
+
+
+def quantize(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def format_amount(value):
+    return str(quantize(value))
+
+
+def format_rate(rate):
+    """Alícuota sin ceros de más: 21, 10.5, 27"""
+    return format(rate.normalize(), 'f')
+
+
+def line_amounts(item, default_rate=DEFAULT_TAX_RATE):
+    """Aporte de un ítem: (neto, alícuota) o None si la fila está vacía"""
+    if not any(str(value).strip() for key, value in item.items() if key != 'subtotal'):
+        return None
+
+    quantity = to_decimal(item.get('quantity'), Decimal("1"))
+    gross = quantity * to_decimal(item.get('price'))
+    discount = gross * to_decimal(item.get('percent_subsidized')) / HUNDRED
+    discount += to_decimal(item.get('impost_subsidized'))
+    return quantize(gross - discount), to_rate(item.get('tax_percent'), default_rate)
+
+
+class Totals:
+    """Totales acumulados de una lista de ítems, actualizables por posición"""
+    def __init__(self, items=(), default_rate=DEFAULT_TAX_RATE):
+        self.default_rate = default_rate
+        self.reset(items)
+
+    def reset(self, items=()):
+        self.lines = []
+        self.net = ZERO
+        self.bases = {}
+        self.rows = {}
+        self.insert(0, items)
+
+    def insert(self, position, items):
+        lines = [line_amounts(item, self.default_rate) for item in items]
+        self.lines[position:position] = lines
+        for line in lines:
+            self._add(line, 1)
+
+    def remove(self, first, last):
+        """Quita las filas first..last (inclusive, como rowsRemoved de Qt)"""
+        for line in self.lines[first:last + 1]:
+            self._add(line, -1)
+        del self.lines[first:last + 1]
+
+    def update(self, position, item):
+        """Reemplaza el aporte de una fila; devuelve su nuevo neto (o None)"""
+        line = line_amounts(item, self.default_rate)
+        self._add(self.lines[position], -1)
+        self._add(line, 1)
+        self.lines[position] = line
+        return line[0] if line else None
+
+    def _add(self, line, sign):
+        if line is None:
+            return
+        net, rate = line
+        self.net += sign * net
+        self.bases[rate] = self.bases.get(rate, ZERO) + sign * net
+        self.rows[rate] = self.rows.get(rate, 0) + sign
+        if not self.rows[rate]:
+            # Ya no quedan ítems con esa alícuota
+            del self.bases[rate], self.rows[rate]
+
+    def count(self):
+        return sum(self.rows.values())
+
+    def tax_by_rate(self):
+        """{alícuota: (base imponible, IVA)} de la mayor a la menor alícuota"""
+        return {rate: (quantize(base), quantize(base * rate / HUNDRED))
+                for rate, base in sorted(self.bases.items(), reverse=True)}
+
+    def subtotal(self):
+        return quantize(self.net)
+
+    def tax(self):
+        return sum((tax for _, tax in self.tax_by_rate().values()), ZERO)
+
+    def total(self):
+        return self.subtotal() + self.tax()
+
+
+def compute(items, default_rate=DEFAULT_TAX_RATE):
+    """Totales de una lista de ítems ya cargada, en una sola pasada"""
+    return Totals(items, default_rate)
+
+
+def breakdown(document_totals):
+    """IVA discriminado por alícuota, listo para la plantilla"""
+    return [
+        {'rate': format_rate(rate), 'base': format_amount(base), 'tax': format_amount(tax)}
+        for rate, (base, tax) in document_totals.tax_by_rate().items()
+    ]
+
+
+def describe(document_totals):
+    """Resumen de una línea para la interfaz, p. ej. 21%: 21.00 | 10.5%: 2.10"""
+    return " | ".join(f"{line['rate']}%: {line['tax']}" for line in breakdown(document_totals))
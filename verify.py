@@ -0,0 +1,160 @@
+"""Verificación masiva de los QR de documentos ya generados.
+
+Recorre una carpeta de salida, lee el QR de cada documento HTML (PNG en
+base64, SVG en línea o el qr_code.png/qr_code.svg de su carpeta), lo
+decodifica con qr_decode y compara el payload con lo que el documento
+muestra impreso: CUIT del emisor, punto de venta, número, importe total y
+CAE. Los HTML de un bundle se revisan página por página.
+
+Los documentos se reparten en lotes entre procesos igual que en batch, así
+que auditar decenas de miles de comprobantes no requiere interfaz gráfica
+ni cargar toda la carpeta en memoria. Los PDF no se revisan.
+"""
+import os
+import re
+import json
+import base64
+from pathlib import Path
+
+import arca_qr
+import batch
+import qr_decode
+
+# Campo del payload, nombre para el reporte y expresiones que lo ubican en
+# las plantillas de factura y ticket
+PRINTED_FIELDS = (
+    ('cuit', "CUIT", (r"<strong>CUIT:</strong>\s*([^<]*)", r"C\.U\.I\.T\.:\s*([^<]*)")),
+    ('ptoVta', "punto de venta", (r"Punto de Venta:\s*([^<]*)", r"<p>P\.V:\s*([^<]*)")),
+    ('nroCmp', "número", (r"Comp\. Nro:\s*([^<]*)", r"<p>Nro:\s*([^<]*)")),
+    ('importe', "total", (r"Importe total: \$</strong>\s*</p>\s*<p[^>]*>\s*<strong>([^<]*)",
+                          r"<td>TOTAL</td>\s*<td>([^<]*)")),
+    ('codAut', "CAE", (r"CAE Nº:&nbsp;</strong>\s*([^<]*)", r"<p>CAE:\s*([^<]*)"))
+)
+PRINTED_FIELDS = tuple(
+    (field, label, tuple(re.compile(pattern) for pattern in patterns))
+    for field, label, patterns in PRINTED_FIELDS
+)
+
+_QR_SVG = re.compile(r'<div id="qrcode"[^>]*>\s*(<svg.*?</svg>)', re.S)
+_QR_IMG = re.compile(r'<img id="qrcode" src="([^"]*)"')
+_BUNDLE_PAGE = '<div class="bundle-page">'
+
+
+def find_documents(root):
+    """Rutas de los HTML bajo ``root`` (o el propio archivo), en orden"""
+    root = Path(root)
+    if root.is_file():
+        yield root
+        return
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith('.html'):
+                yield Path(directory) / filename
+
+
+def document_pages(html):
+    """Un documento por página: el HTML completo o cada página de un bundle"""
+    if _BUNDLE_PAGE not in html:
+        return [html]
+    return html.split(_BUNDLE_PAGE)[1:]
+
+
+def read_qr_text(page, folder):
+    """Texto del QR de una página; ``folder`` resuelve los QR en archivo aparte"""
+    svg = _QR_SVG.search(page)
+    if svg:
+        return qr_decode.decode_svg(svg.group(1))
+
+    image = _QR_IMG.search(page)
+    if not image or not image.group(1):
+        raise qr_decode.QRDecodeError("El documento no tiene QR")
+    source = image.group(1)
+    if source.startswith("data:image/png;base64,"):
+        return qr_decode.decode_png(base64.b64decode(source.partition(",")[2]))
+
+    path = Path(folder) / source
+    if not path.is_file():
+        raise qr_decode.QRDecodeError(f"No existe el QR {source}")
+    if path.suffix.lower() == '.svg':
+        return qr_decode.decode_svg(path.read_text(encoding='utf-8'))
+    return qr_decode.decode_png(path.read_bytes())
+
+
+def parse_payload(text):
+    """Payload del QR: la URL de ARCA o, en documentos anteriores, el JSON en crudo"""
+    payload = arca_qr.decode_url(text)
+    if payload is None:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+    if not arca_qr.is_payload(payload):
+        raise qr_decode.QRDecodeError("El QR no es de un comprobante de ARCA")
+    return payload
+
+
+def printed_values(page):
+    """Valores impresos en el documento, por campo del payload"""
+    values = {}
+    for field, _, patterns in PRINTED_FIELDS:
+        for pattern in patterns:
+            match = pattern.search(page)
+            if match:
+                values[field] = match.group(1).strip()
+                break
+    return values
+
+
+def _same(field, payload_value, printed):
+    if field == 'importe':
+        try:
+            return round(float(payload_value), 2) == round(float(printed.replace(",", ".")), 2)
+        except (TypeError, ValueError):
+            return False
+    digits = "".join(c for c in printed if c.isdigit())
+    return str(payload_value) == str(int(digits)) if digits else payload_value in (None, "", 0)
+
+
+def check_page(page, folder):
+    """Lista de diferencias entre el QR y el documento (vacía si coinciden)"""
+    try:
+        payload = parse_payload(read_qr_text(page, folder))
+    except qr_decode.QRDecodeError as e:
+        return [str(e)]
+
+    printed = printed_values(page)
+    if not printed:
+        return ["No se encontraron los datos del comprobante en el documento"]
+
+    problems = []
+    for field, label, _ in PRINTED_FIELDS:
+        if field in printed and not _same(field, payload.get(field), printed[field]):
+            problems.append(f"{label}: QR {payload.get(field)!r}, documento {printed[field]!r}")
+    return problems
+
+
+def verify_document(path):
+    """Diferencias de un documento; en un bundle van precedidas por la página"""
+    path = Path(path)
+    try:
+        html = path.read_text(encoding='utf-8')
+    except (OSError, UnicodeDecodeError) as e:
+        return [f"No se pudo leer: {e}"]
+
+    pages = document_pages(html)
+    if len(pages) == 1:
+        return check_page(pages[0], path.parent)
+    return [f"Página {number}: {problem}"
+            for number, page in enumerate(pages, start=1)
+            for problem in check_page(page, path.parent)]
+
+
+def _verify_chunk(chunk):
+    """Se ejecuta en el worker: devuelve [(indice, ruta, diferencias), ...]"""
+    return [(index, str(path), verify_document(path)) for index, path in chunk]
+
+
+def verify_tree(root, jobs=1, ordered=True, chunksize=32, max_pending=None):
+    """Verifica los documentos bajo ``root``: iterador de (indice, ruta, diferencias)"""
+    return batch._map_chunks(_verify_chunk, (), find_documents(root), jobs, ordered, chunksize, max_pending)
@@ -0,0 +1,174 @@
+"""Tareas en segundo plano para la interfaz (QThreadPool + QRunnable).
+
+La codificación del QR, el renderizado de plantillas y la escritura a disco
+se ejecutan fuera del hilo principal para que la ventana no se congele al
+guardar. Los diálogos (preguntas, selección de archivos) siguen en el hilo
+de la interfaz: a la tarea solo le llegan datos planos.
+
+    workers.submit(funcion, *args, on_finished=..., on_failed=...)
+
+``funcion`` recibe la tarea como primer argumento y puede llamar a
+task.report(porcentaje, etapa), que además corta la ejecución si la tarea
+fue cancelada. Una vez escrito el archivo ya no se cancela: el avance
+final se informa con task.progress(), que no corta. Los callbacks se
+ejecutan en el hilo de la interfaz.
+"""
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+import engine
+import instrument
+import ledger
+import qr_service
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    progress = Signal(int, str)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class Task(QRunnable):
+    def __init__(self, func, *args, description=""):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.description = description
+        self.signals = TaskSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def report(self, percent, stage=""):
+        if self._cancelled:
+            raise TaskCancelled()
+        self.progress(percent, stage)
+
+    def progress(self, percent, stage=""):
+        """Informa el avance sin cortar la tarea, aunque se haya cancelado"""
+        self.signals.progress.emit(percent, stage)
+
+    def run(self):
+        try:
+            if self._cancelled:
+                raise TaskCancelled()
+            result = self.func(self, *self.args)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    """Cola de tareas de la aplicación; MainWindow muestra su progreso"""
+    progress = Signal(int, str)
+    active_changed = Signal(int)
+
+    def __init__(self, max_threads=2):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = []
+
+    def submit(self, func, *args, description="", on_finished=None, on_failed=None, on_cancelled=None):
+        task = Task(func, *args, description=description)
+        task.signals.progress.connect(self.progress)
+        if on_finished:
+            task.signals.finished.connect(on_finished)
+        if on_failed:
+            task.signals.failed.connect(on_failed)
+        if on_cancelled:
+            task.signals.cancelled.connect(on_cancelled)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(lambda *_, task=task: self._done(task))
+
+        self.tasks.append(task)
+        self.active_changed.emit(len(self.tasks))
+        self.pool.start(task)
+        return task
+
+    def cancel_all(self):
+        for task in list(self.tasks):
+            task.cancel()
+            if self.pool.tryTake(task):
+                # Todavía no había empezado: se descarta sin ejecutarse
+                task.signals.cancelled.emit()
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _done(self, task):
+        if task in self.tasks:
+            self.tasks.remove(task)
+            self.active_changed.emit(len(self.tasks))
+
+
+_runner = None
+
+
+def get_runner():
+    global _runner
+    if _runner is None:
+        _runner = TaskRunner()
+    return _runner
+
+
+def submit(func, *args, **kwargs):
+    return get_runner().submit(func, *args, **kwargs)
+
+
+def encode_qr(task, qr_data):
+    """Tarea: codifica un QR en PNG"""
+    task.report(10, "Generando QR")
+    return qr_service.encode(qr_data)
+
+
+def save_document(task, kind, context, qr_png, qr_payload, qr_format, target, embed):
+    """Tarea: genera el QR si hace falta y escribe el documento.
+
+    Devuelve (ruta, qr_png) para que la interfaz actualice la vista previa.
+    """
+    with instrument.document(kind, context):
+        task.report(10, "Generando QR")
+        if qr_png is None:
+            qr_png = qr_service.encode(qr_payload)
+        qr_image = engine.build_qr(qr_payload, 'svg') if qr_format == 'svg' else qr_png
+
+        task.report(50, "Renderizando")
+        if embed:
+            path = engine.write_embedded(kind, context, qr_image, target, qr_format)
+        else:
+            path = engine.write_folder(kind, context, qr_image, target, qr_format)
+    ledger.record(kind, context, path)
+
+    # El documento ya está escrito y anotado: cancelar ahora lo daría por no guardado
+    task.progress(100, "Guardado")
+    return path, qr_png
+
+
+def export_pdf(task, kind, context, qr_png, qr_payload, filename):
+    """Tarea: exporta el documento a PDF con un renderer propio del hilo"""
+    import pdf_export
+
+    with instrument.document(kind, context):
+        task.report(10, "Generando QR")
+        if qr_png is None:
+            qr_png = qr_service.encode(qr_payload)
+
+        task.report(50, "Exportando PDF")
+        pdf_export.get_renderer().write_pdf(kind, context, qr_png, filename)
+    ledger.record(kind, context, filename)
+
+    # El documento ya está escrito y anotado: cancelar ahora lo daría por no guardado
+    task.progress(100, "Guardado")
+    return filename, qr_png